@@ -23,9 +23,11 @@ task_default_exchange = "default"
 task_default_exchange_type = "direct"
 task_default_routing_key = "default"
 task_create_missing_queues = True
-task_serializer = 'pickle'
-accept_content = {'pickle'}
-result_serializer = 'pickle'
+# Tasks of this app receive primary keys, not model instances. Pickle is
+# still accepted for callbacks sent by the InaSAFE workers.
+task_serializer = 'json'
+accept_content = {'json', 'pickle'}
+result_serializer = 'json'
 # Late ACK settings
 task_acks_late = True
 task_reject_on_worker_lost = True
@@ -56,6 +58,14 @@ beat_schedule = {
             'queue': 'inasafe-django-indicator'
         }
     },
+    # executes every 5 minutes
+    'snapshot-indicators': {
+        'task': 'realtime.tasks.indicator.snapshot_indicators',
+        'schedule': crontab(minute='*/5'),
+        'options': {
+            'queue': 'inasafe-django-indicator'
+        }
+    },
     # executes every night
     'send-indicator-status-nightly': {
         'task': 'realtime.tasks.indicator.notify_indicator_status',
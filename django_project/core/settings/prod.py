@@ -24,6 +24,15 @@ PIPELINE_CSS_COMPRESSOR = 'pipeline.compressors.yui.YUICompressor'
 PIPELINE_YUI_JS_ARGUMENTS = '--nomunge'
 PIPELINE_DISABLE_WRAPPER = True
 
+# Cache shared by web and worker processes, so cache invalidation done by
+# workers is visible to the web. Run createcachetable to create the table.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'realtime_cache',
+    }
+}
+
 # Comment if you are not running behind proxy
 USE_X_FORWARDED_HOST = True
 
@@ -33,6 +33,11 @@ DATABASES = {
 MEDIA_ROOT = '/home/web/media'
 STATIC_ROOT = '/home/web/static'
 
+# Let nginx send report files, see deployment/sites-enabled/default.conf
+REALTIME_FILE_X_ACCEL_REDIRECT_LOCATIONS = {
+    MEDIA_ROOT: '/protected-media',
+}
+
 # See fig.yml file for postfix container definition
 #
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
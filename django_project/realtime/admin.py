@@ -90,6 +90,7 @@ class EarthquakeAdmin(LeafletGeoAdmin):
                     'magnitude', 'depth')
     list_filter = ('location_description', )
     search_fields = ['shake_id', 'location_description']
+    raw_id_fields = ('initial_shakemap', )
     inlines = [
         ImpactInline,
         EarthquakeReportInline,
@@ -139,11 +139,115 @@ REALTIME_BROKER_INTERVAL_RANGE = getattr(
     settings, 'REALTIME_BROKER_INTERVAL_RANGE',
     default_realtime_broker_interval_range)
 
+# Realtime broker connection probe, in seconds. A probe waiting longer than
+# the expiry in the realtime queue is discarded, and a probe running longer
+# than the time limit is killed. The reply is polled by the next broker
+# check, the indicator ages until a probe comes back.
+REALTIME_BROKER_CHECK_EXPIRES = getattr(
+    settings, 'REALTIME_BROKER_CHECK_EXPIRES', 60)
+REALTIME_BROKER_CHECK_TIME_LIMIT = getattr(
+    settings, 'REALTIME_BROKER_CHECK_TIME_LIMIT', 30)
+
+# Indicator snapshots. The indicator page reads snapshots not older than
+# the max age, otherwise indicators are computed from live tables.
+# Snapshots older than the retention period are deleted.
+INDICATOR_SNAPSHOT_MAX_AGE = getattr(
+    settings, 'REALTIME_INDICATOR_SNAPSHOT_MAX_AGE', timedelta(minutes=15))
+INDICATOR_SNAPSHOT_RETENTION = getattr(
+    settings, 'REALTIME_INDICATOR_SNAPSHOT_RETENTION', timedelta(days=90))
+
 # URL to get BMKG's Felt Earthquake list
 FELT_EARTHQUAKE_URL = 'http://bmkg.go.id/gempabumi/gempabumi-dirasakan.bmkg'
 
 MAPQUEST_MAP_KEY = getattr(settings, 'MAPQUEST_MAP_KEY', '')
 
+# Number of rows inserted per query when bulk importing layer features
+BULK_CREATE_BATCH_SIZE = getattr(
+    settings, 'REALTIME_BULK_CREATE_BATCH_SIZE', 500)
+
+# Bulk ingestion of earthquakes. Processing of ingested earthquakes is
+# throttled: the number of processing tasks started in each interval, in
+# seconds.
+EARTHQUAKE_BULK_MAX_EVENTS = getattr(
+    settings, 'REALTIME_EARTHQUAKE_BULK_MAX_EVENTS', 1000)
+EARTHQUAKE_BULK_CONCURRENCY = getattr(
+    settings, 'REALTIME_EARTHQUAKE_BULK_CONCURRENCY', 4)
+EARTHQUAKE_BULK_INTERVAL = getattr(
+    settings, 'REALTIME_EARTHQUAKE_BULK_INTERVAL', 60)
+
+# Chunk size in bytes used when streaming report files
+FILE_STREAM_CHUNK_SIZE = getattr(
+    settings, 'REALTIME_FILE_STREAM_CHUNK_SIZE', 64 * 1024)
+
+# Serve report files with nginx X-Accel-Redirect.
+# Maps a filesystem directory to the nginx internal location that serves it,
+# e.g. {'/home/web/media': '/protected-media'}. Files outside of these
+# directories are streamed by django.
+FILE_X_ACCEL_REDIRECT_LOCATIONS = getattr(
+    settings, 'REALTIME_FILE_X_ACCEL_REDIRECT_LOCATIONS', {})
+
+# Cache of the earthquake feature collection shown on the map page.
+# Cached entries are invalidated when earthquakes are saved, the timeout only
+# bounds the staleness of relative time filters like since_last_hours.
+EARTHQUAKE_FEATURE_CACHE_NAMESPACE = 'earthquake-feature'
+EARTHQUAKE_FEATURE_CACHE_TIMEOUT = getattr(
+    settings, 'REALTIME_EARTHQUAKE_FEATURE_CACHE_TIMEOUT', 300)
+
+# Cache of the MMI contours feature collection of an earthquake.
+# Invalidated with the earthquake feature cache.
+EARTHQUAKE_CONTOUR_CACHE_TIMEOUT = getattr(
+    settings, 'REALTIME_EARTHQUAKE_CONTOUR_CACHE_TIMEOUT', 24 * 60 * 60)
+
+# Zoom levels of the simplified geometries precomputed for map clients.
+# Geometries are simplified to about one pixel of these zoom levels. Clients
+# asking for a higher zoom level get full resolution geometries.
+SIMPLIFIED_ZOOM_LEVELS = getattr(
+    settings, 'REALTIME_SIMPLIFIED_ZOOM_LEVELS', (6, 9, 12))
+
+# Binary rasters of shake grids, relative to the media root. They are
+# parsed from the grid.xml of earthquakes and memory mapped for point
+# queries, at most the max number of points per request.
+SHAKE_GRID_RASTER_DIRECTORY = getattr(
+    settings, 'REALTIME_SHAKE_GRID_RASTER_DIRECTORY', 'earthquake/grid_raster')
+SHAKE_GRID_MAX_POINTS = getattr(
+    settings, 'REALTIME_SHAKE_GRID_MAX_POINTS', 1000)
+
+# Tolerance used to match corrected shakemaps with their initial shakemaps,
+# when there is no shakemap with the exact same time.
+SHAKEMAPS_MATCH_TIME_DELTA = getattr(
+    settings, 'REALTIME_SHAKEMAPS_MATCH_TIME_DELTA', timedelta(minutes=30))
+SHAKEMAPS_MATCH_MAGNITUDE_DELTA = getattr(
+    settings, 'REALTIME_SHAKEMAPS_MATCH_MAGNITUDE_DELTA', 1)
+# In meters
+SHAKEMAPS_MATCH_DISTANCE = getattr(
+    settings, 'REALTIME_SHAKEMAPS_MATCH_DISTANCE', 10000)
+
+# Cache of flood histogram of a RW boundary. Invalidated when a flood touches
+# the boundary. Set the timeout to 0 to disable the cache.
+RW_HISTOGRAM_CACHE_NAMESPACE = 'rw-histogram-{boundary_id}'
+RW_HISTOGRAM_CACHE_TIMEOUT = getattr(
+    settings, 'REALTIME_RW_HISTOGRAM_CACHE_TIMEOUT', 24 * 60 * 60)
+
+# Cache of the flood frequency feature collection. Invalidated when a flood
+# changes its flooded boundaries.
+FLOOD_FREQUENCY_CACHE_NAMESPACE = 'flood-frequency'
+FLOOD_FREQUENCY_CACHE_TIMEOUT = getattr(
+    settings, 'REALTIME_FLOOD_FREQUENCY_CACHE_TIMEOUT', 24 * 60 * 60)
+
+# Cache of the flat pages navigation menus, by language and system category.
+# Invalidated when a flat page is saved or deleted.
+FLATPAGE_NAVIGATION_CACHE_NAMESPACE = 'flatpage-navigation'
+FLATPAGE_NAVIGATION_CACHE_TIMEOUT = getattr(
+    settings, 'REALTIME_FLATPAGE_NAVIGATION_CACHE_TIMEOUT', 24 * 60 * 60)
+
+# Compression levels of precompressed responses. Variants are built by the
+# request missing the cache and by flood feature tasks for every zoom level,
+# so moderate levels are used: maximum levels are many times slower for a
+# few percent smaller responses.
+# Brotli variants are only built if the brotli package is installed.
+GZIP_LEVEL = getattr(settings, 'REALTIME_GZIP_LEVEL', 6)
+BROTLI_QUALITY = getattr(settings, 'REALTIME_BROTLI_QUALITY', 5)
+
 OSM_LEVEL_7_NAME = 'Kelurahan'
 
 OSM_LEVEL_8_NAME = 'RW'
@@ -311,6 +415,16 @@ FLOOD_MONITORED_DIRECTORY = os.environ.get(
 
 ANALYSIS_LANGUAGES = ['en', 'id']
 
+# Seconds a queued event processing task blocks another dispatch of the same
+# task for the same event, in case the queued message is lost.
+PIPELINE_DISPATCH_TIMEOUT = getattr(
+    settings, 'REALTIME_PIPELINE_DISPATCH_TIMEOUT', 5 * 60)
+
+# A pipeline step claimed longer than this is considered stale and can be
+# run again.
+PIPELINE_STEP_TIMEOUT = getattr(
+    settings, 'REALTIME_PIPELINE_STEP_TIMEOUT', timedelta(minutes=10))
+
 EARTHQUAKE_HAZARD_TYPE = 'earthquake'
 FLOOD_HAZARD_TYPE = 'flood'
 ASH_HAZARD_TYPE = 'ash'
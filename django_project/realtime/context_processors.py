@@ -1,14 +1,64 @@
 # coding=utf-8
 """Module for custom context processor for InaSAFE Realtime."""
 from builtins import range
+from django.core.cache import cache
+
 from realtime import app_settings
 from realtime.app_settings import (
     LEAFLET_TILES,
     MAPQUEST_MAP_KEY, ASH_SHOW_PAGE, OTHER_PAGE_SYSTEM_CATEGORY,
-    ABOUT_PAGE_SYSTEM_CATEGORY)
+    ABOUT_PAGE_SYSTEM_CATEGORY, FLATPAGE_NAVIGATION_CACHE_NAMESPACE,
+    FLATPAGE_NAVIGATION_CACHE_TIMEOUT)
+from realtime.helpers.cache import versioned_cache_key
 from realtime.models.coreflatpage import CoreFlatPage
 
 
+def retrieve_flat_pages(system_category, language):
+    """Retrieve navigation menu of flat pages, grouped by their group.
+
+    The menu is cached until a flat page is saved or deleted.
+
+    :param system_category: System category of the flat pages
+    :type system_category: str
+
+    :param language: Language code of the flat pages
+    :type language: str
+
+    :return: Dictionary of groups, each with its title and pages. Pages are
+        dictionaries of id, title and url.
+    :rtype: dict
+    """
+    cache_key = versioned_cache_key(
+        FLATPAGE_NAVIGATION_CACHE_NAMESPACE, language, system_category)
+    flatpages = cache.get(cache_key)
+    if flatpages is not None:
+        return flatpages
+
+    pages = CoreFlatPage.objects.filter(
+        system_category=system_category,
+        language=language
+    ).order_by('order', 'id').values('id', 'title', 'url', 'group')
+
+    # Groups are case insensitive, titled by the first spelling found
+    groups = {}
+    for page in pages:
+        group = groups.setdefault(page['group'].lower(), {
+            'title': page['group'],
+            'pages': []
+        })
+        group['pages'].append({
+            'id': page['id'],
+            'title': page['title'],
+            'url': page['url']
+        })
+
+    flatpages = {
+        'groups': [groups[key] for key in sorted(groups)]
+    }
+    cache.set(cache_key, flatpages, FLATPAGE_NAVIGATION_CACHE_TIMEOUT)
+    return flatpages
+
+
 def realtime_settings(request):
     """Add media configuration for user map e.g favicon path so that we can
     use it directly on template.
@@ -36,39 +86,16 @@ def realtime_settings(request):
         )
 
     # Check Navbar flat pages exists and show it
-    # Get distinct Groups
-    def retrieve_flat_pages(system_category):
-        groups = CoreFlatPage.objects.order_by().values_list('group')\
-            .distinct()
-        flatpages = {
-            'groups': []
-        }
-        for g in groups:
-            group = {
-                'title': g[0],
-                'pages': []
-            }
-            pages = CoreFlatPage.objects.filter(
-                group__iexact=g,
-                system_category=system_category,
-                language=request.LANGUAGE_CODE
-            ).order_by('order')
-            # for p in pages:
-            #     page = {
-            #         'ic': p.id,
-            #         'title': p.title,
-            #         'url': p.url
-            #     }
-            #     group['pages'].append(page)
-            group['pages'] = pages
-            if pages:
-                flatpages['groups'].append(group)
-
-        return flatpages
-
-    flatpages = retrieve_flat_pages(OTHER_PAGE_SYSTEM_CATEGORY)
-    abouts = retrieve_flat_pages(ABOUT_PAGE_SYSTEM_CATEGORY)
-    additional_nav_menus = [abouts, flatpages]
+    additional_nav_menus = getattr(request, '_realtime_nav_menus', None)
+    if additional_nav_menus is None:
+        additional_nav_menus = [
+            retrieve_flat_pages(
+                ABOUT_PAGE_SYSTEM_CATEGORY, request.LANGUAGE_CODE),
+            retrieve_flat_pages(
+                OTHER_PAGE_SYSTEM_CATEGORY, request.LANGUAGE_CODE)
+        ]
+        # Templates rendered in the same request reuse the menus
+        request._realtime_nav_menus = additional_nav_menus
 
     return {
         'REALTIME_PROJECT_NAME': app_settings.PROJECT_NAME,
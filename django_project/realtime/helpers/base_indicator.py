@@ -1,12 +1,11 @@
 # coding=utf-8
-from builtins import range
 from builtins import object
 from datetime import datetime, timedelta
-from math import isnan
 from django.utils.translation import ugettext as _
 import numpy
 import pytz
 from realtime.models.earthquake import Earthquake
+from realtime.models.indicator import IndicatorSnapshot
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 __date__ = '04/09/15'
@@ -24,10 +23,18 @@ class Indicator(object):
     realtime is running fine.
     """
 
+    # Name of the indicator in snapshots
+    name = None
+
     def __init__(self):
         self._value = None
         self._label = None
         self._status = None
+        self._healthy_range = None
+        self._warning_range = None
+        self._mean_interval = None
+        self._deviation = None
+        self._latency = None
 
     @property
     def value(self):
@@ -41,6 +48,53 @@ class Indicator(object):
     def status(self):
         return self._status
 
+    def snapshot(self, time=None):
+        """Return a snapshot of the indicator.
+
+        :param time: Time of the snapshot, defaults to now
+        :type time: datetime
+
+        :return: The unsaved snapshot
+        :rtype: IndicatorSnapshot
+        """
+        if time is None:
+            time = datetime.utcnow().replace(tzinfo=pytz.utc)
+        return IndicatorSnapshot(
+            indicator=self.name,
+            time=time,
+            status=self.status,
+            value=self.value,
+            healthy_range=self._healthy_range,
+            warning_range=self._warning_range,
+            mean_interval=self._mean_interval,
+            deviation=self._deviation,
+            latency=self._latency)
+
+    def load_snapshot(self, snapshot):
+        """Load the indicator from a snapshot instead of live tables.
+
+        The status is evaluated again, from the time elapsed since the value
+        of the snapshot.
+
+        :param snapshot: The snapshot
+        :type snapshot: IndicatorSnapshot
+        """
+        self._value = snapshot.value
+        self._healthy_range = snapshot.healthy_range
+        self._warning_range = snapshot.warning_range
+        self._mean_interval = snapshot.mean_interval
+        self._deviation = snapshot.deviation
+        self._latency = snapshot.latency
+
+        now = datetime.utcnow().replace(tzinfo=pytz.utc)
+        delta = now - self._value
+        if delta < self._healthy_range:
+            self._status = STATUS_HEALTHY
+        elif delta < self._warning_range:
+            self._status = STATUS_WARNING
+        else:
+            self._status = STATUS_CRITICAL
+
     def value_humanize(self):
         raise NotImplementedError()
 
@@ -79,23 +133,19 @@ def average_shake_interval(num_days=30):
     :return: tuple of mean interval and standard deviation of shake events
     :rtype: tuple
     """
-    last_span = datetime.utcnow() - timedelta(days=num_days)
-    last_span.replace(tzinfo=pytz.utc)
-    shakes = Earthquake.objects.filter(time__gte=last_span)
-    intervals = []
-    for i in range(1, len(shakes)):
-        prev_shake = shakes[i - 1]
-        shake = shakes[i]
-        intervals.append(shake.time - prev_shake.time)
-
-    # using numpy to calculate mean
-    intervals = numpy.array([i.total_seconds() for i in intervals])
-    mean_interval = numpy.mean(intervals)
-    if isinstance(mean_interval, float) and isnan(mean_interval):
-        mean_interval = 0
-
-    # using numpy to calculate std
-    deviation = numpy.std(intervals)
-    if isinstance(deviation, float) and isnan(deviation):
-        deviation = 0
+    last_span = datetime.utcnow().replace(
+        tzinfo=pytz.utc) - timedelta(days=num_days)
+    # Only fetch the times, in chronological order
+    shake_times = Earthquake.objects.filter(
+        time__gte=last_span).order_by('time').values_list('time', flat=True)
+    epoch = datetime.fromtimestamp(0, tz=pytz.utc)
+    timestamps = numpy.array(
+        [(t - epoch).total_seconds() for t in shake_times], dtype=float)
+    if len(timestamps) < 2:
+        return timedelta(0), timedelta(0)
+    intervals = numpy.diff(timestamps)
+
+    # using numpy to calculate mean and std
+    mean_interval = float(numpy.mean(intervals))
+    deviation = float(numpy.std(intervals))
     return timedelta(seconds=mean_interval), timedelta(seconds=deviation)
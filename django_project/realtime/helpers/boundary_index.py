@@ -0,0 +1,256 @@
+# coding=utf-8
+"""In memory index of boundaries used to upsert boundaries in bulk."""
+from builtins import object
+import logging
+
+from django.db import connection
+from psycopg2 import Binary
+
+from realtime.app_settings import LOGGER_NAME, BULK_CREATE_BATCH_SIZE
+from realtime.models.flood import Boundary
+
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+def normalize_boundary_name(name):
+    """Normalize boundary name so it can be used as case insensitive key.
+
+    :param name: The boundary name
+    :type name: basestring
+
+    :return: Stripped and lower cased name
+    :rtype: basestring
+    """
+    if not name:
+        return ''
+    return name.strip().lower()
+
+
+class BoundaryIndex(object):
+    """Index of boundaries for a given list of boundary aliases.
+
+    All boundaries of the aliases are loaded once and kept in memory, keyed
+    by (alias id, normalized name) and (alias id, upstream id). Upserted
+    boundaries are only collected in memory. Nothing is written to the
+    database until :meth:`flush` is called, which then inserts the new
+    boundaries and updates the changed ones in bulk.
+
+    Existing boundaries are only updated if their name, parent, or geometry
+    really changed.
+    """
+
+    def __init__(self, boundary_aliases):
+        """Preload boundaries of the given aliases.
+
+        :param boundary_aliases: List of BoundaryAlias to index
+        :type boundary_aliases: list[realtime.models.flood.BoundaryAlias]
+        """
+        # Parent level should be flushed first
+        self.boundary_aliases = sorted(
+            boundary_aliases, key=lambda a: a.osm_level)
+        self._by_name = {}
+        self._by_upstream_id = {}
+        # Unsaved boundaries to insert, in insertion order
+        self._new_boundaries = []
+        # Saved boundaries which needs to be updated, keyed by id
+        self._changed_boundaries = {}
+        # Parent of boundaries, keyed by python object id, used to resolve
+        # parent that is not yet saved
+        self._parents = {}
+
+        queryset = Boundary.objects.filter(
+            boundary_alias__in=self.boundary_aliases)
+        for boundary in queryset.iterator():
+            self._index(boundary)
+
+    def _index(self, boundary):
+        alias_id = boundary.boundary_alias_id
+        name_key = (alias_id, normalize_boundary_name(boundary.name))
+        # Keep the first match, the same as .first() on the name
+        if name_key not in self._by_name:
+            self._by_name[name_key] = boundary
+        if boundary.upstream_id:
+            self._by_upstream_id[(alias_id, boundary.upstream_id)] = boundary
+
+    def get_by_name(self, boundary_alias, name):
+        """Find boundary by case insensitive name.
+
+        :rtype: realtime.models.flood.Boundary
+        """
+        return self._by_name.get(
+            (boundary_alias.id, normalize_boundary_name(name)))
+
+    def get_by_upstream_id(self, boundary_alias, upstream_id):
+        """Find boundary by its upstream id.
+
+        :rtype: realtime.models.flood.Boundary
+        """
+        return self._by_upstream_id.get((boundary_alias.id, upstream_id))
+
+    def add(self, boundary_alias, name, upstream_id, geometry, parent=None):
+        """Register a new boundary to be inserted on flush.
+
+        :return: The unsaved boundary. It will have its id after flush.
+        :rtype: realtime.models.flood.Boundary
+        """
+        boundary = Boundary(
+            upstream_id=upstream_id,
+            name=name,
+            geometry=geometry,
+            boundary_alias=boundary_alias)
+        self._parents[id(boundary)] = parent
+        self._new_boundaries.append(boundary)
+        self._index(boundary)
+        return boundary
+
+    def upsert_by_upstream_id(
+            self, boundary_alias, upstream_id, name, geometry, parent=None):
+        """Insert or update a boundary identified by its upstream id.
+
+        :return: The boundary. It will have its id after flush.
+        :rtype: realtime.models.flood.Boundary
+        """
+        boundary = self.get_by_upstream_id(boundary_alias, upstream_id)
+        if not boundary:
+            return self.add(
+                boundary_alias, name, upstream_id, geometry, parent=parent)
+
+        if boundary.pk is None:
+            # Added during this session, just replace the values
+            boundary.name = name
+            boundary.geometry = geometry
+            self._parents[id(boundary)] = parent
+            return boundary
+
+        current_parent_id = boundary.parent_id
+        if parent is None:
+            parent_changed = current_parent_id is not None
+        else:
+            parent_changed = parent.pk != current_parent_id
+        geometry_changed = not boundary.geometry.equals_exact(geometry)
+
+        if boundary.name != name or parent_changed or geometry_changed:
+            boundary.name = name
+            boundary.geometry = geometry
+            self._parents[id(boundary)] = parent
+            self._changed_boundaries[boundary.pk] = boundary
+
+        return boundary
+
+    def _resolve_parent_id(self, boundary):
+        if id(boundary) not in self._parents:
+            return boundary.parent_id
+        parent = self._parents[id(boundary)]
+        if parent is None:
+            return None
+        return parent.pk
+
+    def flush(self):
+        """Write pending changes to the database.
+
+        Parent levels are written first, so child boundaries can refer to
+        the id of newly created parent.
+        """
+        inserted = 0
+        for boundary_alias in self.boundary_aliases:
+            new_boundaries = [
+                b for b in self._new_boundaries
+                if b.boundary_alias_id == boundary_alias.id]
+            for boundary in new_boundaries:
+                boundary.parent_id = self._resolve_parent_id(boundary)
+            self._insert(boundary_alias, new_boundaries)
+            inserted += len(new_boundaries)
+
+        changed_boundaries = list(self._changed_boundaries.values())
+        for boundary in changed_boundaries:
+            boundary.parent_id = self._resolve_parent_id(boundary)
+        self._update(changed_boundaries)
+
+        LOGGER.info('Boundary index flushed: {0} new, {1} updated'.format(
+            inserted, len(changed_boundaries)))
+
+        self._new_boundaries = []
+        self._changed_boundaries = {}
+        self._parents = {}
+
+    def _insert(self, boundary_alias, boundaries):
+        """Bulk insert new boundaries and assign their ids back.
+
+        bulk_create doesn't return primary keys in this Django version, so
+        the rows are inserted with INSERT ... RETURNING, which returns the
+        ids in the order of the inserted rows.
+        """
+        if not boundaries:
+            return
+
+        geometry_field = Boundary._meta.get_field('geometry')
+        srid = geometry_field.srid
+        row_sql = (
+            '(%s, %s, %s, ST_Transform(ST_GeomFromEWKB(%s::bytea), {srid}), '
+            '%s)').format(srid=srid)
+        insert_sql = (
+            'INSERT INTO {table} '
+            '(upstream_id, name, parent_id, {geometry}, boundary_alias_id) '
+            'VALUES {rows} RETURNING id')
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(boundaries), BULK_CREATE_BATCH_SIZE):
+                batch = boundaries[start:start + BULK_CREATE_BATCH_SIZE]
+                params = []
+                for boundary in batch:
+                    geometry = boundary.geometry
+                    if not geometry.srid:
+                        geometry.srid = srid
+                    params.extend([
+                        boundary.upstream_id,
+                        boundary.name,
+                        boundary.parent_id,
+                        Binary(bytes(geometry.ewkb)),
+                        boundary_alias.id])
+                cursor.execute(
+                    insert_sql.format(
+                        table=Boundary._meta.db_table,
+                        geometry=geometry_field.column,
+                        rows=', '.join([row_sql] * len(batch))),
+                    params)
+                for boundary, (pk, ) in zip(batch, cursor.fetchall()):
+                    boundary.pk = pk
+
+    def _update(self, boundaries):
+        """Bulk update changed boundaries using a single statement per batch.
+        """
+        if not boundaries:
+            return
+
+        geometry_field = Boundary._meta.get_field('geometry')
+        srid = geometry_field.srid
+        row_sql = '(%s::integer, %s::varchar, %s::integer, %s::bytea)'
+        update_sql = (
+            'UPDATE {table} AS b SET '
+            'name = v.name, '
+            'parent_id = v.parent_id, '
+            '{geometry} = ST_Transform(ST_GeomFromEWKB(v.geometry), {srid}) '
+            'FROM (VALUES {rows}) AS v(id, name, parent_id, geometry) '
+            'WHERE b.id = v.id')
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(boundaries), BULK_CREATE_BATCH_SIZE):
+                batch = boundaries[start:start + BULK_CREATE_BATCH_SIZE]
+                params = []
+                for boundary in batch:
+                    geometry = boundary.geometry
+                    if not geometry.srid:
+                        geometry.srid = srid
+                    params.extend([
+                        boundary.pk,
+                        boundary.name,
+                        boundary.parent_id,
+                        Binary(bytes(geometry.ewkb))])
+                cursor.execute(
+                    update_sql.format(
+                        table=Boundary._meta.db_table,
+                        geometry=geometry_field.column,
+                        srid=srid,
+                        rows=', '.join([row_sql] * len(batch))),
+                    params)
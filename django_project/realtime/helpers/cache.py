@@ -0,0 +1,85 @@
+# coding=utf-8
+"""Versioned cache helpers.
+
+Cached values are stored under a key that contains the current version of
+its namespace. Invalidating a whole namespace is done by bumping the version,
+old entries are then never read again and expire by themselves.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(namespace):
+    return 'realtime:version:{0}'.format(namespace)
+
+
+def get_cache_version(namespace):
+    """Return current version of a cache namespace.
+
+    :param namespace: Cache namespace
+    :type namespace: str
+
+    :return: The version
+    :rtype: int
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Start from current time in milliseconds, so an evicted version key
+        # never goes back to a version that still has cached entries
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(namespace):
+    """Invalidate all cached values of a namespace.
+
+    :param namespace: Cache namespace
+    :type namespace: str
+    """
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Version key doesn't exists yet
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def bump_cache_versions(namespaces):
+    """Invalidate all cached values of many namespaces at once.
+
+    :param namespaces: Cache namespaces
+    :type namespaces: list[str]
+    """
+    keys = [_version_key(namespace) for namespace in namespaces]
+    if not keys:
+        return
+    current_versions = cache.get_many(keys)
+    now = int(time.time() * 1000)
+    cache.set_many(
+        {
+            key: max(now, current_versions.get(key, 0) + 1)
+            for key in keys
+        },
+        None)
+
+
+def versioned_cache_key(namespace, *parts):
+    """Build a cache key bound to the current version of the namespace.
+
+    :param namespace: Cache namespace
+    :type namespace: str
+
+    :param parts: Values that identify the cached value, e.g. filters
+    :type parts: list
+
+    :return: The cache key
+    :rtype: str
+    """
+    digest = hashlib.md5(
+        repr(parts).encode('utf-8')).hexdigest()
+    return 'realtime:{0}:{1}:{2}'.format(
+        namespace, get_cache_version(namespace), digest)
@@ -0,0 +1,95 @@
+# coding=utf-8
+"""Precompressed variants of response bodies.
+
+Large responses are compressed once, when they are built, in every content
+coding we can send. Requests then only pick the variant accepted by the
+client, nothing is compressed per request.
+"""
+import re
+
+from realtime.app_settings import BROTLI_QUALITY, GZIP_LEVEL
+from realtime.utils import gzip_compress
+
+try:
+    import brotli
+except ImportError:
+    # Brotli variants are skipped, gzip is always available
+    brotli = None
+
+GZIP_ENCODING = 'gzip'
+BROTLI_ENCODING = 'br'
+
+# Content codings in order of preference, the smallest first
+ENCODINGS_PREFERENCE = (BROTLI_ENCODING, GZIP_ENCODING)
+
+ACCEPT_ENCODING_RE = re.compile(
+    r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+def compress_variants(content):
+    """Compress content in every available content coding.
+
+    :param content: The uncompressed content
+    :type content: bytes, unicode
+
+    :return: Dictionary of content coding and compressed content. Always
+        contains the gzip variant.
+    :rtype: dict
+    """
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    variants = {
+        GZIP_ENCODING: gzip_compress(content, GZIP_LEVEL)
+    }
+    if brotli:
+        variants[BROTLI_ENCODING] = brotli.compress(
+            content, quality=BROTLI_QUALITY)
+    return variants
+
+
+def accepted_encodings(accept_encoding):
+    """Parse Accept-Encoding header.
+
+    :param accept_encoding: Value of the Accept-Encoding header
+    :type accept_encoding: str
+
+    :return: Dictionary of content coding and its quality value
+    :rtype: dict
+    """
+    encodings = {}
+    for item in accept_encoding.split(','):
+        match = ACCEPT_ENCODING_RE.match(item)
+        if not match:
+            continue
+        encoding, quality = match.groups()
+        try:
+            quality = float(quality) if quality else 1.0
+        except ValueError:
+            continue
+        encodings[encoding.lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(accept_encoding, available):
+    """Choose the content coding to send.
+
+    :param accept_encoding: Value of the Accept-Encoding header
+    :type accept_encoding: str
+
+    :param available: Content codings of the precompressed variants
+    :type available: list[str]
+
+    :return: The chosen content coding, None to send identity
+    :rtype: str
+    """
+    encodings = accepted_encodings(accept_encoding)
+    wildcard = encodings.get('*', 0)
+    candidates = [
+        (encodings.get(encoding, wildcard), -index, encoding)
+        for index, encoding in enumerate(ENCODINGS_PREFERENCE)
+        if encoding in available]
+    candidates = [c for c in candidates if c[0] > 0]
+    if not candidates:
+        return None
+    # Highest quality first, then our preference
+    return max(candidates)[2]
@@ -0,0 +1,103 @@
+# coding=utf-8
+"""Bulk ingestion of earthquakes."""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from realtime.app_settings import (
+    BULK_CREATE_BATCH_SIZE,
+    EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
+from realtime.helpers.cache import bump_cache_version
+from realtime.models.blob import EventBlob
+from realtime.models.earthquake import Earthquake
+from realtime.utils import gzip_compress
+
+
+def _fetch_earthquakes(keys):
+    """Fetch earthquakes by their shake_id and source_type in one query."""
+    shake_ids = set(shake_id for shake_id, _ in keys)
+    return [
+        earthquake for earthquake in Earthquake.objects.filter(
+            shake_id__in=shake_ids)
+        if (earthquake.shake_id, earthquake.source_type) in keys]
+
+
+def stored_shakemaps(keys):
+    """Return which shakemaps are already stored.
+
+    :param keys: Shake id and source type of the shakemaps
+    :type keys: set[(str, str)]
+
+    :return: Shake id and source type of the stored shakemaps
+    :rtype: set[(str, str)]
+    """
+    shake_ids = set(shake_id for shake_id, _ in keys)
+    stored = Earthquake.objects.filter(shake_id__in=shake_ids).values_list(
+        'shake_id', 'source_type')
+    return set(stored) & set(keys)
+
+
+def bulk_create_earthquakes(events):
+    """Insert many earthquakes with their shake grids.
+
+    Earthquakes and shake grids are inserted with bulk queries, without
+    sending post_save. Shakemaps are linked to their matching shakemaps,
+    like when a shake grid is stored by the processing pipeline.
+
+    :param events: Validated data of the earthquakes. The shake grid
+        contents, if any, are in shake_grid_xml.
+    :type events: list[dict]
+
+    :return: The created earthquakes
+    :rtype: list[Earthquake]
+    """
+    grids = {}
+    instances = []
+    for data in events:
+        data = dict(data)
+        shake_grid_xml = data.pop('shake_grid_xml', None)
+        instance = Earthquake(**data)
+        if shake_grid_xml:
+            grids[(instance.shake_id, instance.source_type)] = shake_grid_xml
+            instance.shake_grid_saved = True
+        instances.append(instance)
+    keys = set(
+        (instance.shake_id, instance.source_type) for instance in instances)
+
+    with transaction.atomic():
+        Earthquake.objects.bulk_create(
+            instances, batch_size=BULK_CREATE_BATCH_SIZE)
+        # bulk_create doesn't set primary keys
+        earthquakes = _fetch_earthquakes(keys)
+
+        # Contents are stored compressed, out of the earthquake table
+        content_type = ContentType.objects.get_for_model(Earthquake)
+        blobs = []
+        for earthquake in earthquakes:
+            shake_grid_xml = grids.get(
+                (earthquake.shake_id, earthquake.source_type))
+            if not shake_grid_xml:
+                continue
+            content = shake_grid_xml.encode('utf-8')
+            blobs.append(EventBlob(
+                content_type=content_type,
+                object_id=earthquake.pk,
+                name=Earthquake.SHAKE_GRID_XML_BLOB,
+                content=gzip_compress(content),
+                size=len(content)))
+        EventBlob.objects.bulk_create(
+            blobs, batch_size=BULK_CREATE_BATCH_SIZE)
+
+        initial_ids = set()
+        for earthquake in earthquakes:
+            earthquake.link_shakemaps()
+            if earthquake.source_type == Earthquake.INITIAL_SOURCE_TYPE:
+                initial_ids.add(earthquake.pk)
+            elif earthquake.initial_shakemap_id:
+                initial_ids.add(earthquake.initial_shakemap_id)
+        Earthquake.objects.filter(
+            id__in=initial_ids,
+            corrected_events__isnull=False).update(has_corrected=True)
+
+    # Queryset inserts and updates do not send post_save
+    bump_cache_version(EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
+    return earthquakes
@@ -0,0 +1,212 @@
+# coding=utf-8
+"""Build GeoJSON feature collections of flood events.
+
+Geometries are encoded to GeoJSON by PostGIS and the feature collection is
+assembled as a string, so no geometry is decoded in python.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+
+from realtime.models.flood import (
+    Boundary,
+    BoundaryAlias,
+    BoundaryFloodFrequency,
+    FloodEventBoundary,
+    FloodEventFeatures,
+    ImpactEventBoundary)
+from realtime.app_settings import SIMPLIFIED_ZOOM_LEVELS
+from realtime.helpers.compression import (
+    BROTLI_ENCODING,
+    GZIP_ENCODING,
+    compress_variants)
+from realtime.helpers.simplification import simplify_tolerance
+
+
+def _feature(feature_id, geometry_json, properties):
+    return (
+        '{{"id": {0}, "type": "Feature", "geometry": {1}, '
+        '"properties": {2}}}').format(
+        json.dumps(feature_id),
+        geometry_json,
+        json.dumps(properties, cls=DjangoJSONEncoder))
+
+
+def _geometry_json(column, zoom):
+    """SQL expression of a geometry as GeoJSON, simplified for a zoom."""
+    if zoom is None:
+        return 'ST_AsGeoJSON({0})'.format(column)
+    return 'ST_AsGeoJSON(ST_SimplifyPreserveTopology({0}, {1!r}))'.format(
+        column, simplify_tolerance(zoom))
+
+
+def _feature_collection(features):
+    return '{{"type": "FeatureCollection", "features": [{0}]}}'.format(
+        ', '.join(features))
+
+
+def build_hazard_feature_collection(flood, zoom=None):
+    """Build feature collection of flooded RW boundaries of a flood.
+
+    :param flood: The flood event
+    :type flood: realtime.models.flood.Flood
+
+    :param zoom: Zoom level to simplify geometries for, None for full
+        resolution geometries
+    :type zoom: int
+
+    :return: GeoJSON Feature Collection
+    :rtype: str
+    """
+    query = (
+        'SELECT b.upstream_id, {geometry}, b.name, p.name, '
+        'e.hazard_data '
+        'FROM {event_boundary} AS e '
+        'JOIN {boundary} AS b ON b.id = e.boundary_id '
+        'JOIN {boundary_alias} AS a ON a.id = b.boundary_alias_id '
+        'LEFT JOIN {boundary} AS p ON p.id = b.parent_id '
+        'WHERE e.flood_id = %s AND a.osm_level = 8 AND e.hazard_data > 0 '
+        'ORDER BY e.id').format(
+        geometry=_geometry_json('b.geometry', zoom),
+        event_boundary=FloodEventBoundary._meta.db_table,
+        boundary=Boundary._meta.db_table,
+        boundary_alias=BoundaryAlias._meta.db_table)
+
+    features = []
+    with connection.cursor() as cursor:
+        cursor.execute(query, [flood.event_id])
+        for upstream_id, geometry_json, name, parent_name, hazard_data in (
+                cursor.fetchall()):
+            features.append(_feature(upstream_id, geometry_json, {
+                'event_id': flood.event_id,
+                'time': flood.time,
+                'name': name,
+                'parent_name': parent_name,
+                'hazard_data': hazard_data
+            }))
+    return _feature_collection(features)
+
+
+def build_impact_feature_collection(flood, zoom=None):
+    """Build feature collection of impacted boundaries of a flood.
+
+    :param flood: The flood event
+    :type flood: realtime.models.flood.Flood
+
+    :param zoom: Zoom level to simplify geometries for, None for full
+        resolution geometries
+    :type zoom: int
+
+    :return: GeoJSON Feature Collection
+    :rtype: str
+    """
+    # hazard_class is a string. The previous python filter
+    # hazard_class > 2 was true for any string in python 2, so only empty
+    # hazard class is excluded.
+    query = (
+        'SELECT i.id, {geometry}, p.name, i.hazard_class, '
+        'i.population_affected '
+        'FROM {impact_boundary} AS i '
+        'JOIN {boundary} AS p ON p.id = i.parent_boundary_id '
+        'WHERE i.flood_id = %s AND i.hazard_class IS NOT NULL '
+        'ORDER BY i.id').format(
+        geometry=_geometry_json('i.geometry', zoom),
+        impact_boundary=ImpactEventBoundary._meta.db_table,
+        boundary=Boundary._meta.db_table)
+
+    features = []
+    with connection.cursor() as cursor:
+        cursor.execute(query, [flood.event_id])
+        for (impact_id, geometry_json, parent_name, hazard_class,
+                population_affected) in cursor.fetchall():
+            features.append(_feature(impact_id, geometry_json, {
+                'event_id': flood.event_id,
+                'parent_boundary_name': parent_name,
+                'hazard_class': hazard_class,
+                'people_affected': population_affected
+            }))
+    return _feature_collection(features)
+
+
+def build_flood_frequency_feature_collection(hazard_levels, zoom=None):
+    """Build feature collection of boundaries and their flood count.
+
+    :param hazard_levels: Hazard levels of flood events to count
+    :type hazard_levels: list[int]
+
+    :param zoom: Zoom level to simplify geometries for, None for full
+        resolution geometries
+    :type zoom: int
+
+    :return: GeoJSON Feature Collection
+    :rtype: str
+    """
+    query = (
+        'SELECT b.id, {geometry}, b.name, p.name, '
+        'f.flood_count '
+        'FROM ('
+        'SELECT boundary_id, SUM(flood_count) AS flood_count '
+        'FROM {frequency} '
+        'WHERE hazard_data = ANY(%s) '
+        'GROUP BY boundary_id '
+        'HAVING SUM(flood_count) > 0) AS f '
+        'JOIN {boundary} AS b ON b.id = f.boundary_id '
+        'LEFT JOIN {boundary} AS p ON p.id = b.parent_id '
+        'ORDER BY b.id').format(
+        geometry=_geometry_json('b.geometry', zoom),
+        frequency=BoundaryFloodFrequency._meta.db_table,
+        boundary=Boundary._meta.db_table)
+
+    features = []
+    with connection.cursor() as cursor:
+        cursor.execute(query, [list(hazard_levels)])
+        for boundary_id, geometry_json, name, parent_name, flood_count in (
+                cursor.fetchall()):
+            features.append(_feature(boundary_id, geometry_json, {
+                'name': name,
+                'parent_name': parent_name,
+                'flood_count': int(flood_count)
+            }))
+    return _feature_collection(features)
+
+
+FEATURE_COLLECTION_BUILDERS = {
+    FloodEventFeatures.HAZARD_FEATURES: build_hazard_feature_collection,
+    FloodEventFeatures.IMPACT_FEATURES: build_impact_feature_collection,
+}
+
+
+def update_flood_event_features(flood, feature_type, zoom=None):
+    """Build and store compressed feature collections of a flood.
+
+    The full resolution feature collection and the simplified ones of each
+    zoom level in SIMPLIFIED_ZOOM_LEVELS are stored.
+
+    :param flood: The flood event
+    :type flood: realtime.models.flood.Flood
+
+    :param feature_type: FloodEventFeatures.HAZARD_FEATURES or
+        FloodEventFeatures.IMPACT_FEATURES
+    :type feature_type: str
+
+    :param zoom: The zoom level of the returned feature collection
+    :type zoom: int
+
+    :return: Compressed variants of the feature collection of the zoom level
+    :rtype: dict
+    """
+    builder = FEATURE_COLLECTION_BUILDERS[feature_type]
+    zoom_variants = {}
+    for level in [None] + sorted(SIMPLIFIED_ZOOM_LEVELS):
+        variants = compress_variants(builder(flood, zoom=level))
+        FloodEventFeatures.objects.update_or_create(
+            flood=flood,
+            feature_type=feature_type,
+            zoom=level,
+            defaults={
+                'content': variants[GZIP_ENCODING],
+                'brotli_content': variants.get(BROTLI_ENCODING)
+            })
+        zoom_variants[level] = variants
+    return zoom_variants.get(zoom, zoom_variants[None])
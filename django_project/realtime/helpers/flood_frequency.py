@@ -0,0 +1,123 @@
+# coding=utf-8
+"""Flood frequency and flood history of boundaries."""
+from django.db import connection
+
+from realtime.app_settings import (
+    RW_HISTOGRAM_CACHE_NAMESPACE,
+    FLOOD_FREQUENCY_CACHE_NAMESPACE)
+from realtime.helpers.cache import bump_cache_versions
+from realtime.models.flood import (
+    BoundaryFloodFrequency,
+    Flood,
+    FloodEventBoundary)
+
+
+def _flood_event_counts_query():
+    return (
+        'SELECT boundary_id, hazard_data, COUNT(*) AS flood_count '
+        'FROM {event_boundary} '
+        'WHERE flood_id = %s AND hazard_data IS NOT NULL '
+        'GROUP BY boundary_id, hazard_data').format(
+        event_boundary=FloodEventBoundary._meta.db_table)
+
+
+def add_flood_frequency(flood):
+    """Count flooded boundaries of a flood in the frequency table.
+
+    Should be called after the FloodEventBoundary of the flood is created.
+
+    :param flood: The flood event
+    :type flood: realtime.models.flood.Flood
+    """
+    table = BoundaryFloodFrequency._meta.db_table
+    query = (
+        'INSERT INTO {table} AS f (boundary_id, hazard_data, flood_count) '
+        '{counts} '
+        'ON CONFLICT (boundary_id, hazard_data) DO UPDATE '
+        'SET flood_count = f.flood_count + EXCLUDED.flood_count').format(
+        table=table,
+        counts=_flood_event_counts_query())
+    with connection.cursor() as cursor:
+        cursor.execute(query, [flood.event_id])
+
+
+def remove_flood_frequency(flood):
+    """Uncount flooded boundaries of a flood from the frequency table.
+
+    Should be called before the FloodEventBoundary of the flood is deleted.
+
+    :param flood: The flood event
+    :type flood: realtime.models.flood.Flood
+    """
+    table = BoundaryFloodFrequency._meta.db_table
+    query = (
+        'UPDATE {table} AS f '
+        'SET flood_count = f.flood_count - c.flood_count '
+        'FROM ({counts}) AS c '
+        'WHERE f.boundary_id = c.boundary_id '
+        'AND f.hazard_data = c.hazard_data').format(
+        table=table,
+        counts=_flood_event_counts_query())
+    with connection.cursor() as cursor:
+        cursor.execute(query, [flood.event_id])
+
+
+def flood_histogram(boundary_id, start_date, end_date, hazard_levels):
+    """Daily flood history of a boundary.
+
+    Flood events are bucketed by day. For each day, the event with the
+    highest hazard level is returned.
+
+    :param boundary_id: Id of the boundary
+    :type boundary_id: int
+
+    :param start_date: Only include floods from this time
+    :type start_date: datetime.datetime
+
+    :param end_date: Only include floods until this time
+    :type end_date: datetime.datetime
+
+    :param hazard_levels: Hazard levels of flood events to include
+    :type hazard_levels: list[int]
+
+    :return: List of dict with event_id, time (YYYY-MM-DD) and hazard_class,
+        ordered by time
+    :rtype: list[dict]
+    """
+    query = (
+        'SELECT DISTINCT ON (date_trunc(\'day\', f.time)) '
+        'f.event_id, to_char(f.time, \'YYYY-MM-DD\'), e.hazard_data '
+        'FROM {event_boundary} AS e '
+        'JOIN {flood} AS f ON f.event_id = e.flood_id '
+        'WHERE e.boundary_id = %s '
+        'AND f.time >= %s AND f.time <= %s '
+        'AND e.hazard_data = ANY(%s) '
+        'ORDER BY date_trunc(\'day\', f.time), e.hazard_data DESC, '
+        'f.time').format(
+        event_boundary=FloodEventBoundary._meta.db_table,
+        flood=Flood._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            query, [boundary_id, start_date, end_date, list(hazard_levels)])
+        return [
+            {
+                'event_id': event_id,
+                'time': day,
+                'hazard_class': hazard_data
+            }
+            for event_id, day, hazard_data in cursor.fetchall()
+        ]
+
+
+def invalidate_flood_histogram(boundary_ids):
+    """Invalidate cached flood histogram of boundaries.
+
+    The cached flood frequency feature collection is invalidated too, the
+    flood count of these boundaries changed.
+
+    :param boundary_ids: Id of the boundaries touched by a flood
+    :type boundary_ids: list[int]
+    """
+    bump_cache_versions([FLOOD_FREQUENCY_CACHE_NAMESPACE] + [
+        RW_HISTOGRAM_CACHE_NAMESPACE.format(boundary_id=boundary_id)
+        for boundary_id in set(boundary_ids)])
@@ -0,0 +1,65 @@
+# coding=utf-8
+"""Periodic snapshots of Realtime indicators."""
+from datetime import datetime
+
+import pytz
+
+from realtime.app_settings import (
+    INDICATOR_SNAPSHOT_MAX_AGE,
+    INDICATOR_SNAPSHOT_RETENTION)
+from realtime.helpers.realtime_broker_indicator import RealtimeBrokerIndicator
+from realtime.helpers.rest_push_indicator import RESTPushIndicator
+from realtime.helpers.shake_event_indicator import ShakeEventIndicator
+from realtime.helpers.shakemap_push_indicator import ShakemapPushIndicator
+from realtime.models.indicator import IndicatorSnapshot
+
+# Indicators shown on the indicator page, in order
+INDICATOR_CLASSES = (
+    ShakemapPushIndicator,
+    ShakeEventIndicator,
+    RealtimeBrokerIndicator,
+)
+
+# Indicators recorded in snapshots
+SNAPSHOT_INDICATOR_CLASSES = INDICATOR_CLASSES + (RESTPushIndicator, )
+
+
+def take_indicator_snapshots():
+    """Compute indicators from live tables and store their snapshots.
+
+    Snapshots older than the retention period are deleted.
+
+    :return: The computed indicators
+    :rtype: list[Indicator]
+    """
+    now = datetime.utcnow().replace(tzinfo=pytz.utc)
+    indicators = [cls() for cls in SNAPSHOT_INDICATOR_CLASSES]
+    IndicatorSnapshot.objects.bulk_create(
+        [indicator.snapshot(time=now) for indicator in indicators])
+    IndicatorSnapshot.objects.filter(
+        time__lt=now - INDICATOR_SNAPSHOT_RETENTION).delete()
+    return indicators
+
+
+def latest_indicators(indicator_classes=INDICATOR_CLASSES):
+    """Return indicators loaded from their latest snapshots.
+
+    Indicators without a recent snapshot are computed from live tables.
+
+    :param indicator_classes: Classes of the indicators
+    :type indicator_classes: list[type]
+
+    :return: The indicators, in the same order as their classes
+    :rtype: list[Indicator]
+    """
+    now = datetime.utcnow().replace(tzinfo=pytz.utc)
+    names = [cls.name for cls in indicator_classes]
+    # Latest snapshot of each indicator in one query
+    snapshots = IndicatorSnapshot.objects.filter(
+        indicator__in=names,
+        time__gte=now - INDICATOR_SNAPSHOT_MAX_AGE
+    ).order_by('indicator', '-time').distinct('indicator')
+    snapshots = dict(
+        (snapshot.indicator, snapshot) for snapshot in snapshots)
+    return [
+        cls(snapshot=snapshots.get(cls.name)) for cls in indicator_classes]
@@ -0,0 +1,234 @@
+# coding=utf-8
+"""Processing pipeline of hazard events.
+
+Each hazard event goes through the same steps for each analysis language:
+storing the raw hazard, running the analysis, processing the analysis
+products and generating the report. A pipeline is an ordered transition
+table of these steps. Advancing the pipeline runs the first step that is
+still needed and then waits for the next save of the event.
+
+Two mechanisms keep the number of tasks per event bounded:
+
+* :func:`dispatch_event_task` only enqueues a task if the same task for the
+  same event is not already waiting in the queue.
+* :func:`claim_pipeline_step` atomically records the step being run in the
+  impact of the event. A step that was claimed recently is not run again.
+"""
+from builtins import object
+import logging
+
+from celery import group
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from realtime.app_settings import (
+    LOGGER_NAME,
+    ANALYSIS_LANGUAGES,
+    PIPELINE_DISPATCH_TIMEOUT,
+    PIPELINE_STEP_TIMEOUT)
+from realtime.helpers.task_arguments import task_reference
+from realtime.models.impact import Impact
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+def _dispatch_key(task, event, kwargs):
+    return 'realtime:dispatch:{task}:{model}:{pk}:{kwargs}'.format(
+        task=task.name,
+        model=event._meta.model_name,
+        pk=event.pk,
+        kwargs=','.join(
+            '{0}={1}'.format(key, value)
+            for key, value in sorted(kwargs.items())))
+
+
+def dispatch_event_task(task, event, **kwargs):
+    """Enqueue a task for an event, unless it is already queued.
+
+    The task should call :func:`release_event_task` with the same arguments
+    when it starts.
+
+    :param task: Celery task accepting the event reference as first
+        argument
+    :type task: celery.app.task.Task
+
+    :param event: The hazard event
+    :type event: realtime.models.mixins.BaseEventModel
+
+    :return: True if the task is enqueued
+    :rtype: bool
+    """
+    key = _dispatch_key(task, event, kwargs)
+    if not cache.add(key, True, PIPELINE_DISPATCH_TIMEOUT):
+        LOGGER.debug('Task already queued: {0}'.format(key))
+        return False
+    task.delay(task_reference(event), **kwargs)
+    return True
+
+
+def dispatch_event_task_group(task, events, locales, concurrency, interval):
+    """Enqueue a task for many events as one group with throttled starts.
+
+    Tasks are delayed in batches, so only a number of them start in each
+    interval. Tasks already queued for an event are skipped, like
+    :func:`dispatch_event_task`.
+
+    :param task: Celery task accepting the event reference as first
+        argument and the locale as keyword argument
+    :type task: celery.app.task.Task
+
+    :param events: The hazard events
+    :type events: list[realtime.models.mixins.BaseEventModel]
+
+    :param locales: Locales of each event to run the task for
+    :type locales: list[str]
+
+    :param concurrency: Number of tasks started in each interval
+    :type concurrency: int
+
+    :param interval: Seconds between batches of tasks
+    :type interval: int
+
+    :return: Number of enqueued tasks
+    :rtype: int
+    """
+    signatures = []
+    for event in events:
+        for locale in locales:
+            key = _dispatch_key(task, event, {'locale': locale})
+            if not cache.add(key, True, PIPELINE_DISPATCH_TIMEOUT):
+                LOGGER.debug('Task already queued: {0}'.format(key))
+                continue
+            batch = len(signatures) // max(concurrency, 1)
+            signatures.append(
+                task.s(task_reference(event), locale=locale).set(
+                    countdown=batch * interval))
+    if signatures:
+        group(signatures).apply_async()
+    return len(signatures)
+
+
+def release_event_task(task, event, **kwargs):
+    """Allow the task to be enqueued again for the event.
+
+    :param task: Celery task accepting the event as first argument
+    :type task: celery.app.task.Task
+
+    :param event: The hazard event
+    :type event: realtime.models.mixins.BaseEventModel
+    """
+    cache.delete(_dispatch_key(task, event, kwargs))
+
+
+def claim_pipeline_step(impact, step_name):
+    """Atomically mark a pipeline step as being run.
+
+    :param impact: Impact of the event for the processed language
+    :type impact: realtime.models.impact.Impact
+
+    :param step_name: Name of the step
+    :type step_name: str
+
+    :return: False if the step was already claimed and the claim is not
+        stale yet
+    :rtype: bool
+    """
+    if impact.pk is None:
+        # First step of this language. Tasks creating the impact at the
+        # same time share one row, then only one of them gets the claim.
+        impact.create_or_load()
+
+    now = timezone.now()
+    claimable = (
+        ~Q(pipeline_state=step_name) |
+        Q(pipeline_updated__isnull=True) |
+        Q(pipeline_updated__lt=now - PIPELINE_STEP_TIMEOUT))
+    claimed = Impact.objects.filter(claimable, id=impact.id).update(
+        pipeline_state=step_name,
+        pipeline_updated=now)
+    if claimed:
+        # Keep the instance in sync, so later saves won't revert the claim
+        impact.pipeline_state = step_name
+        impact.pipeline_updated = now
+    return bool(claimed)
+
+
+class PipelineStep(object):
+    """A step of an event processing pipeline."""
+
+    def __init__(self, name, is_needed, run, shared=False, blocking=True):
+        """Define a pipeline step.
+
+        :param name: Name of the step, stored as pipeline state
+        :type name: str
+
+        :param is_needed: Function accepting the event. Return True if the
+            step still needs to run.
+        :type is_needed: (BaseEventModel) -> bool
+
+        :param run: Function accepting the event and locale to run the step
+        :type run: (BaseEventModel, str) -> None
+
+        :param shared: True if the step doesn't depend on the language. It
+            is only run by the pipeline of the first analysis language, the
+            other languages wait for it.
+        :type shared: bool
+
+        :param blocking: If False, the pipeline continues to the next step
+            right after running this step.
+        :type blocking: bool
+        """
+        self.name = name
+        self.is_needed = is_needed
+        self.run = run
+        self.shared = shared
+        self.blocking = blocking
+
+
+class EventPipeline(object):
+    """Ordered transition table of an event processing pipeline."""
+
+    def __init__(self, steps):
+        """
+        :param steps: Pipeline steps in processing order
+        :type steps: list[PipelineStep]
+        """
+        self.steps = steps
+
+    def advance(self, event, locale):
+        """Run the next needed step of the event.
+
+        :param event: The hazard event
+        :type event: realtime.models.mixins.BaseEventModel
+
+        :param locale: The language being processed
+        :type locale: str
+
+        :return: Name of the last step run, if any
+        :rtype: str
+        """
+        event.inspected_language = locale
+        last_step = None
+        for step in self.steps:
+            if not step.is_needed(event):
+                continue
+
+            if step.shared and not locale == ANALYSIS_LANGUAGES[0]:
+                LOGGER.debug('{0} [{1}] waits for step {2}'.format(
+                    event, locale, step.name))
+                break
+
+            if not claim_pipeline_step(event.impact_object, step.name):
+                LOGGER.info('{0} [{1}] step {2} already running'.format(
+                    event, locale, step.name))
+                break
+
+            LOGGER.info('{0} [{1}] running step {2}'.format(
+                event, locale, step.name))
+            step.run(event, locale)
+            last_step = step.name
+
+            if step.blocking:
+                break
+        return last_step
@@ -21,8 +21,21 @@ class RealtimeBrokerIndicator(Indicator):
     """An indicator to check the availability of Realtime Broker
     """
 
-    def __init__(self):
+    name = 'realtime_broker'
+
+    def __init__(self, snapshot=None):
+        """
+        :param snapshot: If given, the indicator is loaded from this
+            snapshot instead of live tables
+        :type snapshot: IndicatorSnapshot
+        """
         super(RealtimeBrokerIndicator, self).__init__()
+        self._label = _('Broker Connection Status')
+        # Task id and sent time of the probe waiting for its result
+        self._probe = None
+        if snapshot is not None:
+            self.load_snapshot(snapshot)
+            return
 
         # load from JSON saved object if any
         django_root = settings.DJANGO_ROOT
@@ -38,6 +51,8 @@ class RealtimeBrokerIndicator(Indicator):
         if os.path.exists(pickle_path):
             saved_data = pickle.load(open(pickle_path))
             self._value = saved_data.get('value')
+            self._latency = saved_data.get('latency')
+            self._probe = saved_data.get('probe')
             value = self._value
         else:
             min_time = datetime.fromtimestamp(0, tz=pytz.utc)
@@ -59,20 +74,52 @@ class RealtimeBrokerIndicator(Indicator):
 
         self._healthy_range = healthy_range
         self._warning_range = warning_range
-        self._label = _('Broker Connection Status')
 
     @Indicator.value.setter
     def value(self, val):
         if isinstance(val, datetime):
             val = val.astimezone(pytz.utc)
             self._value = val
-            saved_data = {
-                'value': val
-            }
-            pickle.dump(saved_data, open(self.pickle_path, 'w'))
+            self.save()
         else:
             raise ValueError('Datetime value expected')
 
+    def save(self):
+        """Save value, latency and pending probe of the indicator."""
+        saved_data = {
+            'value': self._value,
+            'latency': self._latency,
+            'probe': self._probe
+        }
+        pickle.dump(saved_data, open(self.pickle_path, 'w'))
+
+    @property
+    def latency(self):
+        """Round trip of the last successful broker connection test.
+
+        :rtype: timedelta
+        """
+        return self._latency
+
+    @latency.setter
+    def latency(self, val):
+        self._latency = val
+
+    @property
+    def probe(self):
+        """The broker connection probe waiting for its result.
+
+        :return: Tuple of the task id and the sent time of the probe, None
+            if there is no pending probe
+        :rtype: (str, datetime)
+        """
+        return self._probe
+
+    @probe.setter
+    def probe(self, val):
+        self._probe = val
+        self.save()
+
     def notes(self):
         available_notes = {
             STATUS_HEALTHY: _(
@@ -2,6 +2,7 @@
 from django.contrib.humanize.templatetags.humanize import naturaltime
 import pytz
 from datetime import datetime
+from django.db import connection
 from django.utils.translation import ugettext as _
 from django.db.models.aggregates import Max
 from realtime.app_settings import REST_INTERVAL_RANGE
@@ -9,7 +10,6 @@ from realtime.helpers.base_indicator import Indicator, STATUS_HEALTHY, \
     STATUS_WARNING, STATUS_CRITICAL
 from realtime.models.user_push import UserPush
 from realtime.templatetags.realtime_extras import naturaltimedelta
-from user_map.models.user import User
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 __date__ = '04/09/15'
@@ -28,8 +28,19 @@ class RESTPushIndicator(Indicator):
     server is broken.
     """
 
-    def __init__(self):
+    name = 'rest_push'
+
+    def __init__(self, snapshot=None):
+        """
+        :param snapshot: If given, the indicator is loaded from this
+            snapshot instead of live tables
+        :type snapshot: IndicatorSnapshot
+        """
         super(RESTPushIndicator, self).__init__()
+        self._label = _('Last REST Push')
+        if snapshot is not None:
+            self.load_snapshot(snapshot)
+            return
 
         value = UserPush.objects.all().aggregate(
             Max('last_rest_push'))['last_rest_push__max']
@@ -61,8 +72,6 @@ class RESTPushIndicator(Indicator):
         self._healthy_range = healthy_range
         self._warning_range = warning_range
 
-        self._label = _('Last REST Push')
-
     def notes(self):
         available_notes = {
             STATUS_HEALTHY: _(
@@ -88,15 +97,27 @@ class RESTPushIndicator(Indicator):
 
 
 def track_rest_push(request):
-    # track the last successfull post/put from user
-    if request.user.is_authenticated():
-        user = User.objects.get(email=request.user.email)
-        try:
-            user_push = UserPush.objects.get(user=user)
-        except UserPush.DoesNotExist:
-            user_push = UserPush.objects.create(user=user)
-            user_push.save()
-
-        # update info
-        user_push.last_rest_push = datetime.utcnow().replace(tzinfo=pytz.utc)
-        user_push.save()
+    """Track the last successful post/put from user.
+
+    The last REST push is written with a single UPSERT, keeping the latest
+    time if pushes of the user are tracked concurrently.
+
+    :param request: A django request object
+    :type request: request
+    """
+    if not request.user.is_authenticated():
+        return
+
+    query = (
+        'INSERT INTO {table} AS p '
+        '(user_id, last_shakemap_push, last_rest_push) '
+        'VALUES (%s, %s, %s) '
+        'ON CONFLICT (user_id) DO UPDATE '
+        'SET last_rest_push = GREATEST('
+        'p.last_rest_push, EXCLUDED.last_rest_push)').format(
+        table=UserPush._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(query, [
+            request.user.pk,
+            datetime.fromtimestamp(0, tz=pytz.utc),
+            datetime.utcnow().replace(tzinfo=pytz.utc)])
@@ -28,8 +28,19 @@ class ShakeEventIndicator(Indicator):
     were no shake at all.
     """
 
-    def __init__(self):
+    name = 'shake_event'
+
+    def __init__(self, snapshot=None):
+        """
+        :param snapshot: If given, the indicator is loaded from this
+            snapshot instead of live tables
+        :type snapshot: IndicatorSnapshot
+        """
         super(ShakeEventIndicator, self).__init__()
+        self._label = _('Last Shake Event')
+        if snapshot is not None:
+            self.load_snapshot(snapshot)
+            return
         # get the last
         value = Earthquake.objects.all().aggregate(
             Max('time'))['time__max']
@@ -73,8 +84,6 @@ class ShakeEventIndicator(Indicator):
         self._healthy_range = healthy_range
         self._warning_range = warning_range
 
-        self._label = _('Last Shake Event')
-
     def notes(self):
         available_notes = {
             STATUS_HEALTHY: _(
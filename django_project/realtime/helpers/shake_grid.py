@@ -0,0 +1,267 @@
+# coding=utf-8
+"""Compact binary raster of ShakeMap grids.
+
+A ShakeMap grid.xml is a regular grid of points, ordered from the north
+west corner, row by row. It is parsed once into a binary file made of a
+small header followed by float32 arrays of MMI, PGA and PGV. The file is
+memory mapped on read, so point queries and summaries don't parse the xml
+again, and only read the pages they need.
+
+Longitudes and latitudes of the points are not stored, the grid is regular
+so they are computed from the header.
+"""
+from builtins import object
+import os
+import struct
+import tempfile
+from xml.etree import ElementTree
+
+import numpy
+
+# Fields of the raster, in storage order, named as in grid.xml
+RASTER_FIELDS = ('MMI', 'PGA', 'PGV')
+
+RASTER_MAGIC = b'SHKGRID1'
+
+# Magic, number of fields, nlon, nlat, lon_min, lat_max, lon_spacing and
+# lat_spacing. The header is 52 bytes, float32 data stays aligned.
+RASTER_HEADER = struct.Struct('<8sIIIdddd')
+
+
+def _local_name(tag):
+    """Tag name without its xml namespace."""
+    return tag.rsplit('}', 1)[-1]
+
+
+class ShakeGrid(object):
+    """Regular grid of ground shaking values.
+
+    Rows go from the north to the south, columns from the west to the
+    east. Values outside of the grid are NaN.
+    """
+
+    def __init__(self, lon_min, lat_max, lon_spacing, lat_spacing, data):
+        """
+        :param lon_min: Longitude of the west column
+        :type lon_min: float
+
+        :param lat_max: Latitude of the north row
+        :type lat_max: float
+
+        :param lon_spacing: Spacing of the columns in degrees
+        :type lon_spacing: float
+
+        :param lat_spacing: Spacing of the rows in degrees
+        :type lat_spacing: float
+
+        :param data: Values of each field of RASTER_FIELDS, with shape
+            (fields, nlat, nlon)
+        :type data: numpy.ndarray
+        """
+        self.lon_min = lon_min
+        self.lat_max = lat_max
+        self.lon_spacing = lon_spacing
+        self.lat_spacing = lat_spacing
+        self.data = data
+
+    @property
+    def nlon(self):
+        return self.data.shape[2]
+
+    @property
+    def nlat(self):
+        return self.data.shape[1]
+
+    @property
+    def lon(self):
+        """Longitudes of the columns.
+
+        :rtype: numpy.ndarray
+        """
+        return self.lon_min + self.lon_spacing * numpy.arange(self.nlon)
+
+    @property
+    def lat(self):
+        """Latitudes of the rows.
+
+        :rtype: numpy.ndarray
+        """
+        return self.lat_max - self.lat_spacing * numpy.arange(self.nlat)
+
+    def field(self, name):
+        """Return the values of a field.
+
+        :param name: Name of the field, one of RASTER_FIELDS
+        :type name: str
+
+        :return: Values with shape (nlat, nlon)
+        :rtype: numpy.ndarray
+        """
+        return self.data[RASTER_FIELDS.index(name.upper())]
+
+    def values_at(self, lons, lats, name='MMI'):
+        """Return the values of the nearest grid points.
+
+        :param lons: Longitudes of the points
+        :type lons: list[float]
+
+        :param lats: Latitudes of the points
+        :type lats: list[float]
+
+        :param name: Name of the field, one of RASTER_FIELDS
+        :type name: str
+
+        :return: The values, NaN for points outside of the grid
+        :rtype: numpy.ndarray
+        """
+        lons = numpy.asarray(lons, dtype=numpy.float64)
+        lats = numpy.asarray(lats, dtype=numpy.float64)
+        columns = numpy.rint(
+            (lons - self.lon_min) / self.lon_spacing).astype(numpy.int64)
+        rows = numpy.rint(
+            (self.lat_max - lats) / self.lat_spacing).astype(numpy.int64)
+        inside = (
+            (columns >= 0) & (columns < self.nlon) &
+            (rows >= 0) & (rows < self.nlat))
+
+        values = numpy.full(lons.shape, numpy.nan, dtype=numpy.float64)
+        values[inside] = self.field(name)[rows[inside], columns[inside]]
+        return values
+
+    def summary(self):
+        """Return the minimum and maximum of each field.
+
+        :return: Dictionary of lowercase field name and its min and max
+        :rtype: dict
+        """
+        return dict(
+            (name.lower(), {
+                'min': float(numpy.nanmin(self.field(name))),
+                'max': float(numpy.nanmax(self.field(name)))
+            })
+            for name in RASTER_FIELDS)
+
+
+def parse_shake_grid(shake_grid_xml):
+    """Parse a ShakeMap grid.xml into a regular grid.
+
+    :param shake_grid_xml: Contents of the grid.xml
+    :type shake_grid_xml: bytes, unicode
+
+    :return: The grid
+    :rtype: ShakeGrid
+
+    :raises: ValueError if the grid.xml is not a complete regular grid
+    """
+    if not isinstance(shake_grid_xml, bytes):
+        shake_grid_xml = shake_grid_xml.encode('utf-8')
+    try:
+        root = ElementTree.fromstring(shake_grid_xml)
+    except ElementTree.ParseError as e:
+        raise ValueError('Invalid grid xml: {0}'.format(e))
+
+    specification = None
+    indexes = {}
+    grid_data = None
+    for element in root:
+        name = _local_name(element.tag)
+        if name == 'grid_specification':
+            specification = element.attrib
+        elif name == 'grid_field':
+            indexes[element.get('name').upper()] = int(
+                element.get('index')) - 1
+        elif name == 'grid_data':
+            grid_data = element.text or ''
+
+    if specification is None or grid_data is None:
+        raise ValueError('Not a ShakeMap grid')
+    missing = set(RASTER_FIELDS + ('LON', 'LAT')) - set(indexes)
+    if missing:
+        raise ValueError(
+            'Missing grid fields: {0}'.format(', '.join(sorted(missing))))
+
+    nlon = int(specification['nlon'])
+    nlat = int(specification['nlat'])
+    values = numpy.fromstring(grid_data, dtype=numpy.float64, sep=' ')
+    if values.size != nlon * nlat * len(indexes):
+        raise ValueError('Incomplete grid data')
+    values = values.reshape(nlat, nlon, len(indexes))
+
+    lon = values[0, :, indexes['LON']]
+    lat = values[:, 0, indexes['LAT']]
+    lon_spacing = (lon[-1] - lon[0]) / max(nlon - 1, 1)
+    lat_spacing = (lat[0] - lat[-1]) / max(nlat - 1, 1)
+
+    data = numpy.stack([
+        values[:, :, indexes[name]] for name in RASTER_FIELDS
+    ]).astype(numpy.float32)
+    return ShakeGrid(
+        float(lon[0]), float(lat[0]),
+        float(lon_spacing), float(lat_spacing),
+        data)
+
+
+def write_shake_grid(shake_grid, path):
+    """Write a grid as a binary raster file.
+
+    The file is written next to its path then renamed, so readers never
+    see a partial file.
+
+    :param shake_grid: The grid
+    :type shake_grid: ShakeGrid
+
+    :param path: Path of the raster file
+    :type path: str
+    """
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory)
+    except OSError:
+        pass
+
+    header = RASTER_HEADER.pack(
+        RASTER_MAGIC,
+        len(RASTER_FIELDS),
+        shake_grid.nlon,
+        shake_grid.nlat,
+        shake_grid.lon_min,
+        shake_grid.lat_max,
+        shake_grid.lon_spacing,
+        shake_grid.lat_spacing)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as raster_file:
+            raster_file.write(header)
+            raster_file.write(numpy.ascontiguousarray(
+                shake_grid.data, dtype='<f4').tobytes())
+        os.rename(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def read_shake_grid(path):
+    """Memory map a binary raster file.
+
+    :param path: Path of the raster file
+    :type path: str
+
+    :return: The grid, its values are read from the file when accessed
+    :rtype: ShakeGrid
+
+    :raises: ValueError if the file is not a raster file
+    """
+    with open(path, 'rb') as raster_file:
+        header = raster_file.read(RASTER_HEADER.size)
+    if len(header) != RASTER_HEADER.size:
+        raise ValueError('Not a shake grid raster')
+    (magic, nfields, nlon, nlat,
+     lon_min, lat_max, lon_spacing, lat_spacing) = RASTER_HEADER.unpack(
+        header)
+    if magic != RASTER_MAGIC or nfields != len(RASTER_FIELDS):
+        raise ValueError('Not a shake grid raster')
+
+    data = numpy.memmap(
+        path, dtype='<f4', mode='r', offset=RASTER_HEADER.size,
+        shape=(nfields, nlat, nlon))
+    return ShakeGrid(lon_min, lat_max, lon_spacing, lat_spacing, data)
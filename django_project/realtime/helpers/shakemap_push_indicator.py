@@ -34,8 +34,19 @@ class ShakemapPushIndicator(Indicator):
     something happened that caused the shakemap didn't get sent.
     """
 
-    def __init__(self):
+    name = 'shakemap_push'
+
+    def __init__(self, snapshot=None):
+        """
+        :param snapshot: If given, the indicator is loaded from this
+            snapshot instead of live tables
+        :type snapshot: IndicatorSnapshot
+        """
         super(ShakemapPushIndicator, self).__init__()
+        self._label = _('Last Shakemap Push')
+        if snapshot is not None:
+            self.load_snapshot(snapshot)
+            return
         # get the last
         value = UserPush.objects.all().aggregate(
             Max('last_shakemap_push'))['last_shakemap_push__max']
@@ -80,8 +91,6 @@ class ShakemapPushIndicator(Indicator):
         self._healthy_range = healthy_range
         self._warning_range = warning_range
 
-        self._label = _('Last Shakemap Push')
-
     def notes(self):
         available_notes = {
             STATUS_HEALTHY: _(
@@ -0,0 +1,79 @@
+# coding=utf-8
+"""Simplified geometries for map clients.
+
+Map clients don't need geometries more detailed than a pixel of their zoom
+level. Geometries are simplified with ST_SimplifyPreserveTopology for a few
+zoom levels when they are stored, and requests pick the closest level.
+"""
+from django.db import connection
+
+from realtime.app_settings import SIMPLIFIED_ZOOM_LEVELS
+from realtime.models.earthquake import (
+    EarthquakeMMIContour,
+    EarthquakeMMIContourGeometry)
+
+# Size of a 256 pixels tile at zoom level 0, in degrees
+TILE_SIZE_DEGREES = 360.0
+
+
+def simplify_tolerance(zoom):
+    """Return the simplification tolerance of a zoom level.
+
+    :param zoom: The zoom level
+    :type zoom: int
+
+    :return: Size of a pixel at the equator in degrees
+    :rtype: float
+    """
+    return TILE_SIZE_DEGREES / (256 * 2 ** zoom)
+
+
+def simplified_zoom_level(zoom):
+    """Return the precomputed zoom level to use for a requested zoom level.
+
+    The lowest precomputed level that is at least as detailed as the
+    requested one is used.
+
+    :param zoom: The zoom level requested by the client, can be a query
+        parameter string
+    :type zoom: int, str
+
+    :return: The precomputed zoom level, None for full resolution
+    :rtype: int
+    """
+    try:
+        zoom = int(zoom)
+    except (TypeError, ValueError):
+        return None
+    for level in sorted(SIMPLIFIED_ZOOM_LEVELS):
+        if level >= zoom:
+            return level
+    return None
+
+
+def store_simplified_contours(earthquake):
+    """Store simplified geometries of the MMI contours of an earthquake.
+
+    Should be called after the contours of the earthquake are created.
+
+    :param earthquake: The earthquake
+    :type earthquake: realtime.models.earthquake.Earthquake
+    """
+    zoom_levels = sorted(SIMPLIFIED_ZOOM_LEVELS)
+    if not zoom_levels:
+        return
+    query = (
+        'INSERT INTO {simplified} (contour_id, zoom, geometry) '
+        'SELECT c.id, z.zoom, '
+        'ST_SimplifyPreserveTopology(ST_Force2D(c.geometry), z.tolerance) '
+        'FROM {contour} AS c '
+        'CROSS JOIN unnest(%s::integer[], %s::double precision[]) '
+        'AS z(zoom, tolerance) '
+        'WHERE c.earthquake_id = %s').format(
+        simplified=EarthquakeMMIContourGeometry._meta.db_table,
+        contour=EarthquakeMMIContour._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(query, [
+            zoom_levels,
+            [simplify_tolerance(zoom) for zoom in zoom_levels],
+            earthquake.id])
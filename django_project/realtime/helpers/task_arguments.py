@@ -0,0 +1,111 @@
+# coding=utf-8
+"""Model instances as task arguments.
+
+Tasks don't receive pickled model instances. They receive a reference made
+of the primary key of the instance and a version stamp of the fields the
+task depends on. The worker fetches the instance again when it starts, so
+the message stays small and JSON serializable, and a message that was sent
+for an older state of the instance is recognized as stale.
+"""
+import hashlib
+import logging
+
+from django.db import models
+
+from realtime.app_settings import LOGGER_NAME
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+def instance_stamp(instance, stamp_fields):
+    """Compute version stamp of an instance.
+
+    :param instance: Model instance
+    :type instance: django.db.models.Model
+
+    :param stamp_fields: Names of attributes the stamp depends on
+    :type stamp_fields: tuple[str]
+
+    :return: Digest of the attribute values, None if there is no stamp field
+    :rtype: str
+    """
+    if not stamp_fields:
+        return None
+    values = [
+        u'{0}'.format(getattr(instance, field) or '')
+        for field in stamp_fields]
+    return hashlib.md5(
+        u'\x00'.join(values).encode('utf-8')).hexdigest()
+
+
+def task_reference(instance, stamp_fields=()):
+    """Build the task argument referencing a model instance.
+
+    :param instance: Saved model instance
+    :type instance: django.db.models.Model
+
+    :param stamp_fields: Names of attributes the task depends on. If one of
+        them changes before the task runs, the task will skip the message.
+    :type stamp_fields: tuple[str]
+
+    :return: JSON serializable reference
+    :rtype: dict
+    """
+    return {
+        'pk': instance.pk,
+        'stamp': instance_stamp(instance, stamp_fields)
+    }
+
+
+def fetch_task_instance(model, reference, stamp_fields=(), locale=None):
+    """Fetch the instance referenced by a task argument.
+
+    Model instances are used as is. Those are either passed by synchronous
+    calls, or come from pickled messages sent before tasks used references.
+
+    :param model: Model class of the instance
+    :type model: type
+
+    :param reference: Reference made by :func:`task_reference`, or a primary
+        key, or a model instance
+    :type reference: dict, int, django.db.models.Model
+
+    :param stamp_fields: The same stamp fields given to
+        :func:`task_reference`
+    :type stamp_fields: tuple[str]
+
+    :param locale: Inspected language to set before checking the stamp, for
+        language dependent attributes
+    :type locale: str
+
+    :return: The instance, or None if it doesn't exist anymore or the stamp
+        doesn't match
+    :rtype: django.db.models.Model
+    """
+    if isinstance(reference, models.Model):
+        if locale:
+            reference.inspected_language = locale
+        return reference
+
+    if isinstance(reference, dict):
+        pk = reference.get('pk')
+        stamp = reference.get('stamp')
+    else:
+        pk = reference
+        stamp = None
+
+    try:
+        instance = model.objects.get(pk=pk)
+    except model.DoesNotExist:
+        LOGGER.info('{0} {1} does not exist anymore'.format(
+            model.__name__, pk))
+        return None
+
+    if locale:
+        instance.inspected_language = locale
+
+    if stamp and stamp != instance_stamp(instance, stamp_fields):
+        LOGGER.info('{0} changed since the task was sent, skipped'.format(
+            instance))
+        return None
+    return instance
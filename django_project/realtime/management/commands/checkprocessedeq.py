@@ -1,11 +1,19 @@
 # coding=utf-8
 import datetime
 import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
 
 from realtime.app_settings import ANALYSIS_LANGUAGES
-from realtime.models.earthquake import Earthquake
+from realtime.models.earthquake import Earthquake, EarthquakeReport
+from realtime.models.impact import Impact
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 
@@ -14,8 +22,9 @@ LOGGER = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    """Script to check earthquake processing status. Can be executed via cronjob.
+    """Script to check earthquake processing status.
 
+    Can be executed via cronjob.
     """
     help = 'Command to check unprocessed eq.'
 
@@ -35,6 +44,104 @@ class Command(BaseCommand):
             default=False,
             help='Just checcking without processing.')
 
+        parser.add_argument(
+            '--workers',
+            type=int,
+            dest='workers',
+            default=8,
+            help='Number of threads checking impact files.')
+
+        parser.add_argument(
+            '--chunk_size',
+            type=int,
+            dest='chunk_size',
+            default=10,
+            help='Number of earthquakes reprocessed at once.')
+
+        parser.add_argument(
+            '--chunk_delay',
+            type=float,
+            dest='chunk_delay',
+            default=60,
+            help='Seconds to wait between reprocessed chunks.')
+
+    @staticmethod
+    def find_missing_reports(since=None):
+        """Find earthquake and language pairs without report.
+
+        :param since: Only check earthquake since this time
+        :type since: datetime.datetime
+
+        :return: List of tuple of earthquake id, language and impact file
+            path of the language, if any
+        :rtype: list[(int, str, str)]
+        """
+        query = (
+            'SELECT e.id, l.language, i.impact_file_path '
+            'FROM {earthquake} AS e '
+            'CROSS JOIN unnest(%s::varchar[]) AS l(language) '
+            'LEFT JOIN {report} AS r '
+            'ON r.earthquake_id = e.id AND r.language = l.language '
+            'AND r.report_pdf IS NOT NULL AND r.report_pdf <> \'\' '
+            'LEFT JOIN ('
+            'SELECT DISTINCT ON (object_id, language) '
+            'object_id, language, impact_file_path '
+            'FROM {impact} '
+            'WHERE content_type_id = %s '
+            'ORDER BY object_id, language, id) AS i '
+            'ON i.object_id = e.id AND i.language = l.language '
+            'WHERE r.id IS NULL {since_filter} '
+            'ORDER BY e.time, e.id, l.language').format(
+            earthquake=Earthquake._meta.db_table,
+            report=EarthquakeReport._meta.db_table,
+            impact=Impact._meta.db_table,
+            since_filter='AND e.time >= %s' if since else '')
+        params = [
+            list(ANALYSIS_LANGUAGES),
+            ContentType.objects.get_for_model(Earthquake).id]
+        if since:
+            params.append(since)
+
+        with connection.cursor() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    @staticmethod
+    def impact_files_exist(paths, workers):
+        """Check existences of impact files using a thread pool.
+
+        :param paths: Impact file paths, can be empty
+        :type paths: list[str]
+
+        :param workers: Number of threads
+        :type workers: int
+
+        :return: Existences of each path
+        :rtype: list[bool]
+        """
+        def exists(path):
+            return bool(path) and os.path.exists(path)
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            return list(executor.map(exists, paths))
+
+    def reprocess(self, earthquakes, rerun_analysis, chunk_size, chunk_delay):
+        """Rerun processing of earthquakes, a chunk at a time.
+
+        Each earthquake sends its processing tasks when it is saved, so the
+        delay between chunks limits the rate of tasks sent to InaSAFE.
+        """
+        chunk_size = max(chunk_size, 1)
+        for start in range(0, len(earthquakes), chunk_size):
+            if start:
+                time.sleep(chunk_delay)
+            for eq in earthquakes[start:start + chunk_size]:
+                if eq.id in rerun_analysis:
+                    eq.rerun_analysis()
+                eq.rerun_report_generation()
+            self.stdout.write('Reprocessed {0} of {1} earthquakes'.format(
+                min(start + chunk_size, len(earthquakes)), len(earthquakes)))
+
     def handle(self, *args, **options):
 
         dry_run = options.get('dry_run')
@@ -43,14 +150,20 @@ class Command(BaseCommand):
 
         try:
             since = datetime.datetime.strptime(since, '%Y/%m/%d')
+            since = timezone.make_aware(since, timezone.utc)
         except BaseException:
             since = None
 
-        qs = Earthquake.objects.all()
-
         if since:
             self.stdout.write('Checking only since: {0}'.format(since))
-            qs = qs.filter(time__gte=since)
+
+        missing_reports = self.find_missing_reports(since=since)
+        impact_exists = self.impact_files_exist(
+            [impact_file_path for _, _, impact_file_path in missing_reports],
+            options.get('workers'))
+
+        earthquakes = Earthquake.objects.in_bulk(
+            set(eq_id for eq_id, _, _ in missing_reports))
 
         # tuple of eq object and language for unprocessed impacts
         unprocessed_impacts = []
@@ -58,57 +171,40 @@ class Command(BaseCommand):
         # tuple of eq object and language for unprocessed reports
         unprocessed_reports = []
 
-        for _e in qs:
-            eq = _e
-            """:type: Earthquake"""
-
-            for lang in ANALYSIS_LANGUAGES:
-                eq.inspected_language = lang
-
-                if eq.has_reports:
-                    # If it has reports, consider it already processed
-                    continue
-                else:
-                    # Need to generate reports
-                    unprocessed_reports.append((eq, lang))
-
-                if not eq.impact_layer_exists:
-                    # Also need to generate impact layers
-                    unprocessed_impacts.append((eq, lang))
+        for (eq_id, lang, _), exists in zip(missing_reports, impact_exists):
+            eq = earthquakes[eq_id]
+            unprocessed_reports.append((eq, lang))
+            if not exists:
+                unprocessed_impacts.append((eq, lang))
 
         if dry_run:
             self.stdout.write('Dry Run result.')
 
         self.stdout.write('Unprocessed impacts:')
 
-        for tup in unprocessed_impacts:
-            lang = tup[1]
-            eq = tup[0]
-            """:type: Earthquake"""
-
+        for eq, lang in unprocessed_impacts:
             self.stdout.write('{0} {1}'.format(lang, eq))
 
-            if not dry_run:
-                eq.inspected_language = lang
-                eq.rerun_analysis()
-                eq.rerun_report_generation()
-
         self.stdout.write('Total Unprocessed impacts ({0})'.format(
             len(unprocessed_impacts)))
         self.stdout.write('')
         self.stdout.write('Unprocessed reports:')
 
-        for tup in unprocessed_reports:
-            lang = tup[1]
-            eq = tup[0]
-            """:type: Earthquake"""
-
+        for eq, lang in unprocessed_reports:
             self.stdout.write('{0} {1}'.format(lang, eq))
-            if not dry_run:
-                eq.inspected_language = lang
-                eq.rerun_report_generation()
 
         self.stdout.write('Total Unprocessed reports ({0})'.format(
             len(unprocessed_reports)))
         self.stdout.write('')
+
+        if not dry_run:
+            # Reprocess each earthquake once for all of its languages
+            reprocessed = OrderedDict(
+                (eq.id, eq) for eq, _ in unprocessed_reports)
+            self.reprocess(
+                list(reprocessed.values()),
+                set(eq.id for eq, _ in unprocessed_impacts),
+                options.get('chunk_size'),
+                options.get('chunk_delay'))
+
         self.stdout.write('Command finished.')
@@ -0,0 +1,85 @@
+# coding=utf-8
+from __future__ import print_function
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from realtime.app_settings import EARTHQUAKE_FEATURE_CACHE_NAMESPACE
+from realtime.helpers.cache import bump_cache_version
+from realtime.models.earthquake import Earthquake
+from realtime.models.flood import Flood
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Script to move raw event contents into compressed blobs.
+
+    Shake grid xml and flood data stored in the event tables are compressed
+    into EventBlob, then cleared from the event tables. Events are converted
+    in batches, each batch in its own transaction, so the command can be
+    interrupted and run again.
+    """
+    help = 'Command to compress raw contents of hazard events.'
+
+    # Model, legacy column, blob name and cache flag of each content
+    CONTENTS = (
+        (Earthquake, 'shake_grid_xml', Earthquake.SHAKE_GRID_XML_BLOB,
+         'shake_grid_saved'),
+        (Flood, 'flood_data', Flood.FLOOD_DATA_BLOB, 'flood_data_saved'),
+    )
+
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            dest='batch_size',
+            default=100,
+            help='Number of events converted per batch.')
+
+    @staticmethod
+    def compress_batch(model, column, blob_name, flag, last_id, batch_size):
+        """Compress the contents of a batch of events.
+
+        :return: Id of the last converted event and number of converted
+            events. Id is None if there is none left.
+        :rtype: (int, int)
+        """
+        queryset = model.objects.filter(
+            id__gt=last_id, **{column + '__isnull': False}).order_by('id')
+        with transaction.atomic():
+            rows = list(queryset.values_list('id', column)[:batch_size])
+            if not rows:
+                return None, 0
+            ids = [event_id for event_id, _ in rows]
+            for event_id, content in rows:
+                if content:
+                    model(id=event_id).store_blob(blob_name, content)
+            model.objects.filter(
+                id__in=[event_id for event_id, content in rows if content]
+            ).update(**{flag: True})
+            model.objects.filter(id__in=ids).update(**{column: None})
+        return ids[-1], len(ids)
+
+    def handle(self, *args, **options):
+
+        batch_size = max(options.get('batch_size'), 1)
+
+        for model, column, blob_name, flag in self.CONTENTS:
+            last_id = 0
+            converted = 0
+            while True:
+                last_id, count = self.compress_batch(
+                    model, column, blob_name, flag, last_id, batch_size)
+                if last_id is None:
+                    break
+                converted += count
+                print('Compressed {0} {1} up to id {2}.'.format(
+                    converted, column, last_id))
+
+        # Queryset update does not send post_save
+        bump_cache_version(EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
+
+        print('Command finished.')
@@ -23,7 +23,8 @@ class Command(BaseCommand):
                 print('Processing: [{0}]'.format(flood_data_filename))
 
                 with open(flood_data_filename) as f:
-                    flood.flood_data = f.read()
-                    flood.save()
+                    flood.store_blob(Flood.FLOOD_DATA_BLOB, f.read())
+                flood.flood_data_saved = True
+                flood.save()
 
         print('Finished.')
@@ -0,0 +1,33 @@
+# coding=utf-8
+from __future__ import print_function
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from realtime.helpers.simplification import store_simplified_contours
+from realtime.models.earthquake import Earthquake
+
+
+class Command(BaseCommand):
+    """Script to precompute simplified MMI contours of earthquakes.
+
+    Only earthquakes with contours stored before simplified geometries were
+    precomputed are processed.
+    """
+    help = 'Command to precompute simplified MMI contours.'
+
+    def handle(self, *args, **options):
+
+        earthquakes = Earthquake.objects.filter(
+            contours__isnull=False,
+            contours__simplified_geometries__isnull=True).distinct()
+
+        count = 0
+        for earthquake in earthquakes.iterator():
+            with transaction.atomic():
+                store_simplified_contours(earthquake)
+            count += 1
+            print('Simplified contours of {0}'.format(earthquake))
+
+        print('Simplified contours of {0} EQ.'.format(count))
+        print('Command finished.')
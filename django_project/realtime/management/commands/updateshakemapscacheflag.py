@@ -1,10 +1,19 @@
 # coding=utf-8
 from __future__ import print_function
+import datetime
+import json
 import logging
+import os
 
+from django.contrib.contenttypes.models import ContentType
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
 
-from realtime.models.earthquake import Earthquake
+from realtime.app_settings import EARTHQUAKE_FEATURE_CACHE_NAMESPACE
+from realtime.helpers.cache import bump_cache_version
+from realtime.models.blob import EventBlob
+from realtime.models.earthquake import Earthquake, EarthquakeMMIContour
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 
@@ -15,31 +24,163 @@ LOGGER = logging.getLogger(__name__)
 class Command(BaseCommand):
     """Script to check has_corrected status of a shakemaps
 
+    Flags are recomputed in batches of earthquakes, using a few UPDATE
+    statements per batch. The id of the last updated earthquake is written
+    in a checkpoint file after each batch, so an interrupted run resumes
+    from there.
     """
     help = 'Command to check cache flags of shakemaps'
 
+    def add_arguments(self, parser):
+
+        parser.add_argument(
+            '--since',
+            type=str,
+            dest='since',
+            help='Only check shakemaps since this date - format YYYY/MM/DD')
+
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            dest='batch_size',
+            default=1000,
+            help='Number of shakemaps updated per batch.')
+
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            dest='checkpoint',
+            default=None,
+            help='File to store progress, to resume an interrupted run.')
+
+    @staticmethod
+    def read_checkpoint(checkpoint, since):
+        """Return the last updated earthquake id of a previous run."""
+        if not checkpoint or not os.path.exists(checkpoint):
+            return None
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state.get('since') != since:
+            # Checkpoint of another run
+            return None
+        return state.get('last_id')
+
+    @staticmethod
+    def write_checkpoint(checkpoint, since, last_id):
+        if not checkpoint:
+            return
+        with open(checkpoint, 'w') as f:
+            json.dump({'since': since, 'last_id': last_id}, f)
+
+    @staticmethod
+    def update_flags(earthquake_ids):
+        """Recompute cache flags of the given earthquakes.
+
+        :param earthquake_ids: Id of the earthquakes
+        :type earthquake_ids: list[int]
+
+        :return: Number of updated rows for each flag
+        :rtype: dict
+        """
+        earthquake = Earthquake._meta.db_table
+        queries = {
+            'shake_grid_saved': (
+                'UPDATE {earthquake} AS e SET shake_grid_saved = TRUE '
+                'WHERE e.id = ANY(%s) AND NOT e.shake_grid_saved '
+                'AND ((e.shake_grid_xml IS NOT NULL '
+                'AND e.shake_grid_xml <> \'\') OR EXISTS('
+                'SELECT 1 FROM {blob} AS b '
+                'WHERE b.object_id = e.id AND b.content_type_id = %s '
+                'AND b.name = %s))'
+            ).format(earthquake=earthquake, blob=EventBlob._meta.db_table),
+            # Corrected shakemaps are linked to their initial one when they
+            # are stored, see Earthquake.link_shakemaps
+            'has_corrected': (
+                'UPDATE {earthquake} AS e '
+                'SET has_corrected = s.has_corrected '
+                'FROM ('
+                'SELECT i.id, EXISTS('
+                'SELECT 1 FROM {earthquake} AS c '
+                'WHERE c.initial_shakemap_id = i.id'
+                ') AS has_corrected '
+                'FROM {earthquake} AS i '
+                'WHERE i.id = ANY(%s) AND i.source_type = %s) AS s '
+                'WHERE e.id = s.id '
+                'AND e.has_corrected IS DISTINCT FROM s.has_corrected'
+            ).format(earthquake=earthquake),
+            'mmi_layer_saved': (
+                'UPDATE {earthquake} AS e '
+                'SET mmi_layer_saved = s.mmi_layer_saved '
+                'FROM ('
+                'SELECT i.id, EXISTS('
+                'SELECT 1 FROM {contour} AS c WHERE c.earthquake_id = i.id'
+                ') AS mmi_layer_saved '
+                'FROM {earthquake} AS i WHERE i.id = ANY(%s)) AS s '
+                'WHERE e.id = s.id '
+                'AND e.mmi_layer_saved IS DISTINCT FROM s.mmi_layer_saved'
+            ).format(
+                earthquake=earthquake,
+                contour=EarthquakeMMIContour._meta.db_table),
+        }
+        params = {
+            'shake_grid_saved': [
+                earthquake_ids,
+                ContentType.objects.get_for_model(Earthquake).id,
+                Earthquake.SHAKE_GRID_XML_BLOB],
+            'has_corrected': [earthquake_ids, Earthquake.INITIAL_SOURCE_TYPE],
+            'mmi_layer_saved': [earthquake_ids],
+        }
+
+        updated = {}
+        with transaction.atomic(), connection.cursor() as cursor:
+            for flag in ('shake_grid_saved', 'has_corrected',
+                         'mmi_layer_saved'):
+                cursor.execute(queries[flag], params[flag])
+                updated[flag] = cursor.rowcount
+        return updated
+
     def handle(self, *args, **options):
 
+        since = options.get('since')
+        checkpoint = options.get('checkpoint')
+        batch_size = max(options.get('batch_size'), 1)
+
         earthquakes = Earthquake.objects.all()
-        for _eq in earthquakes.iterator():
-            eq = _eq
-            """:type: Earthquake"""
-
-            if eq.shake_grid_xml:
-                Earthquake.objects.filter(id=eq.id).update(
-                    shake_grid_saved=True)
-                eq.refresh_from_db()
-
-            if eq.source_type == Earthquake.INITIAL_SOURCE_TYPE:
-                eq.mark_shakemaps_has_corrected()
-                eq.refresh_from_db()
-                print('Inspecting EQ: {0}. Has corrected: {1}'.format(
-                    eq.shake_id, eq.has_corrected))
-
-            eq.mark_shakemaps_has_contours()
-            eq.refresh_from_db()
-            print('Inspecting EQ: {0}. Has contours: {1}'.format(
-                eq.shake_id,
-                eq.mmi_layer_saved))
+        if since:
+            since_time = datetime.datetime.strptime(since, '%Y/%m/%d')
+            earthquakes = earthquakes.filter(
+                time__gte=timezone.make_aware(since_time, timezone.utc))
+            print('Checking only since: {0}'.format(since))
+
+        last_id = self.read_checkpoint(checkpoint, since)
+        if last_id:
+            earthquakes = earthquakes.filter(id__gt=last_id)
+            print('Resuming after EQ id: {0}'.format(last_id))
+
+        earthquake_ids = list(
+            earthquakes.order_by('id').values_list('id', flat=True))
+
+        total = {
+            'shake_grid_saved': 0,
+            'has_corrected': 0,
+            'mmi_layer_saved': 0
+        }
+        for start in range(0, len(earthquake_ids), batch_size):
+            batch = earthquake_ids[start:start + batch_size]
+            updated = self.update_flags(batch)
+            for flag, count in updated.items():
+                total[flag] += count
+            self.write_checkpoint(checkpoint, since, batch[-1])
+            print('Inspected {0} of {1} EQ.'.format(
+                start + len(batch), len(earthquake_ids)))
+
+        # Queryset update does not send post_save
+        bump_cache_version(EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        for flag, count in sorted(total.items()):
+            print('Updated {0}: {1}'.format(flag, count))
 
         print('Command finished.')
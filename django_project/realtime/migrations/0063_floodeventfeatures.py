@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0062_auto_20180511_1932'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FloodEventFeatures',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('feature_type', models.CharField(help_text='The kind of boundaries in the feature collection', max_length=10, verbose_name='Feature Type', choices=[('hazard', 'Flooded boundaries'), ('impact', 'Impacted boundaries')])),
+                ('content', models.BinaryField(help_text='Gzip compressed GeoJSON Feature Collection', verbose_name='Feature Collection')),
+                ('flood', models.ForeignKey(related_name='feature_collections', to_field='event_id', to='realtime.Flood', help_text='The flood event of the feature collection', verbose_name='Flood Event')),
+            ],
+            options={
+                'verbose_name_plural': 'Flood Event Features',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='floodeventfeatures',
+            unique_together=set([('flood', 'feature_type')]),
+        ),
+    ]
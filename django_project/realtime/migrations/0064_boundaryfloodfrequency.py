@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0063_floodeventfeatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoundaryFloodFrequency',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('hazard_data', models.IntegerField(help_text='Hazard level of the flood events', verbose_name='Hazard Level')),
+                ('flood_count', models.IntegerField(default=0, help_text='Number of flood events with the hazard level', verbose_name='Flood Count')),
+                ('boundary', models.ForeignKey(related_name='flood_frequency', verbose_name='Boundary', to='realtime.Boundary', help_text='The flooded boundary')),
+            ],
+            options={
+                'verbose_name_plural': 'Boundary Flood Frequencies',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='boundaryfloodfrequency',
+            unique_together=set([('boundary', 'hazard_data')]),
+        ),
+        # Populate from existing flood events
+        migrations.RunSQL(
+            'INSERT INTO realtime_boundaryfloodfrequency '
+            '(boundary_id, hazard_data, flood_count) '
+            'SELECT boundary_id, hazard_data, COUNT(*) '
+            'FROM realtime_floodeventboundary '
+            'WHERE hazard_data IS NOT NULL '
+            'GROUP BY boundary_id, hazard_data',
+            reverse_sql=migrations.RunSQL.noop),
+    ]
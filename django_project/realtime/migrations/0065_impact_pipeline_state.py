@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0064_boundaryfloodfrequency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='impact',
+            name='pipeline_state',
+            field=models.CharField(default='', help_text='The last processing step run for this impact', max_length=30, verbose_name='Pipeline state', blank=True),
+        ),
+        migrations.AddField(
+            model_name='impact',
+            name='pipeline_updated',
+            field=models.DateTimeField(help_text='The time the last processing step was run', null=True, verbose_name='Pipeline updated', blank=True),
+        ),
+    ]
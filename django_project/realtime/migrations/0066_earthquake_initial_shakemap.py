@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0065_impact_pipeline_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='earthquake',
+            name='initial_shakemap',
+            field=models.ForeignKey(related_name='corrected_events', on_delete=django.db.models.deletion.SET_NULL, default=None, blank=True, to='realtime.Earthquake', help_text='The initial shakemap of this corrected shakemap.', null=True, verbose_name='Initial shakemap'),
+        ),
+        migrations.AlterIndexTogether(
+            name='earthquake',
+            index_together=set([('source_type', 'time')]),
+        ),
+        # Link existing corrected shakemaps, using the exact matching rules:
+        # same time, preferring the same location and magnitude.
+        migrations.RunSQL(
+            sql=(
+                "UPDATE realtime_earthquake AS c SET initial_shakemap_id = ("
+                "SELECT i.id FROM realtime_earthquake AS i "
+                "WHERE i.source_type = 'initial' AND i.time = c.time "
+                "ORDER BY (ST_Equals(i.location, c.location) "
+                "AND i.magnitude = c.magnitude) DESC, i.shake_id DESC "
+                "LIMIT 1) "
+                "WHERE c.source_type = 'corrected'"),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
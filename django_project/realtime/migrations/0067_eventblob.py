@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('realtime', '0066_earthquake_initial_shakemap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventBlob',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('object_id', models.PositiveIntegerField()),
+                ('name', models.CharField(help_text='Name of the content, e.g. shake_grid_xml', max_length=30, verbose_name='Name')),
+                ('content', models.BinaryField(help_text='Gzip compressed content', verbose_name='Content')),
+                ('size', models.BigIntegerField(default=0, help_text='Size of the uncompressed content in bytes', verbose_name='Size')),
+                ('content_type', models.ForeignKey(to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='eventblob',
+            unique_together=set([('content_type', 'object_id', 'name')]),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0067_eventblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='floodeventfeatures',
+            name='brotli_content',
+            field=models.BinaryField(help_text='Brotli compressed GeoJSON Feature Collection', null=True, verbose_name='Brotli Feature Collection', blank=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.contrib.gis.db.models.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0068_floodeventfeatures_brotli_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EarthquakeMMIContourGeometry',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('zoom', models.PositiveSmallIntegerField(help_text='Zoom level the geometry is simplified for', verbose_name='Zoom level')),
+                ('geometry', django.contrib.gis.db.models.fields.GeometryField(help_text='Simplified 2D geometry of the MMI contour', srid=4326, verbose_name='Simplified geometry of the MMI contour')),
+                ('contour', models.ForeignKey(related_name='simplified_geometries', to='realtime.EarthquakeMMIContour')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='earthquakemmicontourgeometry',
+            unique_together=set([('contour', 'zoom')]),
+        ),
+        migrations.AddField(
+            model_name='floodeventfeatures',
+            name='zoom',
+            field=models.PositiveSmallIntegerField(help_text='Zoom level the geometries are simplified for. Empty for full resolution geometries.', null=True, verbose_name='Zoom level', blank=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='floodeventfeatures',
+            unique_together=set([('flood', 'feature_type', 'zoom')]),
+        ),
+    ]
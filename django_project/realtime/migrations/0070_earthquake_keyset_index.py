@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0069_simplified_geometries'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='earthquake',
+            index_together=set([('source_type', 'time'), ('time', 'shake_id', 'source_type')]),
+        ),
+    ]
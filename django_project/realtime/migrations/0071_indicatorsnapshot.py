@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0070_earthquake_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorSnapshot',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('indicator', models.CharField(help_text='Name of the indicator, e.g. shake_event', max_length=30, verbose_name='Indicator')),
+                ('time', models.DateTimeField(help_text='Date and time the snapshot was taken', verbose_name='Time', db_index=True)),
+                ('status', models.CharField(help_text='Status of the indicator when the snapshot was taken', max_length=10, verbose_name='Status')),
+                ('value', models.DateTimeField(help_text='Date and time of the last activity checked by the indicator', null=True, verbose_name='Value', blank=True)),
+                ('healthy_range', models.DurationField(help_text='Elapsed time since the value, below which the indicator is healthy', null=True, verbose_name='Healthy range', blank=True)),
+                ('warning_range', models.DurationField(help_text='Elapsed time since the value, below which the indicator is in warning state', null=True, verbose_name='Warning range', blank=True)),
+                ('mean_interval', models.DurationField(help_text='Average interval between shake events, for indicators that estimate their ranges from it', null=True, verbose_name='Mean interval', blank=True)),
+                ('deviation', models.DurationField(help_text='Standard deviation of the interval between shake events', null=True, verbose_name='Deviation', blank=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='indicatorsnapshot',
+            index_together=set([('indicator', 'time')]),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0071_indicatorsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='indicatorsnapshot',
+            name='latency',
+            field=models.DurationField(help_text='Round trip of the last connection test, for indicators that probe a connection', null=True, verbose_name='Latency', blank=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0072_indicatorsnapshot_latency'),
+    ]
+
+    operations = [
+        # NULL zoom are distinct in the (flood, feature_type, zoom) unique
+        # constraint, so full resolution feature collections need their own
+        # partial unique index. Keep the latest of existing duplicates.
+        migrations.RunSQL(
+            sql=(
+                "DELETE FROM realtime_floodeventfeatures AS f "
+                "USING realtime_floodeventfeatures AS l "
+                "WHERE f.zoom IS NULL AND l.zoom IS NULL "
+                "AND f.flood_id = l.flood_id "
+                "AND f.feature_type = l.feature_type AND f.id < l.id; "
+                "CREATE UNIQUE INDEX "
+                "realtime_floodeventfeatures_full_resolution_uniq "
+                "ON realtime_floodeventfeatures (flood_id, feature_type) "
+                "WHERE zoom IS NULL"),
+            reverse_sql=(
+                "DROP INDEX "
+                "realtime_floodeventfeatures_full_resolution_uniq"),
+        ),
+    ]
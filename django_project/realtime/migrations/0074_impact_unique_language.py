@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('realtime', '0073_floodeventfeatures_full_resolution_unique'),
+    ]
+
+    operations = [
+        # Keep the first created impact of each event and language, the one
+        # read by the events.
+        migrations.RunSQL(
+            sql=(
+                "DELETE FROM realtime_impact AS i "
+                "USING realtime_impact AS f "
+                "WHERE i.content_type_id = f.content_type_id "
+                "AND i.object_id = f.object_id "
+                "AND i.language = f.language AND i.id > f.id"),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterUniqueTogether(
+            name='impact',
+            unique_together=set([('content_type', 'object_id', 'language')]),
+        ),
+    ]
@@ -1,7 +1,9 @@
 # uses noqa to disable false positive warning
 # these needs to be included for django to detect
+from realtime.models.blob import EventBlob  # noqa
 from realtime.models.earthquake import Earthquake  # noqa
 from realtime.models.user_push import UserPush  # noqa
+from realtime.models.indicator import IndicatorSnapshot  # noqa
 from realtime.models.flood import Flood, Boundary, FloodEventBoundary  # noqa
 from realtime.models.ash import Ash  # noqa
 from realtime.models.volcano import Volcano  # noqa
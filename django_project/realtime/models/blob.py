@@ -0,0 +1,39 @@
+# coding=utf-8
+from builtins import object
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.gis.db import models
+from django.utils.translation import ugettext_lazy as _
+
+
+class EventBlob(models.Model):
+    """Compressed raw content of a hazard event.
+
+    Large raw contents, like the shake grid xml or the flood data, are kept
+    out of the event table so they don't bloat it.
+    """
+
+    class Meta(object):
+        """Meta class."""
+        app_label = 'realtime'
+        unique_together = (('content_type', 'object_id', 'name'), )
+
+    # ContentType required fields
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+
+    name = models.CharField(
+        verbose_name=_('Name'),
+        help_text=_('Name of the content, e.g. shake_grid_xml'),
+        max_length=30)
+    content = models.BinaryField(
+        verbose_name=_('Content'),
+        help_text=_('Gzip compressed content'))
+    size = models.BigIntegerField(
+        verbose_name=_('Size'),
+        help_text=_('Size of the uncompressed content in bytes'),
+        default=0)
+
+    def __unicode__(self):
+        return u'{0} of {1}'.format(self.name, self.content_object)
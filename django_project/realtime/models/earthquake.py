@@ -1,17 +1,28 @@
 # coding=utf-8
 """Model class for earthquake realtime."""
 from builtins import object
+import math
 import os
+from collections import OrderedDict
 
+from django.conf import settings
 from django.contrib.gis.db import models
+from django.contrib.gis.measure import D
 from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _
 
 from realtime.app_settings import EARTHQUAKE_EVENT_REPORT_FORMAT, \
-    EARTHQUAKE_EVENT_ID_FORMAT
+    EARTHQUAKE_EVENT_ID_FORMAT, EARTHQUAKE_FEATURE_CACHE_NAMESPACE, \
+    SHAKEMAPS_MATCH_TIME_DELTA, SHAKEMAPS_MATCH_MAGNITUDE_DELTA, \
+    SHAKEMAPS_MATCH_DISTANCE, SHAKE_GRID_RASTER_DIRECTORY
+from realtime.helpers.cache import bump_cache_version
+from realtime.helpers.shake_grid import (
+    parse_shake_grid,
+    read_shake_grid,
+    write_shake_grid)
 from realtime.models.mixins import BaseEventModel
 from realtime.models.report import BaseEventReportModel
-from realtime.utils import split_layer_ext
+from realtime.utils import split_layer_ext, gzip_compress, gzip_decompress
 
 
 class EarthquakeManager(models.GeoManager):
@@ -28,10 +39,16 @@ class Earthquake(BaseEventModel):
     INITIAL_SOURCE_TYPE = 'initial'
     CORRECTED_SOURCE_TYPE = 'corrected'
 
+    # Blob name of the compressed shake grid contents
+    SHAKE_GRID_XML_BLOB = 'shake_grid_xml'
+
     class Meta(object):
         """Meta class."""
         app_label = 'realtime'
         unique_together = (('shake_id', 'source_type'), )
+        index_together = (
+            ('source_type', 'time'),
+            ('time', 'shake_id', 'source_type'))
         ordering = ['-time', '-shake_id', '-source_type']
 
     # Shake ID of corrected shakemaps can go as far as:
@@ -117,6 +134,15 @@ class Earthquake(BaseEventModel):
             'Cache flag to tell that shakemap grid already saved.'
         ),
         default=False)
+    initial_shakemap = models.ForeignKey(
+        'self',
+        verbose_name=_('Initial shakemap'),
+        help_text=_('The initial shakemap of this corrected shakemap.'),
+        related_name='corrected_events',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        default=None)
 
     objects = EarthquakeManager()
 
@@ -140,6 +166,8 @@ class Earthquake(BaseEventModel):
             self.shake_grid.delete()
         if self.mmi_output:
             self.mmi_output.delete()
+        if os.path.exists(self.shake_grid_raster_path):
+            os.remove(self.shake_grid_raster_path)
         for report in self.reports.all():
             report.delete(using=using)
         super(Earthquake, self).delete(using=using)
@@ -153,6 +181,8 @@ class Earthquake(BaseEventModel):
             has_corrected = bool(self.corrected_shakemaps)
             Earthquake.objects.filter(id=self.id).update(
                 has_corrected=has_corrected)
+            # Queryset update does not send post_save
+            bump_cache_version(EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
 
     def mark_shakemaps_has_contours(self, layer_saved=False):
         """Mark cache flag of mmi_layer_saved.
@@ -164,11 +194,83 @@ class Earthquake(BaseEventModel):
             mmi_layer_saved = bool(self.contours.all().count() > 0)
         Earthquake.objects.filter(id=self.id).update(
             mmi_layer_saved=mmi_layer_saved)
+        # Queryset update does not send post_save
+        bump_cache_version(EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
 
     @property
     def shake_grid_exists(self):
         return bool(self.shake_grid or self.shake_grid_saved)
 
+    def shake_grid_xml_blob(self):
+        """Return the gzip compressed contents of shake grid.
+
+        Shakemaps stored before contents were compressed still have them in
+        shake_grid_xml column.
+
+        :return: Gzip compressed shake grid xml, None if it is not saved
+        :rtype: bytes
+        """
+        blob = self.get_blob(self.SHAKE_GRID_XML_BLOB)
+        if blob is not None:
+            return blob
+        if self.shake_grid_xml:
+            return gzip_compress(self.shake_grid_xml.encode('utf-8'))
+        return None
+
+    def read_shake_grid_xml(self):
+        """Return the contents of shake grid.
+
+        :return: Shake grid xml, None if it is not saved
+        :rtype: unicode
+        """
+        blob = self.get_blob(self.SHAKE_GRID_XML_BLOB)
+        if blob is not None:
+            return gzip_decompress(blob).decode('utf-8')
+        return self.shake_grid_xml or None
+
+    @property
+    def shake_grid_raster_path(self):
+        """Path of the binary raster of the shake grid."""
+        return os.path.join(
+            settings.MEDIA_ROOT,
+            SHAKE_GRID_RASTER_DIRECTORY,
+            '{0}.grid'.format(self.event_id_formatted))
+
+    def store_shake_grid_raster(self, shake_grid_xml=None):
+        """Parse the shake grid into a binary raster.
+
+        :param shake_grid_xml: Contents of the shake grid, read from the
+            stored shake grid if not given
+        :type shake_grid_xml: bytes, unicode
+
+        :return: False if there is no shake grid
+        :rtype: bool
+
+        :raises: ValueError if the shake grid can't be parsed
+        """
+        if shake_grid_xml is None:
+            shake_grid_xml = self.read_shake_grid_xml()
+        if not shake_grid_xml:
+            return False
+        write_shake_grid(
+            parse_shake_grid(shake_grid_xml), self.shake_grid_raster_path)
+        return True
+
+    def shake_grid_raster(self):
+        """Return the memory mapped raster of the shake grid.
+
+        The raster is built on first use.
+
+        :return: The grid, None if there is no shake grid
+        :rtype: realtime.helpers.shake_grid.ShakeGrid
+
+        :raises: ValueError if the shake grid can't be parsed
+        """
+        path = self.shake_grid_raster_path
+        if not os.path.exists(path) and not self.store_shake_grid_raster():
+            return None
+        return read_shake_grid(path)
+
     @property
     def mmi_layer_exists(self):
         """Return bool to indicate existences of impact layers"""
@@ -244,45 +346,46 @@ class Earthquake(BaseEventModel):
             time=self.time,
             source_type=source_type)
 
-        return exact_time_match
-
-        # The following section were commented out until we have a proper
-        # algorithm
-
-        # # find a range of shakemaps in a given range, sorted with:
-        # # - least time diff
-        # # - least magnitude diff
-        # # - least location diff
-        #
-        # # it is difficult to have an absolute time diff using sql alone, so
-        # # will try to find the match using date range
-        # # Use a maximum of an hour difference
-        # delta_time = datetime.timedelta(minutes=30)
-        # end_time = self.time + delta_time
-        # start_time = self.time - delta_time
-        #
-        # # A range of 1 MMI
-        # magnitude_delta = 1
-        # # A range of 10 km
-        # distance_delta = 10000
-        #
-        # within_time_range_with_location_match = Earthquake.objects\
-        #     .filter(
-        #         time__range=[start_time, end_time],
-        #         source_type=self.CORRECTED_SOURCE_TYPE)\
-        #     .annotate(
-        #         # add magnitude diff
-        #         magnitude_diff=Func(
-        #             F('magnitude') - self.magnitude,
-        #             function='ABS'))\
-        #     .distance(self.location)\
-        #     .filter(
-        #         magnitude_diff__lte=magnitude_delta,
-        #         distance__lte=distance_delta
-        #     )\
-        #     .order_by('-time', 'distance', 'magnitude_diff')
-        #
-        # return within_time_range_with_location_match
+        if exact_time_match:
+            return exact_time_match
+
+        return self.shakemaps_tolerant_matching_queryset(source_type)
+
+    def shakemaps_tolerant_matching_queryset(self, source_type):
+        """Return shakemaps close in time, magnitude and location.
+
+        Shakemaps are sorted with the least time diff, then the least
+        distance, then the least magnitude diff.
+
+        The time range uses the (source_type, time) index. The distance is
+        first filtered with the spatial index, using a bounding distance in
+        degrees, then checked in meters on the remaining shakemaps.
+        """
+        distance = SHAKEMAPS_MATCH_DISTANCE
+        # Degrees of longitude are the shortest, use them as bounding
+        # distance so it covers the distance in meters.
+        latitude = min(abs(self.location.y), 89)
+        bounding_degrees = distance / (
+            111320.0 * math.cos(math.radians(latitude)))
+
+        return Earthquake.objects.filter(
+            source_type=source_type,
+            time__range=[
+                self.time - SHAKEMAPS_MATCH_TIME_DELTA,
+                self.time + SHAKEMAPS_MATCH_TIME_DELTA],
+            magnitude__range=[
+                self.magnitude - SHAKEMAPS_MATCH_MAGNITUDE_DELTA,
+                self.magnitude + SHAKEMAPS_MATCH_MAGNITUDE_DELTA],
+            location__dwithin=(self.location, bounding_degrees),
+            location__distance_lte=(self.location, D(m=distance))
+        ).extra(
+            select=OrderedDict([
+                ('time_diff', 'ABS(EXTRACT(EPOCH FROM time - %s))'),
+                ('magnitude_diff', 'ABS(magnitude - %s)'),
+            ]),
+            select_params=(self.time, self.magnitude)
+        ).distance(self.location).order_by(
+            'time_diff', 'distance', 'magnitude_diff')
 
     def corrected_shakemaps_queryset(self):
         """Find a corrected shakemaps matching this one."""
@@ -292,6 +395,27 @@ class Earthquake(BaseEventModel):
         """Find initial shakemaps matching this one."""
         return self.shakemaps_matching_queryset(self.INITIAL_SOURCE_TYPE)
 
+    def link_shakemaps(self):
+        """Store the link between this shakemap and its matching shakemaps.
+
+        A corrected shakemap refers to its initial shakemap. Corrected
+        shakemaps stored before their initial shakemap are linked when the
+        initial one is stored.
+        """
+        if self.source_type == self.CORRECTED_SOURCE_TYPE:
+            self.initial_shakemap = self.initial_shakemaps_queryset().first()
+            # Store it right away, matching shakemaps look for this link
+            Earthquake.objects.filter(id=self.id).update(
+                initial_shakemap=self.initial_shakemap)
+        else:
+            corrected_ids = list(
+                self.corrected_shakemaps_queryset().filter(
+                    initial_shakemap__isnull=True).values_list(
+                    'id', flat=True))
+            if corrected_ids:
+                Earthquake.objects.filter(id__in=corrected_ids).update(
+                    initial_shakemap=self)
+
     @property
     def corrected_shakemaps(self):
         """Return the corrected version of the shakemaps if any."""
@@ -300,8 +424,7 @@ class Earthquake(BaseEventModel):
             return None
 
         # Return only the latest one
-        return self.corrected_shakemaps_queryset().order_by(
-            '-shake_id').first()
+        return self.corrected_events.order_by('-shake_id').first()
 
     @property
     def initial_shakemaps(self):
@@ -310,8 +433,7 @@ class Earthquake(BaseEventModel):
             # Not Applicable
             return None
 
-        # There should be only one
-        return self.initial_shakemaps_queryset().first()
+        return self.initial_shakemap
 
 
 class EarthquakeMMIContourManager(models.GeoManager):
@@ -354,6 +476,28 @@ class EarthquakeMMIContour(models.Model):
         return description
 
 
+class EarthquakeMMIContourGeometry(models.Model):
+    """Simplified geometry of an MMI contour for a zoom level."""
+
+    class Meta(object):
+        """Meta class."""
+        app_label = 'realtime'
+        unique_together = (('contour', 'zoom'), )
+
+    contour = models.ForeignKey(
+        EarthquakeMMIContour,
+        related_name='simplified_geometries')
+    zoom = models.PositiveSmallIntegerField(
+        verbose_name=_('Zoom level'),
+        help_text=_('Zoom level the geometry is simplified for'))
+    geometry = models.GeometryField(
+        verbose_name=_('Simplified geometry of the MMI contour'),
+        help_text=_('Simplified 2D geometry of the MMI contour'),
+        srid=4326)
+
+    objects = models.GeoManager()
+
+
 class EarthquakeReport(BaseEventReportModel):
     """Earthquake Report Model."""
 
@@ -8,6 +8,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from realtime.models.mixins import BaseEventModel
 from realtime.models.report import BaseEventReportModel
+from realtime.utils import gzip_compress, gzip_decompress
 
 
 class BoundaryAlias(models.Model):
@@ -85,6 +86,9 @@ class FloodManager(models.GeoManager):
 class Flood(BaseEventModel):
     """Flood model."""
 
+    # Blob name of the compressed flood data
+    FLOOD_DATA_BLOB = 'flood_data'
+
     class Meta(object):
         """Meta class."""
         app_label = 'realtime'
@@ -181,6 +185,33 @@ class Flood(BaseEventModel):
             'event_id': self.event_id,
         })
 
+    def flood_data_blob(self):
+        """Return the gzip compressed flood data.
+
+        Floods stored before contents were compressed still have them in
+        flood_data column.
+
+        :return: Gzip compressed flood data, None if it is not saved
+        :rtype: bytes
+        """
+        blob = self.get_blob(self.FLOOD_DATA_BLOB)
+        if blob is not None:
+            return blob
+        if self.flood_data:
+            return gzip_compress(self.flood_data.encode('utf-8'))
+        return None
+
+    def read_flood_data(self):
+        """Return the flood data.
+
+        :return: Flood data in json format, None if it is not saved
+        :rtype: unicode
+        """
+        blob = self.get_blob(self.FLOOD_DATA_BLOB)
+        if blob is not None:
+            return gzip_decompress(blob).decode('utf-8')
+        return self.flood_data or None
+
     def rerun_analysis(self):
         """Rerun Analysis"""
         # Reset analysis state
@@ -189,6 +220,7 @@ class Flood(BaseEventModel):
         Flood.objects.filter(id=self.id).update(
             flood_data=self.flood_data,
             flood_data_saved=self.flood_data_saved)
+        self.delete_blob(self.FLOOD_DATA_BLOB)
         self.impacts.all().delete()
         self.save()
 
@@ -288,6 +320,31 @@ class FloodEventBoundary(models.Model):
         null=True)
 
 
+class BoundaryFloodFrequency(models.Model):
+    """Number of flood events of a boundary for each hazard level.
+
+    Maintained incrementally from FloodEventBoundary when a flood hazard
+    layer is processed or a flood is deleted.
+    """
+    class Meta(object):
+        app_label = 'realtime'
+        unique_together = (('boundary', 'hazard_data'), )
+        verbose_name_plural = 'Boundary Flood Frequencies'
+
+    boundary = models.ForeignKey(
+        Boundary,
+        verbose_name=_('Boundary'),
+        help_text=_('The flooded boundary'),
+        related_name='flood_frequency')
+    hazard_data = models.IntegerField(
+        verbose_name=_('Hazard Level'),
+        help_text=_('Hazard level of the flood events'))
+    flood_count = models.IntegerField(
+        verbose_name=_('Flood Count'),
+        help_text=_('Number of flood events with the hazard level'),
+        default=0)
+
+
 class ImpactEventBoundary(models.Model):
     """Impact Event Boundary model."""
     class Meta(object):
@@ -325,3 +382,51 @@ class ImpactEventBoundary(models.Model):
         help_text=_('The affected population in a given flood boundary'),
         blank=True,
         null=True)
+
+
+class FloodEventFeatures(models.Model):
+    """Precomputed GeoJSON feature collection of a flood event.
+
+    The feature collection is stored gzip compressed, and brotli compressed
+    if brotli is available, so it can be sent to the browser as is.
+    """
+    HAZARD_FEATURES = 'hazard'
+    IMPACT_FEATURES = 'impact'
+
+    FEATURE_TYPE_CHOICES = (
+        (HAZARD_FEATURES, _('Flooded boundaries')),
+        (IMPACT_FEATURES, _('Impacted boundaries')),
+    )
+
+    class Meta(object):
+        app_label = 'realtime'
+        # Full resolution rows (NULL zoom) are kept unique by a partial
+        # unique index, see migration 0073
+        unique_together = (('flood', 'feature_type', 'zoom'), )
+        verbose_name_plural = 'Flood Event Features'
+
+    flood = models.ForeignKey(
+        Flood,
+        to_field='event_id',
+        verbose_name=_('Flood Event'),
+        help_text=_('The flood event of the feature collection'),
+        related_name='feature_collections')
+    feature_type = models.CharField(
+        verbose_name=_('Feature Type'),
+        help_text=_('The kind of boundaries in the feature collection'),
+        choices=FEATURE_TYPE_CHOICES,
+        max_length=10)
+    zoom = models.PositiveSmallIntegerField(
+        verbose_name=_('Zoom level'),
+        help_text=_('Zoom level the geometries are simplified for. Empty '
+                    'for full resolution geometries.'),
+        blank=True,
+        null=True)
+    content = models.BinaryField(
+        verbose_name=_('Feature Collection'),
+        help_text=_('Gzip compressed GeoJSON Feature Collection'))
+    brotli_content = models.BinaryField(
+        verbose_name=_('Brotli Feature Collection'),
+        help_text=_('Brotli compressed GeoJSON Feature Collection'),
+        blank=True,
+        null=True)
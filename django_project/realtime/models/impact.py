@@ -4,6 +4,7 @@ from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
 from django.core.urlresolvers import reverse
+from django.db import IntegrityError, transaction
 from django.utils.translation import ugettext_lazy as _
 
 
@@ -13,6 +14,7 @@ class Impact(models.Model):
     class Meta(object):
         """Meta class."""
         app_label = 'realtime'
+        unique_together = (('content_type', 'object_id', 'language'), )
 
     # ContentType required fields
     content_type = models.ForeignKey(ContentType)
@@ -49,6 +51,38 @@ class Impact(models.Model):
         help_text=_('The language ID of the report'),
         max_length=4,
         default='id')
+    pipeline_state = models.CharField(
+        verbose_name=_('Pipeline state'),
+        help_text=_('The last processing step run for this impact'),
+        max_length=30,
+        default='',
+        blank=True)
+    pipeline_updated = models.DateTimeField(
+        verbose_name=_('Pipeline updated'),
+        help_text=_('The time the last processing step was run'),
+        blank=True,
+        null=True)
+
+    def create_or_load(self):
+        """Save a new impact, or load the impact of its language if any.
+
+        An event has one impact per language. If a concurrent process
+        created it first, this instance takes its id and fields.
+
+        :return: True if the impact is created
+        :rtype: bool
+        """
+        try:
+            with transaction.atomic():
+                self.save()
+            return True
+        except IntegrityError:
+            self.pk = Impact.objects.values_list('id', flat=True).get(
+                content_type_id=self.content_type_id,
+                object_id=self.object_id,
+                language=self.language)
+            self.refresh_from_db()
+            return False
 
     def content_object_url(self):
         change_url_name = 'realtime_admin:{app_label}_{content_type}_change'
@@ -61,7 +61,8 @@ class EarthquakeMigration(models.Model):
 
     def check_shake_grid_status(self):
         event = self.event
-        if event.shake_grid_xml:
+        if (event.has_blob(Earthquake.SHAKE_GRID_XML_BLOB) or
+                event.shake_grid_xml):
             self.has_shake_grid_in_database = True
 
         if event.shake_grid:
@@ -144,7 +145,7 @@ class EarthquakeMigration(models.Model):
         if self.has_shake_grid_in_media_file:
 
             xml_content = event.shake_grid.read()
-            event.shake_grid_xml = xml_content
+            event.store_blob(Earthquake.SHAKE_GRID_XML_BLOB, xml_content)
             event.shake_grid_saved = True
             event.save()
 
@@ -0,0 +1,71 @@
+# coding=utf-8
+"""Model class of Realtime indicator history."""
+
+from builtins import object
+from django.contrib.gis.db import models
+
+
+class IndicatorSnapshot(models.Model):
+    """Status of a Realtime indicator at a point in time.
+
+    Snapshots are taken periodically, so the indicator page reads the latest
+    ones instead of computing indicators from live tables, and the history
+    shows when the health of Realtime degraded.
+    """
+
+    class Meta(object):
+        app_label = 'realtime'
+        index_together = [
+            ('indicator', 'time'),
+        ]
+
+    indicator = models.CharField(
+        verbose_name='Indicator',
+        help_text='Name of the indicator, e.g. shake_event',
+        max_length=30)
+    time = models.DateTimeField(
+        verbose_name='Time',
+        help_text='Date and time the snapshot was taken',
+        db_index=True)
+    status = models.CharField(
+        verbose_name='Status',
+        help_text='Status of the indicator when the snapshot was taken',
+        max_length=10)
+    value = models.DateTimeField(
+        verbose_name='Value',
+        help_text='Date and time of the last activity checked by the '
+                  'indicator',
+        null=True,
+        blank=True)
+    healthy_range = models.DurationField(
+        verbose_name='Healthy range',
+        help_text='Elapsed time since the value, below which the indicator '
+                  'is healthy',
+        null=True,
+        blank=True)
+    warning_range = models.DurationField(
+        verbose_name='Warning range',
+        help_text='Elapsed time since the value, below which the indicator '
+                  'is in warning state',
+        null=True,
+        blank=True)
+    mean_interval = models.DurationField(
+        verbose_name='Mean interval',
+        help_text='Average interval between shake events, for indicators '
+                  'that estimate their ranges from it',
+        null=True,
+        blank=True)
+    deviation = models.DurationField(
+        verbose_name='Deviation',
+        help_text='Standard deviation of the interval between shake events',
+        null=True,
+        blank=True)
+    latency = models.DurationField(
+        verbose_name='Latency',
+        help_text='Round trip of the last connection test, for indicators '
+                  'that probe a connection',
+        null=True,
+        blank=True)
+
+    def __unicode__(self):
+        return u'{0} {1} {2}'.format(self.indicator, self.time, self.status)
@@ -1,19 +1,37 @@
 # coding=utf-8
-from builtins import object
+from builtins import object, str
 import json
 import logging
 import os
 
 from django.contrib.contenttypes.fields import GenericRelation
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.db import models
 from django.utils.translation import ugettext_lazy as _
 
 from realtime.app_settings import LOGGER_NAME
+from realtime.models.blob import EventBlob
 from realtime.models.impact import Impact
+from realtime.utils import gzip_compress
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
 
+def index_by_language(objects):
+    """Index impacts or reports by their language.
+
+    :param objects: Impacts or reports of an event
+    :type objects: list
+
+    :return: Dict of the first created object of each language
+    :rtype: dict
+    """
+    objects_by_language = {}
+    for obj in sorted(objects, key=lambda o: o.pk):
+        objects_by_language.setdefault(obj.language, obj)
+    return objects_by_language
+
+
 class MultiLanguageMixin(object):
     """Generic mixins for hazard event to handle language changes."""
 
@@ -58,6 +76,16 @@ class MultiLanguageMixin(object):
             LOGGER.warning(e)
             pass
 
+        if fields is None:
+            self.clear_language_objects_cache()
+
+    def clear_language_objects_cache(self):
+        """Forget loaded objects of all languages.
+
+        This meant to be overridden
+        """
+        pass
+
 
 class ImpactMixin(MultiLanguageMixin, models.Model):
     """Generic mixin for hazard to handle multiple impact analysis."""
@@ -75,11 +103,16 @@ class ImpactMixin(MultiLanguageMixin, models.Model):
                 'Please define GenericRelation impacts')
 
         self._impact_object = None
+        self._impacts_by_language = None
         self._analysis_flag = True
 
     def change_language_hook(self):
         self._impact_object = None
 
+    def clear_language_objects_cache(self):
+        self._impact_object = None
+        self._impacts_by_language = None
+
     @property
     def analysis_flag(self):
         return self._analysis_flag
@@ -91,25 +124,48 @@ class ImpactMixin(MultiLanguageMixin, models.Model):
     @property
     def has_impacts(self):
         """Check if event has already process an impacts."""
-        return bool(self.impact_object)
+        return self.impact_object.pk is not None
 
     @property
     def impact_object(self):
-        """Returned impact object for a given inspected language."""
+        """Returned impact object for a given inspected language.
+
+        Impacts of all languages are loaded at once, from the prefetched
+        impacts if any. If there is no impact yet for the language, an
+        unsaved impact is returned. It is saved when one of its fields is
+        updated.
+
+        :rtype: realtime.models.impact.Impact
+        """
         # Cache object
         if self._impact_object:
             return self._impact_object
 
-        queryset = self.impacts.filter(language=self.inspected_language)
-        if queryset:
-            self._impact_object = queryset.first()
-        else:
+        if self._impacts_by_language is None:
+            self._impacts_by_language = index_by_language(
+                self.impacts.all())
+
+        impact = self._impacts_by_language.get(self.inspected_language)
+        if not impact:
             impact = Impact(
                 content_object=self, language=self.inspected_language)
-            impact.save()
-            self._impact_object = impact
+            self._impacts_by_language[self.inspected_language] = impact
+        self._impact_object = impact
         return self._impact_object
 
+    def update_impact(self, **values):
+        """Update fields of the impact of the inspected language at once.
+
+        :param values: New values of the impact fields, e.g.
+            analysis_task_id and analysis_task_status
+        """
+        impact = self.impact_object
+        if impact.pk is None:
+            impact.create_or_load()
+        for field, value in values.items():
+            setattr(impact, field, value)
+        Impact.objects.filter(pk=impact.pk).update(**values)
+
     @property
     def analysis_task_id(self):
         """Celery task id of analysis"""
@@ -117,9 +173,7 @@ class ImpactMixin(MultiLanguageMixin, models.Model):
 
     @analysis_task_id.setter
     def analysis_task_id(self, value):
-        impact = self.impact_object
-        impact.analysis_task_id = value
-        impact.save()
+        self.update_impact(analysis_task_id=value)
 
     @property
     def analysis_task_status(self):
@@ -128,9 +182,7 @@ class ImpactMixin(MultiLanguageMixin, models.Model):
 
     @analysis_task_status.setter
     def analysis_task_status(self, value):
-        impact = self.impact_object
-        impact.analysis_task_status = value
-        impact.save()
+        self.update_impact(analysis_task_status=value)
 
     @property
     def analysis_task_result(self):
@@ -139,9 +191,7 @@ class ImpactMixin(MultiLanguageMixin, models.Model):
 
     @analysis_task_result.setter
     def analysis_task_result(self, value):
-        impact = self.impact_object
-        impact.analysis_task_result = value
-        impact.save()
+        self.update_impact(analysis_task_result=value)
 
     @property
     def impact_file_path(self):
@@ -151,9 +201,7 @@ class ImpactMixin(MultiLanguageMixin, models.Model):
     @impact_file_path.setter
     def impact_file_path(self, value):
         """Set impact file path given language processed."""
-        impact = self.impact_object
-        impact.impact_file_path = value
-        impact.save()
+        self.update_impact(impact_file_path=value)
 
     @property
     def impact_layer_exists(self):
@@ -182,6 +230,7 @@ class ImpactMixin(MultiLanguageMixin, models.Model):
         """Rerun Analysis"""
         # Reset analysis state
         self.impacts.all().delete()
+        self.clear_language_objects_cache()
         self.save()
 
 
@@ -194,10 +243,15 @@ class ReportMixin(MultiLanguageMixin, models.Model):
     def __init__(self, *args, **kwargs):
         super(ReportMixin, self).__init__(*args, **kwargs)
         self._report_object = None
+        self._reports_by_language = None
 
     def change_language_hook(self):
         self._report_object = None
 
+    def clear_language_objects_cache(self):
+        self._report_object = None
+        self._reports_by_language = None
+
     @property
     def reports_queryset(self):
         """Get reference to Report model queryset.
@@ -244,24 +298,44 @@ class ReportMixin(MultiLanguageMixin, models.Model):
     def report_object(self):
         """Returned report object for a given inspected language.
 
+        Reports of all languages are loaded at once, from the prefetched
+        reports if any. If there is no report yet for the language, an
+        unsaved report is returned. It is saved when one of its fields is
+        updated.
+
         :rtype: realtime.models.report.BaseEventReportModel | models.Model
         """
         # Cache object
         if self._report_object:
             return self._report_object
 
-        queryset = self.reports_queryset.filter(
-            language=self.inspected_language)
-        if queryset:
-            self._report_object = queryset.first()
-        else:
+        if self._reports_by_language is None:
+            self._reports_by_language = index_by_language(
+                self.reports_queryset.all())
+
+        report = self._reports_by_language.get(self.inspected_language)
+        if not report:
             report = self.report_class()
             report.event = self
             report.language = self.inspected_language
-            report.save()
-            self._report_object = report
+            self._reports_by_language[self.inspected_language] = report
+        self._report_object = report
         return self._report_object
 
+    def update_report(self, **values):
+        """Update fields of the report of the inspected language at once.
+
+        :param values: New values of the report fields, e.g. report_task_id
+            and report_task_status
+        """
+        report = self.report_object
+        for field, value in values.items():
+            setattr(report, field, value)
+        if report.pk:
+            self.report_class.objects.filter(pk=report.pk).update(**values)
+        else:
+            report.save()
+
     @property
     def report_task_id(self):
         """Celery task id of report"""
@@ -269,9 +343,7 @@ class ReportMixin(MultiLanguageMixin, models.Model):
 
     @report_task_id.setter
     def report_task_id(self, value):
-        report = self.report_object
-        report.report_task_id = value
-        report.save()
+        self.update_report(report_task_id=value)
 
     @property
     def report_task_status(self):
@@ -280,9 +352,7 @@ class ReportMixin(MultiLanguageMixin, models.Model):
 
     @report_task_status.setter
     def report_task_status(self, value):
-        report = self.report_object
-        report.report_task_status = value
-        report.save()
+        self.update_report(report_task_status=value)
 
     @property
     def report_task_result(self):
@@ -291,9 +361,7 @@ class ReportMixin(MultiLanguageMixin, models.Model):
 
     @report_task_result.setter
     def report_task_result(self, value):
-        report = self.report_object
-        report.report_task_result = value
-        report.save()
+        self.update_report(report_task_result=value)
 
     @property
     def need_generate_reports(self):
@@ -319,10 +387,60 @@ class ReportMixin(MultiLanguageMixin, models.Model):
         for r in reports:
             r.delete()
 
+        self.clear_language_objects_cache()
         self.save()
 
 
-class BaseEventModel(ImpactMixin, ReportMixin, models.Model):
+class EventBlobMixin(models.Model):
+    """Generic mixin for hazard to store compressed raw contents."""
+
+    class Meta(object):
+        abstract = True
+
+    blobs = GenericRelation(EventBlob)
+
+    def store_blob(self, name, content):
+        """Compress and store a raw content of the event.
+
+        :param name: Name of the content
+        :type name: str
+
+        :param content: The uncompressed content
+        :type content: bytes, unicode
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        EventBlob.objects.update_or_create(
+            content_type=ContentType.objects.get_for_model(self),
+            object_id=self.pk,
+            name=name,
+            defaults={
+                'content': gzip_compress(content),
+                'size': len(content)
+            })
+
+    def get_blob(self, name):
+        """Return the compressed raw content of the event.
+
+        :param name: Name of the content
+        :type name: str
+
+        :return: Gzip compressed content, None if it is not stored
+        :rtype: bytes
+        """
+        return self.blobs.filter(name=name).values_list(
+            'content', flat=True).first()
+
+    def has_blob(self, name):
+        """Check if a raw content of the event is stored."""
+        return self.blobs.filter(name=name).exists()
+
+    def delete_blob(self, name):
+        """Delete a raw content of the event."""
+        self.blobs.filter(name=name).delete()
+
+
+class BaseEventModel(ImpactMixin, ReportMixin, EventBlobMixin, models.Model):
     """"""
 
     class Meta(object):
@@ -360,6 +478,16 @@ class BaseEventModel(ImpactMixin, ReportMixin, models.Model):
         ImpactMixin.change_language_hook(self)
         ReportMixin.change_language_hook(self)
 
+    def clear_language_objects_cache(self):
+        ImpactMixin.clear_language_objects_cache(self)
+        ReportMixin.clear_language_objects_cache(self)
+
+    def rerun_report_generation(self):
+        """Rerun Report Generations"""
+        # Let the pipeline run the report step again right away
+        self.impacts.update(pipeline_state='', pipeline_updated=None)
+        super(BaseEventModel, self).rerun_report_generation()
+
     def refresh_from_db(self, using=None, fields=None, **kwargs):
         # fields contains the name of the deferred field to be
         # loaded.
@@ -5,9 +5,9 @@ It is used to report critical indicator
 """
 import logging
 from realtime.app_settings import LOGGER_NAME
-from realtime.helpers.realtime_broker_indicator import RealtimeBrokerIndicator
-from realtime.helpers.shake_event_indicator import ShakeEventIndicator
-from realtime.helpers.shakemap_push_indicator import ShakemapPushIndicator
+from realtime.helpers.indicator_snapshot import (
+    INDICATOR_CLASSES,
+    take_indicator_snapshots)
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 __date__ = '04/09/15'
@@ -18,11 +18,10 @@ LOGGER = logging.getLogger(LOGGER_NAME)
 
 def check_indicator_status():
     """Check all indicator and send email if it reaches critical status."""
+    # Indicators are computed from live tables, and recorded
     indicators = [
-        ShakemapPushIndicator(),
-        ShakeEventIndicator(),
-        RealtimeBrokerIndicator(),
-    ]
+        ind for ind in take_indicator_snapshots()
+        if isinstance(ind, INDICATOR_CLASSES)]
 
     for ind in indicators:
         if ind.is_critical():
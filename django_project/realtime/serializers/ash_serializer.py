@@ -1,21 +1,22 @@
 # coding=utf-8
 
 from builtins import object
-from django.core.urlresolvers import reverse
 from rest_framework import serializers
 from rest_framework_gis.serializers import (
     GeoFeatureModelSerializer,
     GeometrySerializerMethodField)
 
 from realtime.models.ash import Ash, AshReport
-from realtime.serializers.utilities import CustomSerializerMethodField
+from realtime.serializers.utilities import (
+    CustomSerializerMethodField,
+    URLTemplateMixin)
 from realtime.serializers.volcano_serializer import VolcanoSerializer
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '7/18/16'
 
 
-class AshReportSerializer(serializers.ModelSerializer):
+class AshReportSerializer(URLTemplateMixin, serializers.ModelSerializer):
 
     # volcano_name = serializers.SlugRelatedField(
     #     queryset=Ash.objects.all(),
@@ -32,16 +33,12 @@ class AshReportSerializer(serializers.ModelSerializer):
         :type obj: AshReport
         :return:
         """
-        relative_uri = reverse(
+        return self.url_template(
             'realtime:ash_report_detail',
-            kwargs={
-                'volcano_name': obj.ash.volcano.volcano_name,
-                'event_time': obj.ash.event_time_formatted,
-                'language': obj.language})
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+            ('volcano_name', 'event_time', 'language')).format(
+            volcano_name=obj.ash.volcano.volcano_name,
+            event_time=obj.ash.event_time_formatted,
+            language=obj.language)
 
     # auto bind to get_url method
     url = CustomSerializerMethodField()
@@ -54,16 +51,11 @@ class AshReportSerializer(serializers.ModelSerializer):
         :type obj: AshReport
         :return:
         """
-        relative_uri = reverse(
+        return self.url_template(
             'realtime:ash_detail',
-            kwargs={
-                'volcano_name': obj.ash.volcano.volcano_name,
-                'event_time': obj.ash.event_time_formatted
-            })
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+            ('volcano_name', 'event_time')).format(
+            volcano_name=obj.ash.volcano.volcano_name,
+            event_time=obj.ash.event_time_formatted)
 
     # auto bind to get_shake_url method
     ash_url = CustomSerializerMethodField()
@@ -82,7 +74,7 @@ class AshReportSerializer(serializers.ModelSerializer):
         )
 
 
-class AshSerializer(serializers.ModelSerializer):
+class AshSerializer(URLTemplateMixin, serializers.ModelSerializer):
     reports = AshReportSerializer(
         many=True, required=False, write_only=False, read_only=True)
 
@@ -97,16 +89,11 @@ class AshSerializer(serializers.ModelSerializer):
         :type obj: Ash
         :return:
         """
-        relative_uri = reverse(
+        return self.url_template(
             'realtime:ash_detail',
-            kwargs={
-                'volcano_name': obj.volcano.volcano_name,
-                'event_time': obj.event_time_formatted
-            })
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+            ('volcano_name', 'event_time')).format(
+            volcano_name=obj.volcano.volcano_name,
+            event_time=obj.event_time_formatted)
 
     # auto bind to get_url method
     url = CustomSerializerMethodField()
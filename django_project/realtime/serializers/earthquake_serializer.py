@@ -2,20 +2,23 @@
 from builtins import object
 import json
 
-from django.core.urlresolvers import reverse
 from rest_framework import serializers
 from rest_framework_gis.serializers import (
     GeoFeatureModelSerializer)
 
 from realtime.models.earthquake import Earthquake, EarthquakeReport, \
     EarthquakeMMIContour
-from realtime.serializers.utilities import CustomSerializerMethodField
+from realtime.serializers.utilities import (
+    CustomSerializerMethodField,
+    SparseFieldsetMixin,
+    URLTemplateMixin)
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 __date__ = '19/06/15'
 
 
-class EarthquakeReportSerializer(serializers.ModelSerializer):
+class EarthquakeReportSerializer(
+        URLTemplateMixin, serializers.ModelSerializer):
 
     def get_url(self, serializer_field, obj):
         """
@@ -25,16 +28,12 @@ class EarthquakeReportSerializer(serializers.ModelSerializer):
         :type obj: EarthquakeReport
         :return:
         """
-        relative_uri = reverse(
+        return self.url_template(
             'realtime:earthquake_report_detail',
-            kwargs={
-                'shake_id': obj.earthquake.shake_id,
-                'source_type': obj.earthquake.source_type,
-                'language': obj.language})
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+            ('shake_id', 'source_type', 'language')).format(
+            shake_id=obj.earthquake.shake_id,
+            source_type=obj.earthquake.source_type,
+            language=obj.language)
 
     # auto bind to get_url method
     url = CustomSerializerMethodField()
@@ -47,16 +46,11 @@ class EarthquakeReportSerializer(serializers.ModelSerializer):
         :type obj: EarthquakeReport
         :return:
         """
-        relative_uri = reverse(
+        return self.url_template(
             'realtime:earthquake_detail',
-            kwargs={
-                'shake_id': obj.earthquake.shake_id,
-                'source_type': obj.earthquake.source_type
-            })
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+            ('shake_id', 'source_type')).format(
+            shake_id=obj.earthquake.shake_id,
+            source_type=obj.earthquake.source_type)
 
     # auto bind to get_shake_url method
     shake_url = CustomSerializerMethodField()
@@ -76,7 +70,8 @@ class EarthquakeReportSerializer(serializers.ModelSerializer):
         )
 
 
-class EarthquakeSerializer(serializers.ModelSerializer):
+class EarthquakeSerializer(
+        SparseFieldsetMixin, URLTemplateMixin, serializers.ModelSerializer):
     reports = EarthquakeReportSerializer(
         many=True, required=False, write_only=False,
         read_only=True)
@@ -89,19 +84,37 @@ class EarthquakeSerializer(serializers.ModelSerializer):
         :type obj: Earthquake
         :return:
         """
-        relative_uri = reverse(
+        return self.url_template(
             'realtime:earthquake_detail',
-            kwargs={
-                'shake_id': obj.shake_id,
-                'source_type': obj.source_type})
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+            ('shake_id', 'source_type')).format(
+            shake_id=obj.shake_id,
+            source_type=obj.source_type)
 
     # auto bind to get_url method
     url = CustomSerializerMethodField()
 
+    def get_shake_grid_download_url(self, serializer_field, obj):
+        """Same as Earthquake.shake_grid_download_url"""
+        return self.url_template(
+            'realtime:shake_grid',
+            ('shake_id', 'source_type'),
+            absolute=False).format(
+            shake_id=obj.shake_id,
+            source_type=obj.source_type)
+
+    shake_grid_download_url = CustomSerializerMethodField()
+
+    def get_mmi_layer_download_url(self, serializer_field, obj):
+        """Same as Earthquake.mmi_layer_download_url"""
+        return self.url_template(
+            'realtime:earthquake_mmi_contours_list',
+            ('shake_id', 'source_type'),
+            absolute=False).format(
+            shake_id=obj.shake_id,
+            source_type=obj.source_type)
+
+    mmi_layer_download_url = CustomSerializerMethodField()
+
     def get_shake_grid(self, serializer_field, obj):
         """
         :param serializer_field:
@@ -113,7 +126,7 @@ class EarthquakeSerializer(serializers.ModelSerializer):
         if obj.shake_grid:
             return obj.shake_grid.url
         else:
-            return obj.shake_grid_download_url
+            return self.get_shake_grid_download_url(serializer_field, obj)
 
     shake_grid = CustomSerializerMethodField()
 
@@ -142,7 +155,34 @@ class EarthquakeSerializer(serializers.ModelSerializer):
         )
 
 
-class EarthquakeGeoJsonSerializer(GeoFeatureModelSerializer):
+class EarthquakeBulkSerializer(serializers.ModelSerializer):
+    """Validate shake events of a bulk ingestion.
+
+    Uniqueness of shake_id and source_type is checked for the whole batch
+    at once, by the view, instead of one query per event.
+    """
+    shake_grid_xml = serializers.CharField(
+        required=False, allow_blank=True, write_only=True)
+
+    class Meta(object):
+        model = Earthquake
+        fields = (
+            'shake_id',
+            'magnitude',
+            'time',
+            'depth',
+            'location',
+            'location_description',
+            'felt',
+            'hazard_path',
+            'source_type',
+            'shake_grid_xml',
+        )
+        validators = []
+
+
+class EarthquakeGeoJsonSerializer(
+        URLTemplateMixin, GeoFeatureModelSerializer):
 
     def get_shake_grid(self, serializer_field, obj):
         """
@@ -155,7 +195,13 @@ class EarthquakeGeoJsonSerializer(GeoFeatureModelSerializer):
         if obj.shake_grid:
             return obj.shake_grid.url
         else:
-            return obj.shake_grid_download_url
+            # Same as Earthquake.shake_grid_download_url
+            return self.url_template(
+                'realtime:shake_grid',
+                ('shake_id', 'source_type'),
+                absolute=False).format(
+                shake_id=obj.shake_id,
+                source_type=obj.source_type)
 
     shake_grid = CustomSerializerMethodField()
 
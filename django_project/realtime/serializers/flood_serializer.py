@@ -1,16 +1,17 @@
 # coding=utf-8
 from builtins import object
 import pytz
-from django.core.urlresolvers import reverse
 from rest_framework import serializers
 from realtime.models.flood import Flood, FloodReport
-from realtime.serializers.utilities import CustomSerializerMethodField
+from realtime.serializers.utilities import (
+    CustomSerializerMethodField,
+    URLTemplateMixin)
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '11/26/15'
 
 
-class FloodReportSerializer(serializers.ModelSerializer):
+class FloodReportSerializer(URLTemplateMixin, serializers.ModelSerializer):
 
     event_id = serializers.SlugRelatedField(
         queryset=Flood.objects.all(),
@@ -27,15 +28,11 @@ class FloodReportSerializer(serializers.ModelSerializer):
         :type obj: FloodReport
         :return:
         """
-        relative_uri = reverse(
+        return self.url_template(
             'realtime:flood_report_detail',
-            kwargs={
-                'event_id': obj.flood.event_id,
-                'language': obj.language})
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+            ('event_id', 'language')).format(
+            event_id=obj.flood.event_id,
+            language=obj.language)
 
     # auto bind to get_url method
     url = CustomSerializerMethodField()
@@ -48,13 +45,9 @@ class FloodReportSerializer(serializers.ModelSerializer):
         :type obj: FloodReport
         :return:
         """
-        relative_uri = reverse(
-            'realtime:flood_detail',
-            kwargs={'event_id': obj.flood.event_id})
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+        return self.url_template(
+            'realtime:flood_detail', ('event_id', )).format(
+            event_id=obj.flood.event_id)
 
     # auto bind to get_shake_url method
     flood_url = CustomSerializerMethodField()
@@ -74,7 +67,7 @@ class FloodReportSerializer(serializers.ModelSerializer):
         )
 
 
-class FloodSerializer(serializers.ModelSerializer):
+class FloodSerializer(URLTemplateMixin, serializers.ModelSerializer):
     reports = FloodReportSerializer(
         many=True, required=False, write_only=False,
         read_only=True
@@ -88,18 +81,21 @@ class FloodSerializer(serializers.ModelSerializer):
         :type obj: Flood
         :return:
         """
-        relative_uri = reverse(
-            'realtime:flood_detail',
-            kwargs={
-                'event_id': obj.event_id})
-        if self.context and 'request' in self.context:
-            return self.context['request'].build_absolute_uri(relative_uri)
-        else:
-            return relative_uri
+        return self.url_template(
+            'realtime:flood_detail', ('event_id', )).format(
+            event_id=obj.event_id)
 
     # auto bind to get_url method
     url = CustomSerializerMethodField()
 
+    def get_flood_data_download_url(self, serializer_field, obj):
+        """Same as Flood.flood_data_download_url"""
+        return self.url_template(
+            'realtime:flood_data', ('event_id', ), absolute=False).format(
+            event_id=obj.event_id)
+
+    flood_data_download_url = CustomSerializerMethodField()
+
     def get_time_description(self, serializer_field, obj):
         """
         :param serializer_field:
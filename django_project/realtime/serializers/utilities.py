@@ -1,9 +1,25 @@
 # coding=utf-8
+from builtins import object
+from django.core.urlresolvers import reverse
+from django.utils.encoding import force_text
+from django.utils.http import RFC3986_SUBDELIMS, urlquote
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '12/3/15'
 
+# Sample values of url keyword arguments. They match the url patterns and
+# can't be mistaken for another part of the urls.
+URL_KWARG_SAMPLES = {
+    'shake_id': '00000000000000',
+    'source_type': 'sourcetype',
+    'language': 'urllanguage',
+    'event_id': '0000000000-6-rw',
+    'volcano_name': 'urlvolcanoname',
+    'event_time': '0000000000000000000',
+}
+
 
 class CustomSerializerMethodField(serializers.SerializerMethodField):
     """Custom Serializer Method Field.
@@ -14,3 +30,122 @@ class CustomSerializerMethodField(serializers.SerializerMethodField):
     def to_representation(self, value):
         method = getattr(self.parent, self.method_name)
         return method(self, value)
+
+
+class SparseFieldsetMixin(object):
+    """Serializer mixin to only serialize the requested fields.
+
+    Fields are requested with a comma separated fields query parameter of
+    safe requests, e.g. ?fields=shake_id,time,magnitude
+    """
+    fields_query_param = 'fields'
+
+    def __init__(self, *args, **kwargs):
+        super(SparseFieldsetMixin, self).__init__(*args, **kwargs)
+        requested_fields = self.requested_fields(self.context.get('request'))
+        if requested_fields is None:
+            return
+        for field_name in set(self.fields.keys()) - requested_fields:
+            self.fields.pop(field_name)
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Return the names of the requested fields.
+
+        :param request: The REST request
+        :type request: rest_framework.request.Request
+
+        :return: Set of field names, None if all fields are requested
+        :rtype: set
+        """
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        fields = request.query_params.get(cls.fields_query_param)
+        if not fields:
+            return None
+        return set(
+            field.strip() for field in fields.split(',') if field.strip())
+
+
+class URLTemplate(object):
+    """Url of a view, reversed once and formatted for each object.
+
+    The url is reversed with sample keyword arguments, then the samples are
+    replaced by format fields.
+    """
+
+    def __init__(self, view_name, kwarg_names, request=None):
+        """
+        :param view_name: Name of the url pattern
+        :type view_name: str
+
+        :param kwarg_names: Names of the url keyword arguments
+        :type kwarg_names: tuple
+
+        :param request: If given, urls are absolute
+        :type request: rest_framework.request.Request
+        """
+        self.view_name = view_name
+        self.request = request
+
+        samples = dict(
+            (name, URL_KWARG_SAMPLES[name]) for name in kwarg_names)
+        url = self._absolute(reverse(view_name, kwargs=samples))
+        template = url.replace('{', '{{').replace('}', '}}')
+        for name, sample in samples.items():
+            if template.count(sample) != 1:
+                # Can't tell the sample apart, reverse every url
+                template = None
+                break
+            template = template.replace(sample, '{' + name + '}')
+        self.template = template
+
+    def _absolute(self, url):
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def format(self, **kwargs):
+        """Return the url for the given keyword arguments.
+
+        :return: The url, quoted the same way as reverse
+        :rtype: str
+        """
+        if self.template is None:
+            return self._absolute(reverse(self.view_name, kwargs=kwargs))
+        return self.template.format(**dict(
+            (name, urlquote(
+                force_text(value), safe=RFC3986_SUBDELIMS + '/~:@'))
+            for name, value in kwargs.items()))
+
+
+class URLTemplateMixin(object):
+    """Serializer mixin to build urls of many objects from url templates.
+
+    Templates are cached in the serializer, so the url of a view is only
+    reversed once per serialized list.
+    """
+
+    def url_template(self, view_name, kwarg_names, absolute=True):
+        """Return the url template of a view.
+
+        :param view_name: Name of the url pattern
+        :type view_name: str
+
+        :param kwarg_names: Names of the url keyword arguments
+        :type kwarg_names: tuple
+
+        :param absolute: True for absolute urls, if the serializer has a
+            request in its context
+        :type absolute: bool
+
+        :rtype: URLTemplate
+        """
+        templates = self.__dict__.setdefault('_url_templates', {})
+        key = (view_name, kwarg_names, absolute)
+        if key not in templates:
+            request = None
+            if absolute and self.context:
+                request = self.context.get('request')
+            templates[key] = URLTemplate(view_name, kwarg_names, request)
+        return templates[key]
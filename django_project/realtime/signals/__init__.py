@@ -2,6 +2,7 @@
 from realtime.signals.earthquake import *  # noqa
 from realtime.signals.flood import *  # noqa
 from realtime.signals.ash import *  # noqa
+from realtime.signals.flatpage import *  # noqa
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '12/4/15'
@@ -5,6 +5,7 @@ from django.db.models.signals import post_save
 from django.dispatch.dispatcher import receiver
 
 from realtime.app_settings import LOGGER_NAME, ANALYSIS_LANGUAGES
+from realtime.helpers.pipeline import dispatch_event_task
 from realtime.models.ash import Ash
 from realtime.tasks.ash import generate_event_report, generate_hazard_layer
 
@@ -32,10 +33,11 @@ def ash_post_save(sender, instance, **kwargs):
         if (instance.hazard_file
                 and not instance.hazard_layer_exists
                 and instance.need_generate_hazard):
-            generate_hazard_layer.delay(instance)
+            dispatch_event_task(generate_hazard_layer, instance)
 
         if instance.analysis_flag:
             for lang in ANALYSIS_LANGUAGES:
-                generate_event_report.delay(instance, locale=lang)
+                dispatch_event_task(
+                    generate_event_report, instance, locale=lang)
     except BaseException as e:
         LOGGER.exception(e)
@@ -1,10 +1,13 @@
 # coding=utf-8
 import logging
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch.dispatcher import receiver
 
-from realtime.app_settings import LOGGER_NAME, ANALYSIS_LANGUAGES
+from realtime.app_settings import LOGGER_NAME, ANALYSIS_LANGUAGES, \
+    EARTHQUAKE_FEATURE_CACHE_NAMESPACE
+from realtime.helpers.cache import bump_cache_version
+from realtime.helpers.pipeline import dispatch_event_task
 from realtime.models.earthquake import Earthquake
 from realtime.tasks.earthquake import generate_event_report
 
@@ -25,11 +28,23 @@ def earthquake_post_save(sender, instance, **kwargs):
     if not issubclass(sender, Earthquake):
         return
 
+    bump_cache_version(EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
+
     try:
         LOGGER.info('Sending task earthquake processing.')
         if instance.analysis_flag:
             for lang in ANALYSIS_LANGUAGES:
-                generate_event_report.delay(
-                    instance, locale=lang)
+                dispatch_event_task(
+                    generate_event_report, instance, locale=lang)
     except BaseException:
         pass
+
+
+@receiver(post_delete)
+def earthquake_post_delete(sender, instance, **kwargs):
+    """Invalidate cached earthquake features"""
+
+    if not issubclass(sender, Earthquake):
+        return
+
+    bump_cache_version(EARTHQUAKE_FEATURE_CACHE_NAMESPACE)
@@ -0,0 +1,24 @@
+# coding=utf-8
+import logging
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch.dispatcher import receiver
+
+from realtime.app_settings import (
+    LOGGER_NAME,
+    FLATPAGE_NAVIGATION_CACHE_NAMESPACE)
+from realtime.helpers.cache import bump_cache_version
+from realtime.models.coreflatpage import CoreFlatPage
+
+
+LOGGER = logging.getLogger(LOGGER_NAME)
+
+
+LOGGER.info('Flat Page Signals registered')
+
+
+@receiver(post_save, sender=CoreFlatPage)
+@receiver(post_delete, sender=CoreFlatPage)
+def flatpage_post_change(sender, instance, **kwargs):
+    """Invalidate cached navigation menus of flat pages"""
+    bump_cache_version(FLATPAGE_NAVIGATION_CACHE_NAMESPACE)
@@ -1,11 +1,15 @@
 # coding=utf-8
 import logging
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_delete
 from django.dispatch.dispatcher import receiver
 
 from realtime.app_settings import LOGGER_NAME, ANALYSIS_LANGUAGES
-from realtime.models.flood import Flood
+from realtime.helpers.flood_frequency import (
+    remove_flood_frequency,
+    invalidate_flood_histogram)
+from realtime.helpers.pipeline import dispatch_event_task
+from realtime.models.flood import Flood, FloodEventBoundary
 from realtime.tasks.flood import generate_event_report
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
@@ -29,6 +33,20 @@ def flood_post_save(
     try:
         if instance.analysis_flag:
             for lang in ANALYSIS_LANGUAGES:
-                generate_event_report.delay(instance, locale=lang)
+                dispatch_event_task(
+                    generate_event_report, instance, locale=lang)
     except Exception as e:
         LOGGER.exception(e)
+
+
+@receiver(pre_delete)
+def flood_pre_delete(sender, instance, **kwargs):
+    """Uncount flooded boundaries of the flood before they are deleted"""
+
+    if not issubclass(sender, Flood):
+        return
+
+    remove_flood_frequency(instance)
+    invalidate_flood_histogram(
+        FloodEventBoundary.objects.filter(flood=instance).values_list(
+            'boundary_id', flat=True))
@@ -14,6 +14,11 @@ from django.core.files import File
 from core.celery_app import app
 from realtime.app_settings import LOGGER_NAME, REALTIME_HAZARD_DROP, \
     ASH_LAYER_ORDER, ASH_EXPOSURES, ASH_AGGREGATION, ASH_HAZARD_TYPE
+from realtime.helpers.pipeline import (
+    EventPipeline,
+    PipelineStep,
+    release_event_task)
+from realtime.helpers.task_arguments import fetch_task_instance
 from realtime.models.ash import Ash
 from realtime.tasks import get_keywords
 from realtime.tasks.headless.inasafe_wrapper import (
@@ -33,10 +38,15 @@ LOGGER = logging.getLogger(LOGGER_NAME)
 def generate_hazard_layer(ash_event):
     """Generate hazard layer from raw hazard file.
 
-    :param ash_event: Ash event instance
-    :type ash_event: Ash
+    :param ash_event: Reference of the ash event, see
+        realtime.helpers.task_arguments.task_reference
+    :type ash_event: dict
     :return:
     """
+    ash_event = fetch_task_instance(Ash, ash_event)
+    if not ash_event:
+        return
+    release_event_task(generate_hazard_layer, ash_event)
     ash_event.use_timezone()
 
     if ash_event.event_time.tzinfo:
@@ -93,31 +103,19 @@ def generate_hazard_layer(ash_event):
 def generate_event_report(ash_event, locale='en'):
     """Generate Ash Report
 
-    :param ash_event: Ash event instance
-    :type ash_event: Ash
+    Advance the processing pipeline of the ash event by one step.
+
+    :param ash_event: Reference of the ash event, see
+        realtime.helpers.task_arguments.task_reference
+    :type ash_event: dict
     :return:
     """
+    ash_event = fetch_task_instance(Ash, ash_event)
+    if not ash_event:
+        return
+    release_event_task(generate_event_report, ash_event, locale=locale)
     ash_event.use_timezone()
-    ash_event.inspected_language = locale
-
-    # Check impact layer
-    if (ash_event.hazard_layer_exists
-            and not ash_event.impact_layer_exists
-            and ash_event.need_run_analysis):
-
-        # If hazard exists but impact layer is not, then create a new analysis
-        # job.
-        run_ash_analysis(ash_event, locale)
-
-    # Check report
-    elif (ash_event.hazard_layer_exists
-          and ash_event.impact_layer_exists
-          and not ash_event.has_reports
-          and ash_event.need_generate_reports):
-
-        # If analysis is done but report doesn't exists, then create the
-        # reports.
-        generate_ash_report(ash_event, locale)
+    ASH_PIPELINE.advance(ash_event, locale)
 
 
 @app.task(queue='inasafe-django')
@@ -171,8 +169,9 @@ def run_ash_analysis(ash_event, locale='en'):
         ash_event.analysis_task_status = 'FAILURE'
 
     async_result = tasks_chain.apply_async()
-    ash_event.analysis_task_id = async_result.task_id
-    ash_event.analysis_task_status = async_result.state
+    ash_event.update_impact(
+        analysis_task_id=async_result.task_id,
+        analysis_task_status=async_result.state)
 
 
 @app.task(queue='inasafe-django')
@@ -204,8 +203,9 @@ def handle_analysis(analysis_result, event_id, locale='en'):
     else:
         LOGGER.error(analysis_result['message'])
 
-    ash.analysis_task_status = task_state
-    ash.analysis_task_result = json.dumps(analysis_result)
+    ash.update_impact(
+        analysis_task_status=task_state,
+        analysis_task_result=json.dumps(analysis_result))
     ash.save()
 
     return analysis_result
@@ -255,8 +255,9 @@ def generate_ash_report(ash_event, locale='en'):
 
     async_result = tasks_chain.apply_async()
 
-    ash_event.report_task_id = async_result.task_id
-    ash_event.report_task_status = async_result.status
+    ash_event.update_report(
+        report_task_id=async_result.task_id,
+        report_task_status=async_result.status)
 
 
 @app.task(queue='inasafe-django')
@@ -295,7 +296,24 @@ def handle_report(report_result, event_id, locale='en'):
 @app.task(queue='inasafe-django')
 def handle_keyword_version(version, event_id):
     """Handle keyword version."""
-    event = Ash.objects.get(id=event_id)
-    """:type: Earthquake"""
-    event.inasafe_version = version
-    event.save()
+    # Update without save, there is nothing to process further
+    Ash.objects.filter(id=event_id).update(inasafe_version=version)
+
+
+ASH_PIPELINE = EventPipeline([
+    PipelineStep(
+        'analysis',
+        lambda a: (
+            a.hazard_layer_exists
+            and not a.impact_layer_exists
+            and a.need_run_analysis),
+        run_ash_analysis),
+    PipelineStep(
+        'report',
+        lambda a: (
+            a.hazard_layer_exists
+            and a.impact_layer_exists
+            and not a.has_reports
+            and a.need_generate_reports),
+        generate_ash_report),
+])
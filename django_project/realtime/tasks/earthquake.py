@@ -6,6 +6,7 @@ standard_library.install_aliases()
 import json
 import logging
 import os
+import time
 import requests
 from urllib.parse import urljoin
 
@@ -16,13 +17,20 @@ from django.contrib.gis.gdal import DataSource
 from django.contrib.gis.geos import GEOSGeometry, Polygon, MultiPolygon
 from django.core.files import File
 from django.core.urlresolvers import reverse
+from django.db import transaction
 
 from core.celery_app import app
 from realtime.app_settings import LOGGER_NAME, FELT_EARTHQUAKE_URL, \
     EARTHQUAKE_EXPOSURES, EARTHQUAKE_AGGREGATION, \
     EARTHQUAKE_LAYER_ORDER, GRID_FILE_DEFAULT_NAME, \
-    EARTHQUAKE_HAZARD_TYPE
+    EARTHQUAKE_HAZARD_TYPE, BULK_CREATE_BATCH_SIZE
 from realtime.helpers.inaware import InAWARERest
+from realtime.helpers.pipeline import (
+    EventPipeline,
+    PipelineStep,
+    release_event_task)
+from realtime.helpers.simplification import store_simplified_contours
+from realtime.helpers.task_arguments import fetch_task_instance
 from realtime.models.earthquake import Earthquake, EarthquakeMMIContour
 from realtime.tasks.headless.inasafe_wrapper import \
     run_multi_exposure_analysis, generate_report, RESULT_SUCCESS, get_keywords
@@ -133,10 +141,17 @@ def retrieve_felt_earthquake_list():
 def generate_event_report(earthquake_event, locale='en'):
     """Generate Earthquake report
 
-    :param earthquake_event: Earthquake event instance
-    :type earthquake_event: Earthquake
+    Advance the processing pipeline of the earthquake by one step.
+
+    :param earthquake_event: Reference of the earthquake event, see
+        realtime.helpers.task_arguments.task_reference
+    :type earthquake_event: dict
     :return:
     """
+    earthquake_event = fetch_task_instance(Earthquake, earthquake_event)
+    if not earthquake_event:
+        return
+    release_event_task(generate_event_report, earthquake_event, locale=locale)
     earthquake_event.inspected_language = locale
 
     if not earthquake_event.hazard_layer_exists:
@@ -144,64 +159,68 @@ def generate_event_report(earthquake_event, locale='en'):
         # Skip all process if not exists
         return
 
-    # Check raw hazard stored
-    elif not earthquake_event.shake_grid_xml:
+    EARTHQUAKE_PIPELINE.advance(earthquake_event, locale)
 
-        # Store Grid XML from hazard path into db
-        if earthquake_event.shake_grid:
-            shake_grid_xml = earthquake_event.shake_grid.read()
 
-        # Attempt to get grid.xml by guessing from hazard path
-        else:
-            dir_name = os.path.dirname(earthquake_event.hazard_path)
-            grid_path = os.path.join(dir_name, GRID_FILE_DEFAULT_NAME)
-            with open(grid_path) as f:
-                shake_grid_xml = f.read()
+def store_shake_grid(earthquake_event, locale='en'):
+    """Store raw grid.xml of the earthquake in the database.
 
-        earthquake_event.shake_grid_xml = shake_grid_xml
-        earthquake_event.shake_grid_saved = True
+    :param earthquake_event: Earthquake event instance
+    :type earthquake_event: Earthquake
+    """
+    # Store Grid XML from hazard path into db
+    if earthquake_event.shake_grid:
+        shake_grid_xml = earthquake_event.shake_grid.read()
 
-        # Remove un-needed Grid XML
-        if earthquake_event.shake_grid:
-            earthquake_event.shake_grid.delete(save=False)
+    # Attempt to get grid.xml by guessing from hazard path
+    else:
+        dir_name = os.path.dirname(earthquake_event.hazard_path)
+        grid_path = os.path.join(dir_name, GRID_FILE_DEFAULT_NAME)
+        with open(grid_path) as f:
+            shake_grid_xml = f.read()
 
-        # Find matching initial shakemaps if this is a corrected one
-        initial_event = earthquake_event.initial_shakemaps
-        if initial_event:
-            initial_event.mark_shakemaps_has_corrected()
+    # Contents are stored compressed, out of the earthquake table
+    earthquake_event.store_blob(
+        Earthquake.SHAKE_GRID_XML_BLOB, shake_grid_xml)
+    earthquake_event.shake_grid_saved = True
 
-        # Find matching corrected shakemaps if this is an initial one
-        corrected_event = earthquake_event.corrected_shakemaps
-        if corrected_event:
-            # Set into property because it will gets saved.
-            earthquake_event.has_corrected = True
+    # Binary raster for point queries
+    try:
+        earthquake_event.store_shake_grid_raster(shake_grid_xml)
+    except ValueError as e:
+        LOGGER.exception(e)
 
-        # Use save to trigger signals again
-        earthquake_event.save()
+    # Remove un-needed Grid XML
+    if earthquake_event.shake_grid:
+        earthquake_event.shake_grid.delete(save=False)
 
-    # Check impact layer
-    elif (not earthquake_event.impact_layer_exists
-          and earthquake_event.need_run_analysis):
+    earthquake_event.link_shakemaps()
 
-        # If hazard exists but impact layer is not, then create a new analysis
-        # job.
-        run_earthquake_analysis(earthquake_event, locale=locale)
+    # Find matching initial shakemaps if this is a corrected one
+    initial_event = earthquake_event.initial_shakemaps
+    if initial_event:
+        initial_event.mark_shakemaps_has_corrected()
 
-    # Check MMI Contour saved
-    elif (earthquake_event.mmi_layer_exists
-          and not earthquake_event.mmi_layer_saved):
-        # Don't use celery for this
-        process_mmi_layer(earthquake_event)
-        earthquake_event.refresh_from_db()
-        earthquake_event.save()
+    # Find matching corrected shakemaps if this is an initial one
+    corrected_event = earthquake_event.corrected_shakemaps
+    if corrected_event:
+        # Set into property because it will gets saved.
+        earthquake_event.has_corrected = True
 
-    # Check report
-    elif (not earthquake_event.has_reports
-          and earthquake_event.need_generate_reports):
+    # Use save to trigger signals again
+    earthquake_event.save()
 
-        # If analysis is done but report doesn't exists, then create the
-        # reports.
-        generate_earthquake_report(earthquake_event, locale=locale)
+
+def store_mmi_contours(earthquake_event, locale='en'):
+    """Store MMI contours of the analysis in the database.
+
+    :param earthquake_event: Earthquake event instance
+    :type earthquake_event: Earthquake
+    """
+    # Don't use celery for this
+    process_mmi_layer(earthquake_event, locale=locale)
+    earthquake_event.refresh_from_db()
+    earthquake_event.save()
 
 
 def run_earthquake_analysis(event, locale='en'):
@@ -236,17 +255,25 @@ def run_earthquake_analysis(event, locale='en'):
     #     event.analysis_task_status = 'FAILURE'
 
     async_result = tasks_chain.apply_async()
-    event.analysis_task_id = async_result.task_id
-    event.analysis_task_status = async_result.state
+    event.update_impact(
+        analysis_task_id=async_result.task_id,
+        analysis_task_status=async_result.state)
 
 
 @app.task(queue='inasafe-django')
-def process_mmi_layer(earthquake):
+def process_mmi_layer(earthquake, locale='en'):
     """Process MMI contour layer and import it to database
 
-    :param earthquake: Instance of Earthquake
-    :type earthquake: realtime.models.earthquake.Earthquake
+    :param earthquake: Instance of Earthquake or its reference
+    :type earthquake: realtime.models.earthquake.Earthquake, dict
+
+    :param locale: The language of the analysis
+    :type locale: str
     """
+    earthquake = fetch_task_instance(Earthquake, earthquake, locale=locale)
+    if not earthquake:
+        return
+
     LOGGER.info('Processing MMI contour {0}'.format(
         earthquake.event_id_formatted))
 
@@ -261,38 +288,63 @@ def process_mmi_layer(earthquake):
 
     layer = source[0]
 
-    EarthquakeMMIContour.objects.filter(earthquake=earthquake).delete()
+    # Resolve field names once per layer instead of once per feature
+    fields = layer.fields
+    if 'MMI' in fields:
+        mmi_field = 'MMI'
+    elif 'mmi' in fields:
+        mmi_field = 'mmi'
+    else:
+        mmi_field = None
+
+    start_time = time.time()
+    feature_count = 0
+
+    with transaction.atomic():
+        EarthquakeMMIContour.objects.filter(earthquake=earthquake).delete()
+
+        contours = []
+        for feat in layer:
+            mmi = feat.get(mmi_field) if mmi_field else 0
+
+            properties = {}
+            for field in fields:
+                properties[field] = feat.get(field)
+
+            geometry = feat.geom
 
-    for feat in layer:
-        if 'MMI' in feat.fields:
-            mmi = feat.get('MMI')
-        elif 'mmi' in feat.fields:
-            mmi = feat.get('mmi')
-        else:
-            mmi = 0
+            # Build GEOS geometry directly from WKB, avoiding GeoJSON
+            # serialization round trip
+            geos_geometry = GEOSGeometry(geometry.wkb, srid=geometry.srid)
 
-        properties = {}
-        for field in feat.fields:
-            properties[field] = feat.get(field)
+            if isinstance(geos_geometry, Polygon):
+                # convert to multi polygon
+                geos_geometry = MultiPolygon(geos_geometry)
 
-        geometry = feat.geom
+            contours.append(EarthquakeMMIContour(
+                earthquake=earthquake,
+                geometry=geos_geometry,
+                mmi=mmi,
+                properties=json.dumps(properties)))
+            feature_count += 1
 
-        geos_geometry = GEOSGeometry(geometry.geojson)
+            if len(contours) >= BULK_CREATE_BATCH_SIZE:
+                EarthquakeMMIContour.objects.bulk_create(contours)
+                contours = []
 
-        if isinstance(geos_geometry, Polygon):
-            # convert to multi polygon
-            geos_geometry = MultiPolygon(geos_geometry)
+        if contours:
+            EarthquakeMMIContour.objects.bulk_create(contours)
 
-        EarthquakeMMIContour.objects.create(
-            earthquake=earthquake,
-            geometry=geos_geometry,
-            mmi=mmi,
-            properties=json.dumps(properties))
+        store_simplified_contours(earthquake)
 
     earthquake.refresh_from_db()
     earthquake.mark_shakemaps_has_contours(layer_saved=True)
 
-    LOGGER.info('MMI Contour processed...')
+    LOGGER.info(
+        'MMI Contour processed for {0}: {1} features in {2:.3f}s'.format(
+            earthquake.event_id_formatted,
+            feature_count,
+            time.time() - start_time))
     return True
 
 
@@ -310,8 +362,8 @@ def handle_analysis(analysis_result, event_id, locale='en'):
             earthquake.mmi_output_path = analysis_result[
                 'output']['population']['earthquake_contour']
 
-            # save earthquake MMI Contour
-            process_mmi_layer.delay(earthquake)
+            # MMI Contour is stored by the processing pipeline after the
+            # earthquake is saved
 
             chain(
                 get_keywords.s(
@@ -331,8 +383,9 @@ def handle_analysis(analysis_result, event_id, locale='en'):
     else:
         LOGGER.error(analysis_result['message'])
 
-    earthquake.analysis_task_status = task_state
-    earthquake.analysis_task_result = json.dumps(analysis_result)
+    earthquake.update_impact(
+        analysis_task_status=task_state,
+        analysis_task_result=json.dumps(analysis_result))
     earthquake.save()
 
     return analysis_result
@@ -385,8 +438,9 @@ def generate_earthquake_report(event, locale='en'):
 
     async_result = tasks_chain.apply_async()
 
-    event.report_task_id = async_result.task_id
-    event.report_task_status = async_result.status
+    event.update_report(
+        report_task_id=async_result.task_id,
+        report_task_status=async_result.status)
 
 
 @app.task(queue='inasafe-django')
@@ -427,7 +481,26 @@ def handle_report(report_result, event_id, locale='en'):
 @app.task(queue='inasafe-django')
 def handle_keyword_version(version, event_id):
     """Handle keyword version."""
-    event = Earthquake.objects.get(id=event_id)
-    """:type: Earthquake"""
-    event.inasafe_version = version
-    event.save()
+    # Update without save, there is nothing to process further
+    Earthquake.objects.filter(id=event_id).update(inasafe_version=version)
+
+
+EARTHQUAKE_PIPELINE = EventPipeline([
+    PipelineStep(
+        'hazard',
+        lambda e: not e.shake_grid_saved and not e.shake_grid_xml,
+        store_shake_grid,
+        shared=True),
+    PipelineStep(
+        'analysis',
+        lambda e: not e.impact_layer_exists and e.need_run_analysis,
+        run_earthquake_analysis),
+    PipelineStep(
+        'contours',
+        lambda e: e.mmi_layer_exists and not e.mmi_layer_saved,
+        store_mmi_contours),
+    PipelineStep(
+        'report',
+        lambda e: not e.has_reports and e.need_generate_reports,
+        generate_earthquake_report),
+])
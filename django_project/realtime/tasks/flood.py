@@ -6,6 +6,8 @@ import logging
 import os
 import shutil
 import tempfile
+import time
+from collections import OrderedDict
 from zipfile import ZipFile
 
 from celery import chain
@@ -20,13 +22,26 @@ from django.db.models import Sum
 from core.celery_app import app
 from realtime.app_settings import OSM_LEVEL_7_NAME, OSM_LEVEL_8_NAME, \
     FLOOD_EXPOSURE, FLOOD_AGGREGATION, FLOOD_LAYER_ORDER, LOGGER_NAME, \
-    FLOOD_HAZARD_TYPE
+    FLOOD_HAZARD_TYPE, BULK_CREATE_BATCH_SIZE
+from realtime.helpers.boundary_index import BoundaryIndex
+from realtime.helpers.flood_features import update_flood_event_features
+from realtime.helpers.flood_frequency import (
+    add_flood_frequency,
+    remove_flood_frequency,
+    invalidate_flood_histogram)
+from realtime.helpers.pipeline import (
+    EventPipeline,
+    PipelineStep,
+    release_event_task)
+from realtime.helpers.task_arguments import (
+    fetch_task_instance,
+    task_reference)
 from realtime.models.flood import (
     Flood,
     FloodEventBoundary,
-    Boundary,
     BoundaryAlias,
-    ImpactEventBoundary)
+    ImpactEventBoundary,
+    FloodEventFeatures)
 from realtime.tasks.headless.inasafe_wrapper import (
     run_analysis, generate_report, RESULT_SUCCESS, get_keywords)
 from realtime.tasks.realtime.flood import process_flood
@@ -39,14 +54,23 @@ __date__ = '12/3/15'
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
+# Attributes of a flood the processing of its layers depends on
+HAZARD_LAYER_STAMP_FIELDS = ('hazard_path', 'hazard_layer')
+IMPACT_LAYER_STAMP_FIELDS = ('impact_file_path', 'impact_layer')
+
 
 @app.task(queue='inasafe-django')
 def process_hazard_layer(flood):
     """Process hazard layer and import it to database
 
-    :param flood: Instance of flood
-    :type flood: realtime.models.flood.Flood
+    :param flood: Reference of the flood, see
+        realtime.helpers.task_arguments.task_reference
+    :type flood: dict
     """
+    flood = fetch_task_instance(Flood, flood, HAZARD_LAYER_STAMP_FIELDS)
+    if not flood:
+        return
+
     LOGGER.info('Processing hazard layer %s' % flood.event_id)
 
     if not BoundaryAlias.objects.all():
@@ -78,9 +102,8 @@ def process_hazard_layer(flood):
 
             # save flood data to database
             with open(layer_filename) as f:
-                Flood.objects.filter(id=flood.id).update(
-                    flood_data=f.read(),
-                    flood_date_saved=True)
+                flood.store_blob(Flood.FLOOD_DATA_BLOB, f.read())
+            Flood.objects.filter(id=flood.id).update(flood_data_saved=True)
 
     else:
         # process hazard layer
@@ -90,73 +113,95 @@ def process_hazard_layer(flood):
 
     layer = source[0]
 
-    FloodEventBoundary.objects.filter(flood=flood).delete()
+    if not flood.source or flood.source == 'petajakarta':
+        upstream_id_field = 'pkey'
+        level_name_field = 'level_name'
+        parent_name_field = 'parent_nam'
+    else:
+        # petabencana and hazard_file
+        upstream_id_field = 'area_id'
+        level_name_field = 'area_name'
+        parent_name_field = 'parent_name'
 
     kelurahan = BoundaryAlias.objects.get(alias=OSM_LEVEL_7_NAME)
     rw = BoundaryAlias.objects.get(alias=OSM_LEVEL_8_NAME)
 
-    for feat in layer:
-        if not flood.source or flood.source == 'petajakarta':
-            upstream_id = feat.get('pkey')
-            level_name = feat.get('level_name')
-            parent_name = feat.get('parent_nam')
-            state = feat.get('state')
-        elif flood.source == 'petabencana':
-            upstream_id = feat.get('area_id')
-            level_name = feat.get('area_name')
-            parent_name = feat.get('parent_name')
-            state = feat.get('state')
-        elif flood.source == 'hazard_file':
-            upstream_id = feat.get('area_id')
-            level_name = feat.get('area_name')
-            parent_name = feat.get('parent_name')
+    start_time = time.time()
+
+    with transaction.atomic():
+        # Preload all kelurahan and RW boundaries once
+        boundary_index = BoundaryIndex([kelurahan, rw])
+
+        # flooded RW boundary and its state, keyed by python object id so
+        # the last state wins for duplicated features.
+        flooded_boundaries = OrderedDict()
+
+        for feat in layer:
+            upstream_id = feat.get(upstream_id_field)
+            level_name = feat.get(level_name_field)
+            parent_name = feat.get(parent_name_field)
             state = feat.get('state')
 
-        geometry = feat.geom
+            geometry = feat.geom
 
-        geos_geometry = GEOSGeometry(geometry.geojson)
+            geos_geometry = GEOSGeometry(geometry.wkb, srid=geometry.srid)
 
-        if isinstance(geos_geometry, Polygon):
-            # convert to multi polygon
-            geos_geometry = MultiPolygon(geos_geometry)
+            if isinstance(geos_geometry, Polygon):
+                # convert to multi polygon
+                geos_geometry = MultiPolygon(geos_geometry)
 
-        # check parent exists
-        with transaction.atomic():
-            try:
-                boundary_kelurahan = Boundary.objects.get(
-                    name__iexact=parent_name.strip(),
-                    boundary_alias=kelurahan)
-            except Boundary.DoesNotExist:
-                boundary_kelurahan = Boundary.objects.create(
-                    upstream_id=upstream_id,
-                    geometry=geos_geometry,
+            # check parent exists
+            boundary_kelurahan = boundary_index.get_by_name(
+                kelurahan, parent_name)
+            if not boundary_kelurahan:
+                boundary_kelurahan = boundary_index.add(
+                    kelurahan,
                     name=parent_name,
-                    boundary_alias=kelurahan)
-                boundary_kelurahan.save()
-
-            try:
-                boundary_rw = Boundary.objects.get(
-                    upstream_id=upstream_id, boundary_alias=rw)
-                boundary_rw.geometry = geos_geometry
-                boundary_rw.name = level_name
-                boundary_rw.parent = boundary_kelurahan
-            except Boundary.DoesNotExist:
-                boundary_rw = Boundary.objects.create(
                     upstream_id=upstream_id,
-                    geometry=geos_geometry,
-                    name=level_name,
-                    parent=boundary_kelurahan,
-                    boundary_alias=rw)
+                    geometry=geos_geometry)
 
-            boundary_rw.save()
+            boundary_rw = boundary_index.upsert_by_upstream_id(
+                rw,
+                upstream_id=upstream_id,
+                name=level_name,
+                geometry=geos_geometry,
+                parent=boundary_kelurahan)
 
-        if not state or int(state) == 0:
-            continue
+            if not state or int(state) == 0:
+                flooded_boundaries.pop(id(boundary_rw), None)
+                continue
 
-        FloodEventBoundary.objects.create(
-            flood=flood,
-            boundary=boundary_rw,
-            hazard_data=int(state))
+            flooded_boundaries[id(boundary_rw)] = (boundary_rw, int(state))
+
+        boundary_index.flush()
+
+        # Boundaries of the previous run of this flood are touched too
+        touched_boundary_ids = list(
+            FloodEventBoundary.objects.filter(flood=flood).values_list(
+                'boundary_id', flat=True))
+        touched_boundary_ids += [
+            boundary_rw.id for boundary_rw, _ in flooded_boundaries.values()]
+
+        remove_flood_frequency(flood)
+        FloodEventBoundary.objects.filter(flood=flood).delete()
+        FloodEventBoundary.objects.bulk_create(
+            [
+                FloodEventBoundary(
+                    flood=flood,
+                    boundary_id=boundary_rw.id,
+                    hazard_data=state)
+                for boundary_rw, state in flooded_boundaries.values()
+            ],
+            batch_size=BULK_CREATE_BATCH_SIZE)
+        add_flood_frequency(flood)
+
+    invalidate_flood_histogram(touched_boundary_ids)
+
+    LOGGER.info(
+        'Hazard layer for {0}: {1} flooded boundaries in {2:.3f}s'.format(
+            flood.event_id,
+            len(flooded_boundaries),
+            time.time() - start_time))
 
     # Store boundary flooded in flood
     flood.boundary_flooded = calculate_boundary_flooded(flood)
@@ -164,6 +209,8 @@ def process_hazard_layer(flood):
     Flood.objects.filter(id=flood.id).update(
         boundary_flooded=flood.boundary_flooded)
 
+    update_flood_event_features(flood, FloodEventFeatures.HAZARD_FEATURES)
+
     # legacy cleanup
     if extract_dir:
         shutil.rmtree(extract_dir)
@@ -173,12 +220,21 @@ def process_hazard_layer(flood):
 
 
 @app.task(queue='inasafe-django')
-def process_impact_layer(flood):
+def process_impact_layer(flood, locale='en'):
     """Process zipped impact layer and import it to databse
 
-    :param flood: Event id of flood
-    :type flood: realtime.models.flood.Flood
+    :param flood: Reference of the flood, see
+        realtime.helpers.task_arguments.task_reference
+    :type flood: dict
+
+    :param locale: The language of the analysis
+    :type locale: str
     """
+    flood = fetch_task_instance(
+        Flood, flood, IMPACT_LAYER_STAMP_FIELDS, locale=locale)
+    if not flood:
+        return
+
     LOGGER.info('Processing impact layer %s ' % flood.event_id)
 
     # handle legacy logic
@@ -206,75 +262,114 @@ def process_impact_layer(flood):
 
     layer = source[0]
 
-    ImpactEventBoundary.objects.filter(flood=flood).delete()
+    start_time = time.time()
+
+    # Resolve field mapping once per layer
+    fields = layer.fields
+    if 'hazard_class' in fields:
+        hazard_class_field = 'hazard_class'
+    elif 'affected' in fields:
+        hazard_class_field = 'affected'
+    else:
+        hazard_class_field = 'safe_ag'
+
+    if 'exposure_name' in fields:
+        level_7_name_field = 'exposure_name'
+    else:
+        level_7_name_field = 'NAMA_KELUR'
+
+    if 'population' in fields:
+        population_field = 'population'
+    else:
+        population_field = 'Pop_Total'
+
+    # Read the layer column by column
+    hazard_classes = layer.get_fields(hazard_class_field)
+    level_7_names = layer.get_fields(level_7_name_field)
+    populations = layer.get_fields(population_field)
+    geometries = layer.get_geoms()
+    if 'affected' in fields:
+        affected_flags = layer.get_fields('affected')
+    else:
+        affected_flags = [True] * len(geometries)
 
     kelurahan = BoundaryAlias.objects.get(alias=OSM_LEVEL_7_NAME)
 
-    for feat in layer:
+    with transaction.atomic():
+        ImpactEventBoundary.objects.filter(flood=flood).delete()
+
+        # Preload kelurahan lookup table
+        boundary_index = BoundaryIndex([kelurahan])
+
+        rows = []
+        total_affected = 0
+        columns = zip(
+            affected_flags, hazard_classes, level_7_names, populations,
+            geometries)
+        for (affected, hazard_class, level_7_name, population_affected,
+                geometry) in columns:
 
-        try:
-            affected = feat.get('affected')
             if not affected and affected != 'True':
                 continue
-        except BaseException:
-            pass
-
-        affected = True
-
-        if 'hazard_class' in layer.fields:
-            hazard_class = feat.get('hazard_class')
-        elif 'affected' in layer.fields:
-            hazard_class = feat.get('affected')
-        else:
-            hazard_class = feat.get('safe_ag')
-
-        if 'exposure_name' in layer.fields:
-            level_7_name = feat.get('exposure_name').strip()
-        else:
-            level_7_name = feat.get('NAMA_KELUR').strip()
-
-        if 'population' in layer.fields:
-            population_affected = feat.get('population')
-        else:
-            population_affected = feat.get('Pop_Total')
-
-        geometry = feat.geom
-        geos_geometry = GEOSGeometry(geometry.geojson)
-
-        if isinstance(geos_geometry, Polygon):
-            # convert to multi polygon
-            geos_geometry = MultiPolygon(geos_geometry)
-
-        with transaction.atomic():
-            try:
-                boundary_kelurahan = Boundary.objects.get(
-                    name__iexact=level_7_name,
-                    boundary_alias=kelurahan)
-            except Boundary.DoesNotExist:
+
+            level_7_name = level_7_name.strip()
+
+            geos_geometry = GEOSGeometry(geometry.wkb, srid=geometry.srid)
+
+            if isinstance(geos_geometry, Polygon):
+                # convert to multi polygon
+                geos_geometry = MultiPolygon(geos_geometry)
+
+            boundary_kelurahan = boundary_index.get_by_name(
+                kelurahan, level_7_name)
+            if not boundary_kelurahan:
                 LOGGER.debug('Boundary does not exists: %s' % level_7_name)
                 LOGGER.debug('Kelurahan Boundary should have been filled '
                              'already')
                 # Will try to create new one
-                boundary_kelurahan = Boundary.objects.create(
-                    geometry=geos_geometry,
+                boundary_kelurahan = boundary_index.add(
+                    kelurahan,
                     name=level_7_name,
-                    boundary_alias=kelurahan)
-                boundary_kelurahan.save()
-
-        ImpactEventBoundary.objects.create(
-            flood=flood,
-            parent_boundary=boundary_kelurahan,
-            geometry=geos_geometry,
-            affected=affected,
-            population_affected=population_affected,
-            hazard_class=hazard_class
-        )
+                    upstream_id='',
+                    geometry=geos_geometry)
+
+            if population_affected is not None:
+                population_affected = int(population_affected)
+                total_affected += population_affected
+
+            rows.append((
+                boundary_kelurahan,
+                ImpactEventBoundary(
+                    flood=flood,
+                    geometry=geos_geometry,
+                    affected=True,
+                    population_affected=population_affected,
+                    hazard_class=hazard_class)))
+
+        boundary_index.flush()
+
+        impact_boundaries = []
+        for boundary_kelurahan, impact_boundary in rows:
+            impact_boundary.parent_boundary_id = boundary_kelurahan.id
+            impact_boundaries.append(impact_boundary)
+
+        ImpactEventBoundary.objects.bulk_create(
+            impact_boundaries, batch_size=BULK_CREATE_BATCH_SIZE)
+
     # Store affected population in flood
-    flood.total_affected = calculate_affected_population(flood)
+    flood.total_affected = total_affected
     # prevent infinite recursive save
     Flood.objects.filter(id=flood.id).update(
         total_affected=flood.total_affected)
 
+    update_flood_event_features(flood, FloodEventFeatures.IMPACT_FEATURES)
+
+    LOGGER.info(
+        'Impact layer for {0}: {1} features in {2:.3f}s'.format(
+            flood.event_id,
+            len(impact_boundaries),
+            time.time() - start_time))
+
     if extract_dir:
         shutil.rmtree(extract_dir)
 
@@ -326,9 +421,13 @@ def calculate_affected_population(flood):
 def recalculate_impact_info(flood):
     """Recalculate flood impact data.
 
-    :param flood: Flood object
-    :type flood: realtime.models.flood.Flood
+    :param flood: Flood object or its reference
+    :type flood: realtime.models.flood.Flood, dict
     """
+    flood = fetch_task_instance(Flood, flood)
+    if not flood:
+        return
+
     # calculate total boundary flooded in RW level
     flood.boundary_flooded = calculate_boundary_flooded(flood)
 
@@ -351,35 +450,36 @@ def create_flood_report():
 def generate_event_report(flood_event, locale='en'):
     """Generate Flood report
 
-    :param flood_event: Flood event instance
-    :type flood_event: Flood
+    Advance the processing pipeline of the flood by one step.
+
+    :param flood_event: Reference of the flood event, see
+        realtime.helpers.task_arguments.task_reference
+    :type flood_event: dict
     :return:
     """
-    flood_event.inspected_language = locale
-    if not flood_event.flood_data and flood_event.hazard_layer_exists:
-        with open(flood_event.hazard_path) as f:
-            flood_data = f.read()
-
-        Flood.objects.filter(
-            id=flood_event.id).update(
-            flood_data=flood_data,
-            flood_data_saved=True
-        )
+    flood_event = fetch_task_instance(Flood, flood_event)
+    if not flood_event:
+        return
+    release_event_task(generate_event_report, flood_event, locale=locale)
+    FLOOD_PIPELINE.advance(flood_event, locale)
 
-        process_hazard_layer.delay(flood_event)
 
-    if (flood_event.hazard_layer_exists
-            and not flood_event.impact_layer_exists
-            and flood_event.need_run_analysis):
+def store_flood_data(flood_event, locale='en'):
+    """Store raw hazard of the flood in the database and process it.
 
-        run_flood_analysis(flood_event, locale)
+    :param flood_event: Flood event instance
+    :type flood_event: Flood
+    """
+    with open(flood_event.hazard_path) as f:
+        flood_data = f.read()
 
-    elif (flood_event.hazard_layer_exists
-          and flood_event.impact_layer_exists
-          and not flood_event.has_reports
-          and flood_event.need_generate_reports):
+    # Contents are stored compressed, out of the flood table
+    flood_event.store_blob(Flood.FLOOD_DATA_BLOB, flood_data)
+    Flood.objects.filter(id=flood_event.id).update(flood_data_saved=True)
+    flood_event.flood_data_saved = True
 
-        generate_flood_report(flood_event, locale)
+    process_hazard_layer.delay(
+        task_reference(flood_event, HAZARD_LAYER_STAMP_FIELDS))
 
 
 def run_flood_analysis(flood_event, locale='en'):
@@ -415,8 +515,9 @@ def run_flood_analysis(flood_event, locale='en'):
         flood_event.analysis_task_status = 'FAILURE'
 
     async_result = tasks_chain.apply_async()
-    flood_event.analysis_task_id = async_result.task_id
-    flood_event.analysis_task_status = async_result.state
+    flood_event.update_impact(
+        analysis_task_id=async_result.task_id,
+        analysis_task_status=async_result.state)
 
 
 @app.task(queue='inasafe-django')
@@ -432,7 +533,9 @@ def handle_analysis(analysis_result, event_id, locale='en'):
                 'analysis_summary']
 
             task_state = 'SUCCESS'
-            process_impact_layer.delay(flood)
+            process_impact_layer.delay(
+                task_reference(flood, IMPACT_LAYER_STAMP_FIELDS),
+                locale=locale)
 
             chain(
                 get_keywords.s(
@@ -450,8 +553,9 @@ def handle_analysis(analysis_result, event_id, locale='en'):
     else:
         LOGGER.error(analysis_result['message'])
 
-    flood.analysis_task_status = task_state
-    flood.analysis_task_result = json.dumps(analysis_result)
+    flood.update_impact(
+        analysis_task_status=task_state,
+        analysis_task_result=json.dumps(analysis_result))
     flood.save()
 
     return analysis_result
@@ -504,8 +608,9 @@ def generate_flood_report(flood_event, locale='en'):
 
     async_result = tasks_chain.apply_async()
 
-    flood_event.report_task_id = async_result.task_id
-    flood_event.report_task_status = async_result.status
+    flood_event.update_report(
+        report_task_id=async_result.task_id,
+        report_task_status=async_result.status)
 
 
 @app.task(queue='inasafe-django')
@@ -544,7 +649,33 @@ def handle_report(report_result, event_id, locale='en'):
 @app.task(queue='inasafe-django')
 def handle_keyword_version(version, event_id):
     """Handle keyword version."""
-    event = Flood.objects.get(id=event_id)
-    """:type: Earthquake"""
-    event.inasafe_version = version
-    event.save()
+    # Update without save, there is nothing to process further
+    Flood.objects.filter(id=event_id).update(inasafe_version=version)
+
+
+FLOOD_PIPELINE = EventPipeline([
+    PipelineStep(
+        'hazard',
+        lambda f: (
+            not f.flood_data_saved
+            and f.hazard_layer_exists
+            and not f.flood_data),
+        store_flood_data,
+        shared=True,
+        blocking=False),
+    PipelineStep(
+        'analysis',
+        lambda f: (
+            f.hazard_layer_exists
+            and not f.impact_layer_exists
+            and f.need_run_analysis),
+        run_flood_analysis),
+    PipelineStep(
+        'report',
+        lambda f: (
+            f.hazard_layer_exists
+            and f.impact_layer_exists
+            and not f.has_reports
+            and f.need_generate_reports),
+        generate_flood_report),
+])
@@ -3,13 +3,18 @@ from __future__ import absolute_import
 
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pytz
-from celery.result import allow_join_result
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive
 
 from core.celery_app import app
-from realtime.app_settings import LOGGER_NAME
+from realtime.app_settings import (
+    LOGGER_NAME,
+    REALTIME_BROKER_CHECK_EXPIRES,
+    REALTIME_BROKER_CHECK_TIME_LIMIT)
+from realtime.helpers.indicator_snapshot import take_indicator_snapshots
 from realtime.helpers.realtime_broker_indicator import RealtimeBrokerIndicator
 from realtime.scripts.check_indicators import check_indicator_status
 from realtime.tasks.realtime.generic import check_broker_connection
@@ -20,6 +25,10 @@ __date__ = '2/17/16'
 
 LOGGER = logging.getLogger(LOGGER_NAME)
 
+# A realtime broker probe older than this was discarded or killed
+PROBE_TIMEOUT = timedelta(
+    seconds=REALTIME_BROKER_CHECK_EXPIRES + REALTIME_BROKER_CHECK_TIME_LIMIT)
+
 
 @app.task(queue='inasafe-django-indicator')
 def log_error(task_id):
@@ -31,27 +40,86 @@ def log_error(task_id):
                 task_id, result.result, result.traceback))
 
 
-@app.task(queue='inasafe-django-indicator')
-def update_indicator(check_broker_retval):
-    if check_broker_retval:
-        indicator = RealtimeBrokerIndicator()
-        now = datetime.utcnow().replace(tzinfo=pytz.utc)
-        indicator.value = now
-        return True
-    return False
+def probe_latency(result, sent_time):
+    """Round trip of a realtime broker probe.
+
+    The round trip is measured up to the completion time recorded by the
+    result backend, or up to now if the backend doesn't record it.
+
+    :param result: Result of the probe
+    :type result: celery.result.AsyncResult
+
+    :param sent_time: Time the probe was sent
+    :type sent_time: datetime
+
+    :rtype: timedelta
+    """
+    done_time = result.date_done
+    if done_time is not None and not isinstance(done_time, datetime):
+        try:
+            done_time = parse_datetime(done_time)
+        except (TypeError, ValueError):
+            done_time = None
+    if done_time is None:
+        done_time = datetime.utcnow().replace(tzinfo=pytz.utc)
+    elif is_naive(done_time):
+        # Celery records completion time in UTC
+        done_time = done_time.replace(tzinfo=pytz.utc)
+    return max(done_time - sent_time, timedelta(0))
 
 
 @app.task(queue='inasafe-django-indicator')
 def check_realtime_broker():
-    res = check_broker_connection.delay()
-    # wait to sync result
+    """Check the realtime broker connection, without waiting for a reply.
+
+    Each run polls the probe sent by the previous run and records its round
+    trip if it came back, then sends a new probe. The probe is a task of the
+    realtime Celery app, so its result is read from the realtime result
+    backend. No task of this app can be chained to it, as our workers don't
+    consume the realtime broker.
+
+    Probes are discarded once expired, so they don't pile up when the
+    realtime broker is slow.
+
+    :return: True if the previous probe came back
+    :rtype: bool
+    """
+    indicator = RealtimeBrokerIndicator()
+    now = datetime.utcnow().replace(tzinfo=pytz.utc)
+    connected = False
+
+    if indicator.probe:
+        task_id, sent_time = indicator.probe
+        result = check_broker_connection.AsyncResult(task_id)
+        try:
+            if result.ready():
+                if result.successful() and result.result:
+                    indicator.latency = probe_latency(result, sent_time)
+                    LOGGER.info(
+                        'Realtime broker round trip: %s', indicator.latency)
+                    indicator.value = now
+                    connected = True
+            elif now - sent_time < PROBE_TIMEOUT:
+                # Still in flight, don't stack another probe
+                return False
+        except BaseException as e:
+            LOGGER.exception(e)
+
     try:
-        with allow_join_result():
-            update_indicator.delay(res.get())
-            return res.get()
+        result = check_broker_connection.apply_async(
+            queue=check_broker_connection.queue,
+            expires=REALTIME_BROKER_CHECK_EXPIRES,
+            time_limit=REALTIME_BROKER_CHECK_TIME_LIMIT)
+        indicator.probe = (result.id, now)
     except BaseException as e:
         LOGGER.exception(e)
-    return False
+    return connected
+
+
+@app.task(queue='inasafe-django-indicator')
+def snapshot_indicators():
+    take_indicator_snapshots()
+    return True
 
 
 @app.task(queue='inasafe-django-indicator')
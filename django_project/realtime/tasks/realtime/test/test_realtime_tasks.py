@@ -129,7 +129,7 @@ class TestEarthquakeTasks(test.LiveServerTestCase):
                     shake_id='20180220163351',
                     source_type=Earthquake.INITIAL_SOURCE_TYPE)
                 if (target_event.hazard_layer_exists
-                        and target_event.shake_grid_xml):
+                        and target_event.shake_grid_saved):
                     break
             except BaseException:
                 pass
@@ -138,7 +138,7 @@ class TestEarthquakeTasks(test.LiveServerTestCase):
             time.sleep(5)
 
         self.assertTrue(target_event.hazard_layer_exists)
-        self.assertTrue(target_event.shake_grid_xml)
+        self.assertTrue(target_event.read_shake_grid_xml())
 
         initial_event = target_event
 
@@ -166,7 +166,7 @@ class TestEarthquakeTasks(test.LiveServerTestCase):
                     shake_id='20180220162928_50_01400_124450_20180220162928',
                     source_type=Earthquake.CORRECTED_SOURCE_TYPE)
                 if (target_event.hazard_layer_exists
-                        and target_event.shake_grid_xml):
+                        and target_event.shake_grid_saved):
                     break
             except BaseException:
                 pass
@@ -175,7 +175,7 @@ class TestEarthquakeTasks(test.LiveServerTestCase):
             time.sleep(5)
 
         self.assertTrue(target_event.hazard_layer_exists)
-        self.assertTrue(target_event.shake_grid_xml)
+        self.assertTrue(target_event.read_shake_grid_xml())
 
         # Check that corrected shakemaps can be requested from initial
         # shakemaps
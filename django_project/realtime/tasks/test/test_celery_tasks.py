@@ -5,11 +5,14 @@ import unittest
 from django import test
 from timeout_decorator import timeout_decorator
 
-from realtime.app_settings import LOGGER_NAME
+from realtime.app_settings import LOGGER_NAME, REALTIME_BROKER_CHECK_EXPIRES
+from realtime.helpers.base_indicator import STATUS_HEALTHY
+from realtime.helpers.realtime_broker_indicator import RealtimeBrokerIndicator
 from realtime.tasks import (
     check_realtime_broker,
     retrieve_felt_earthquake_list)
 from realtime.tasks.realtime.celery_app import app as realtime_app
+from realtime.tasks.realtime.generic import check_broker_connection
 from realtime.utils import celery_worker_connected
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
@@ -30,9 +33,22 @@ class CeleryTaskTest(test.SimpleTestCase):
         celery_worker_connected(realtime_app, 'inasafe-realtime'),
         'Realtime Worker needs to be run')
     def test_indicator(self):
-        """Test broker connection."""
-        result = check_realtime_broker.delay()
-        self.assertTrue(result.get())
+        """Test broker connection probe updates the indicator."""
+        RealtimeBrokerIndicator().probe = None
+
+        # First run only sends a probe
+        self.assertFalse(check_realtime_broker())
+        task_id, sent_time = RealtimeBrokerIndicator().probe
+        self.assertTrue(check_broker_connection.AsyncResult(task_id).get(
+            timeout=REALTIME_BROKER_CHECK_EXPIRES))
+
+        # Next run records the probe reply and sends a new probe
+        self.assertTrue(check_realtime_broker())
+        indicator = RealtimeBrokerIndicator()
+        self.assertGreaterEqual(indicator.value, sent_time)
+        self.assertIsNotNone(indicator.latency)
+        self.assertEqual(indicator.status, STATUS_HEALTHY)
+        self.assertNotEqual(indicator.probe[0], task_id)
 
     @timeout_decorator.timeout(LOCAL_TIMEOUT)
     @unittest.skipUnless(
@@ -1,5 +1,6 @@
 # coding=utf-8
 import datetime
+import json
 import logging
 import os
 import shutil
@@ -12,20 +13,26 @@ from django.contrib.gis.geos.point import Point
 from django.core.files.base import File
 from django.core.urlresolvers import reverse
 from django.db import connections
-from django.test.client import Client
+from django.test.client import Client, RequestFactory
+from mock import patch
 from rest_framework import status
+from rest_framework.request import Request
 from rest_framework.test import APITestCase
 from rest_framework_gis.fields import GeoJsonDict
 
 from core.settings.utils import ABS_PATH
 from realtime.app_settings import REST_GROUP
+from realtime.helpers.earthquake_ingest import stored_shakemaps
 from realtime.models.earthquake import Earthquake, EarthquakeReport
+from realtime.models.user_push import UserPush
 from realtime.serializers.earthquake_serializer import EarthquakeSerializer, \
     EarthquakeReportSerializer
 from realtime.serializers.pagination_serializer import \
     PageNumberPaginationSerializer
+from realtime.views.earthquake import EarthquakeFeatureList, EarthquakeList
+from realtime.views.pagination import EarthquakeKeysetPagination
 from realtime.tests.utilities import test_concurrently, \
-    assertEqualDictionaryWithFiles
+    assertEqualDictionaryWithFiles, response_content
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 __date__ = '20/06/15'
@@ -416,6 +423,185 @@ class TestEarthquake(APITestCase):
                 self.assertEqual(value, serializer.data[key])
         earthquake.delete()
 
+    def test_earthquake_bulk_post(self):
+        """Test ingesting many shake events at once."""
+        with open(self.data_path('grid.xml')) as grid_file:
+            shake_grid_xml = grid_file.read()
+        events = [
+            {
+                'shake_id': u'20150619200628',
+                'source_type': u'initial',
+                'magnitude': 4.6,
+                'time': u'2015-06-19T13:06:28Z',
+                'depth': 10.0,
+                'location': {
+                    u'type': u'Point',
+                    u'coordinates': [126.52, 4.16]
+                },
+                'location_description': u'Manado'
+            },
+            {
+                'shake_id': u'20150620101010',
+                'source_type': u'initial',
+                'magnitude': 5.1,
+                'time': u'2015-06-20T10:10:10Z',
+                'depth': 12.0,
+                'location': {
+                    u'type': u'Point',
+                    u'coordinates': [120.0, -2.0]
+                },
+                'location_description': u'Palu',
+                'shake_grid_xml': shake_grid_xml
+            },
+            {
+                'shake_id': u'20150620101010_52',
+                'source_type': u'corrected',
+                'magnitude': 5.1,
+                'time': u'2015-06-20T10:10:10Z',
+                'depth': 12.0,
+                'location': {
+                    u'type': u'Point',
+                    u'coordinates': [120.0, -2.0]
+                },
+                'location_description': u'Palu'
+            },
+        ]
+        body = u'\n'.join(json.dumps(event) for event in events)
+
+        with patch(
+                'realtime.views.earthquake.dispatch_event_task_group') as \
+                dispatch:
+            response = self.client.post(
+                reverse('realtime:earthquake_bulk_list'),
+                body,
+                content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['created']), 2)
+        self.assertEqual(
+            response.data['skipped'],
+            [{'shake_id': u'20150619200628', 'source_type': u'initial'}])
+
+        # Processing is scheduled once for all new shakemaps
+        self.assertEqual(dispatch.call_count, 1)
+        self.assertEqual(len(dispatch.call_args[0][1]), 2)
+
+        initial = Earthquake.objects.get(
+            shake_id=u'20150620101010', source_type=u'initial')
+        self.assertTrue(initial.shake_grid_saved)
+        self.assertTrue(initial.has_corrected)
+        self.assertEqual(initial.read_shake_grid_xml(), shake_grid_xml)
+        corrected = Earthquake.objects.get(
+            shake_id=u'20150620101010_52', source_type=u'corrected')
+        self.assertEqual(corrected.initial_shakemap, initial)
+
+        # Invalid events are not stored
+        events[1]['magnitude'] = u'invalid'
+        events[1]['shake_id'] = u'20150621101010'
+        response = self.client.post(
+            reverse('realtime:earthquake_bulk_list'),
+            u'\n'.join(json.dumps(event) for event in events),
+            content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            Earthquake.objects.filter(shake_id=u'20150621101010').exists())
+
+    def test_earthquake_bulk_post_race(self):
+        """Test shakemaps stored by a concurrent request are skipped."""
+        events = [
+            {
+                'shake_id': self.earthquake.shake_id,
+                'source_type': self.earthquake.source_type,
+                'magnitude': 4.6,
+                'time': u'2015-06-19T13:06:28Z',
+                'depth': 10.0,
+                'location': {
+                    u'type': u'Point',
+                    u'coordinates': [126.52, 4.16]
+                },
+                'location_description': u'Manado'
+            },
+            {
+                'shake_id': u'20150620101010',
+                'source_type': u'initial',
+                'magnitude': 5.1,
+                'time': u'2015-06-20T10:10:10Z',
+                'depth': 12.0,
+                'location': {
+                    u'type': u'Point',
+                    u'coordinates': [120.0, -2.0]
+                },
+                'location_description': u'Palu'
+            },
+        ]
+
+        # The first check runs before the concurrent insert
+        checks = []
+
+        def racing_stored_shakemaps(keys):
+            checks.append(keys)
+            if len(checks) == 1:
+                return set()
+            return stored_shakemaps(keys)
+
+        with patch(
+                'realtime.views.earthquake.stored_shakemaps',
+                side_effect=racing_stored_shakemaps), \
+                patch('realtime.views.earthquake.dispatch_event_task_group'):
+            response = self.client.post(
+                reverse('realtime:earthquake_bulk_list'),
+                u'\n'.join(json.dumps(event) for event in events),
+                content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(checks), 2)
+        self.assertEqual(
+            response.data['created'],
+            [{'shake_id': u'20150620101010', 'source_type': u'initial'}])
+        self.assertEqual(
+            response.data['skipped'],
+            [{
+                'shake_id': self.earthquake.shake_id,
+                'source_type': self.earthquake.source_type
+            }])
+
+    def test_track_rest_push(self):
+        """Test last REST push is written by the push request."""
+        shake_json = {
+            'shake_id': u'20150619200629',
+            'source_type': u'initial',
+            'magnitude': 4.6,
+            'time': u'2015-06-19T12:59:29Z',
+            'depth': 10.0,
+            'location': {
+                u'type': u'Point',
+                u'coordinates': [126.52, 4.16]
+            },
+            'location_description': u'Manado'
+        }
+
+        before = datetime.datetime.utcnow().replace(tzinfo=pytz.utc)
+        response = self.client.post(
+            reverse('realtime:earthquake_list'),
+            shake_json,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user_push = UserPush.objects.get(user=self.user)
+        self.assertGreaterEqual(user_push.last_rest_push, before)
+
+        # Later pushes update the same row, older times are kept out
+        future = before + datetime.timedelta(hours=1)
+        UserPush.objects.filter(id=user_push.id).update(last_rest_push=future)
+        shake_json['shake_id'] = u'20150619200630'
+        response = self.client.post(
+            reverse('realtime:earthquake_list'),
+            shake_json,
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            UserPush.objects.get(user=self.user).last_rest_push, future)
+        user_push.delete()
+
     def compare_geo_json_dict(self, val1, val2):
         if isinstance(val1, dict) and isinstance(val2, GeoJsonDict):
             self.compare_geo_json_dict(val2, val1)
@@ -885,3 +1071,73 @@ class TestEarthquake(APITestCase):
                 earthquake__shake_id=req_args['shake_id'],
                 language=req_args['language']
             ).delete()
+
+    def test_earthquake_list_keyset_pagination(self):
+        """Test paging earthquakes with cursors and sparse fields."""
+        for hour in (1, 2):
+            Earthquake.objects.create(
+                shake_id='2015061920062{0}'.format(hour),
+                source_type='initial',
+                magnitude=5.0,
+                time=self.earthquake.time - datetime.timedelta(hours=hour),
+                depth=10,
+                location=Point(x=126.52, y=4.16, srid=4326),
+                location_description='Manado')
+
+        url = reverse('realtime:earthquake_list')
+        shake_ids = []
+        with patch.object(EarthquakeKeysetPagination, 'page_size', 2):
+            response = self.client.get(
+                url, {'cursor': '', 'fields': 'shake_id,time'})
+            while True:
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', response.data)
+                for result in response.data['results']:
+                    self.assertEqual(
+                        set(result.keys()), {'shake_id', 'time'})
+                    shake_ids.append(result['shake_id'])
+                if not response.data['next']:
+                    break
+                response = self.client.get(response.data['next'])
+
+            # Back to the first page
+            response = self.client.get(response.data['previous'])
+            self.assertEqual(
+                [r['shake_id'] for r in response.data['results']],
+                shake_ids[:2])
+
+        self.assertEqual(
+            shake_ids,
+            ['20150619200628', '20150619200621', '20150619200622'])
+
+    def test_earthquake_list_prefetch(self):
+        """Test reports are only prefetched if they are serialized."""
+        def prefetched(view_class, **query):
+            view = view_class()
+            view.request = Request(RequestFactory().get('/', query))
+            return view.get_queryset()._prefetch_related_lookups
+
+        self.assertEqual(['reports'], prefetched(EarthquakeList))
+        self.assertEqual(
+            ['reports'], prefetched(EarthquakeList, fields='reports'))
+        self.assertEqual([], prefetched(EarthquakeList, fields='shake_id'))
+        self.assertEqual([], prefetched(EarthquakeFeatureList))
+
+    def test_earthquake_feature_list_cache(self):
+        """Test cached feature collection is invalidated on save."""
+        url = reverse('realtime:earthquake_feature_list')
+
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        features = json.loads(response_content(response))['features']
+        self.assertEqual(len(features), 1)
+        self.assertEqual(
+            features[0]['properties']['location_description'], 'Manado')
+
+        self.earthquake.location_description = 'Bitung'
+        self.earthquake.save()
+
+        response = self.client.get(url, format='json')
+        features = json.loads(response_content(response))['features']
+        self.assertEqual(
+            features[0]['properties']['location_description'], 'Bitung')
@@ -0,0 +1,294 @@
+# coding=utf-8
+"""Tests of the realtime management commands."""
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.gis.geos import LineString
+from django.core import management
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from mock import patch
+
+from realtime.management.commands.checkprocessedeq import (
+    Command as CheckProcessedCommand)
+from realtime.management.commands.updateshakemapscacheflag import (
+    Command as UpdateCacheFlagCommand)
+from realtime.models.earthquake import (
+    Earthquake,
+    EarthquakeMMIContour,
+    EarthquakeReport)
+from realtime.models.impact import Impact
+from realtime.tests.model_factories import EarthquakeFactory
+
+
+def utc_datetime(*args):
+    return datetime.datetime(*args, tzinfo=timezone.utc)
+
+
+class TestCheckProcessedEarthquake(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        patcher = patch('realtime.signals.earthquake.dispatch_event_task')
+        self.dispatch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Reports of all languages
+        self.complete = EarthquakeFactory.create(
+            shake_id='20180210000000', time=utc_datetime(2018, 2, 10))
+        for lang in ['en', 'id']:
+            self.create_report(self.complete, lang)
+
+        # English report, indonesian impact
+        self.partial = EarthquakeFactory.create(
+            shake_id='20180211000000', time=utc_datetime(2018, 2, 11))
+        self.create_report(self.partial, 'en')
+        self.impact_path = os.path.join(self.media_root, 'impact.zip')
+        with open(self.impact_path, 'w') as impact_file:
+            impact_file.write('impact')
+        Impact.objects.create(
+            content_object=self.partial,
+            language='id',
+            impact_file_path=self.impact_path)
+
+        # English impact without file, nothing else
+        self.missing = EarthquakeFactory.create(
+            shake_id='20180212000000', time=utc_datetime(2018, 2, 12))
+        self.missing_path = os.path.join(self.media_root, 'missing.zip')
+        Impact.objects.create(
+            content_object=self.missing,
+            language='en',
+            impact_file_path=self.missing_path)
+
+        # Nothing, before --since
+        self.old = EarthquakeFactory.create(
+            shake_id='20180101000000', time=utc_datetime(2018, 1, 1))
+
+        self.dispatch.reset_mock()
+
+    def create_report(self, earthquake, language):
+        EarthquakeReport.objects.create(
+            earthquake=earthquake,
+            language=language,
+            report_pdf='reports/earthquake/pdf/{0}-{1}.pdf'.format(
+                earthquake.shake_id, language))
+
+    def call_command(self, **options):
+        out = io.StringIO()
+        with patch(
+                'realtime.management.commands.checkprocessedeq.time') as time:
+            management.call_command('checkprocessedeq', stdout=out, **options)
+        return out.getvalue(), time.sleep
+
+    def test_find_missing_reports(self):
+        """Test earthquake and language pairs found without report."""
+        missing_since = [
+            (self.partial.id, 'id', self.impact_path),
+            (self.missing.id, 'en', self.missing_path),
+            (self.missing.id, 'id', None),
+        ]
+        self.assertEqual(
+            missing_since,
+            CheckProcessedCommand.find_missing_reports(
+                since=utc_datetime(2018, 2, 1)))
+        missing_old = [(self.old.id, 'en', None), (self.old.id, 'id', None)]
+        self.assertEqual(
+            missing_old + missing_since,
+            CheckProcessedCommand.find_missing_reports())
+
+    def test_dry_run(self):
+        """Test nothing is reprocessed in dry run."""
+        output, sleep = self.call_command(since='2018/02/01', dry_run=True)
+
+        self.assertIn('Total Unprocessed impacts (2)', output)
+        self.assertIn('Total Unprocessed reports (3)', output)
+        self.assertFalse(self.dispatch.called)
+        self.assertFalse(sleep.called)
+
+    def test_reprocess(self):
+        """Test earthquakes are reprocessed once, a chunk at a time."""
+        output, sleep = self.call_command(
+            since='2018/02/01', chunk_size=1, chunk_delay=5)
+
+        self.assertIn('Reprocessed 1 of 2 earthquakes', output)
+        self.assertIn('Reprocessed 2 of 2 earthquakes', output)
+        sleep.assert_called_once_with(5)
+        self.assertEqual(
+            set([self.partial.id, self.missing.id]),
+            set(c[0][1].id for c in self.dispatch.call_args_list))
+
+        # Only the earthquake missing impact files reruns its analysis
+        self.assertTrue(self.partial.impacts.exists())
+        self.assertFalse(self.missing.impacts.exists())
+        self.assertFalse(self.partial.reports.exists())
+        self.assertEqual(2, self.complete.reports.count())
+
+
+class TestUpdateShakemapsCacheFlag(TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.checkpoint = os.path.join(self.tempdir, 'checkpoint.json')
+
+        patcher = patch('realtime.signals.earthquake.dispatch_event_task')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Grid column and contours, corrected with grid blob
+        self.initial_a = self.create_earthquake(
+            '20180210000000', utc_datetime(2018, 2, 10))
+        self.corrected_a = self.create_earthquake(
+            '20180210000000_50_01400_124450_20180210000000',
+            utc_datetime(2018, 2, 10),
+            source_type=Earthquake.CORRECTED_SOURCE_TYPE)
+        Earthquake.objects.filter(id=self.initial_a.id).update(
+            shake_grid_xml='<grid/>')
+        self.create_contour(self.initial_a)
+        self.corrected_a.store_blob(
+            Earthquake.SHAKE_GRID_XML_BLOB, '<grid/>')
+
+        # Nothing, corrected with contours
+        self.initial_b = self.create_earthquake(
+            '20180220000000', utc_datetime(2018, 2, 20))
+        self.corrected_b = self.create_earthquake(
+            '20180220000000_50_01400_124450_20180220000000',
+            utc_datetime(2018, 2, 20),
+            source_type=Earthquake.CORRECTED_SOURCE_TYPE)
+        self.create_contour(self.corrected_b)
+
+        # Stale flags, without corrected nor contours
+        self.initial_c = self.create_earthquake(
+            '20180221000000', utc_datetime(2018, 2, 21))
+
+        # Flags and links as if they were never computed
+        Earthquake.objects.update(
+            has_corrected=False,
+            mmi_layer_saved=False,
+            shake_grid_saved=False)
+        Earthquake.objects.filter(id=self.corrected_a.id).update(
+            initial_shakemap=self.initial_a)
+        Earthquake.objects.filter(id=self.corrected_b.id).update(
+            initial_shakemap=self.initial_b)
+        Earthquake.objects.filter(id=self.initial_c.id).update(
+            has_corrected=True, mmi_layer_saved=True)
+
+        # has_corrected, mmi_layer_saved, shake_grid_saved
+        self.expected_flags = {
+            self.initial_a.id: (True, True, True),
+            self.corrected_a.id: (False, False, True),
+            self.initial_b.id: (True, False, False),
+            self.corrected_b.id: (False, True, False),
+            self.initial_c.id: (False, False, False),
+        }
+
+    def create_earthquake(self, shake_id, time, **kwargs):
+        return EarthquakeFactory.create(shake_id=shake_id, time=time, **kwargs)
+
+    def create_contour(self, earthquake):
+        EarthquakeMMIContour.objects.create(
+            earthquake=earthquake,
+            geometry=LineString(
+                (106.0, -6.0, 0), (106.5, -6.0001, 0), (107.0, -6.0, 0),
+                srid=4326),
+            mmi=5,
+            properties='{}')
+
+    def flags(self):
+        """Flags of all earthquakes, by earthquake id."""
+        values = Earthquake.objects.values_list(
+            'id', 'has_corrected', 'mmi_layer_saved', 'shake_grid_saved')
+        return dict((eq[0], tuple(eq[1:])) for eq in values)
+
+    def updated_flags(self, earthquakes):
+        """Expected flags, where only the given earthquakes are updated."""
+        flags = self.flags()
+        flags.update(
+            (eq.id, self.expected_flags[eq.id]) for eq in earthquakes)
+        return flags
+
+    def test_update_flags(self):
+        """Test flags are recomputed by the set based updates."""
+        updated = UpdateCacheFlagCommand.update_flags(
+            list(self.expected_flags.keys()))
+
+        self.assertEqual(
+            {
+                'shake_grid_saved': 2,
+                'has_corrected': 3,
+                'mmi_layer_saved': 3
+            },
+            updated)
+        self.assertEqual(self.expected_flags, self.flags())
+
+        # Only changed flags are written
+        updated = UpdateCacheFlagCommand.update_flags(
+            list(self.expected_flags.keys()))
+        self.assertEqual([0, 0, 0], list(updated.values()))
+
+    def test_since(self):
+        """Test only shakemaps since the date are updated."""
+        expected = self.updated_flags([
+            self.initial_b, self.corrected_b, self.initial_c])
+
+        management.call_command('updateshakemapscacheflag', since='2018/02/15')
+
+        self.assertEqual(expected, self.flags())
+
+    def test_checkpoint(self):
+        """Test an interrupted run resumes after the last batch."""
+        update_flags = UpdateCacheFlagCommand.update_flags
+        batches = []
+
+        def interrupted_update_flags(earthquake_ids):
+            if batches:
+                raise RuntimeError('Interrupted')
+            batches.append(earthquake_ids)
+            return update_flags(earthquake_ids)
+
+        with patch.object(
+                UpdateCacheFlagCommand, 'update_flags',
+                side_effect=interrupted_update_flags):
+            with self.assertRaises(RuntimeError):
+                management.call_command(
+                    'updateshakemapscacheflag',
+                    batch_size=2,
+                    checkpoint=self.checkpoint)
+
+        self.assertEqual([[self.initial_a.id, self.corrected_a.id]], batches)
+        with open(self.checkpoint) as f:
+            self.assertEqual(
+                {'since': None, 'last_id': self.corrected_a.id}, json.load(f))
+
+        # Resumes after the first batch
+        Earthquake.objects.filter(id=self.initial_a.id).update(
+            has_corrected=False)
+        expected = self.updated_flags([
+            self.initial_b, self.corrected_b, self.initial_c])
+
+        management.call_command(
+            'updateshakemapscacheflag',
+            batch_size=2,
+            checkpoint=self.checkpoint)
+
+        self.assertEqual(expected, self.flags())
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_checkpoint_of_other_run(self):
+        """Test a checkpoint of another --since is ignored."""
+        with open(self.checkpoint, 'w') as f:
+            json.dump({'since': '2018/01/01', 'last_id': self.initial_c.id}, f)
+
+        management.call_command(
+            'updateshakemapscacheflag', checkpoint=self.checkpoint)
+
+        self.assertEqual(self.expected_flags, self.flags())
@@ -0,0 +1,335 @@
+# coding=utf-8
+"""Tests of flood hazard and impact layers ingestion."""
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import pytz
+
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.urlresolvers import reverse
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from mock import patch
+
+from realtime.app_settings import OSM_LEVEL_7_NAME, OSM_LEVEL_8_NAME
+from realtime.models.flood import (
+    Boundary,
+    BoundaryAlias,
+    BoundaryFloodFrequency,
+    Flood,
+    FloodEventBoundary,
+    ImpactEventBoundary)
+from realtime.helpers.flood_frequency import flood_histogram
+from realtime.tasks.flood import process_hazard_layer, process_impact_layer
+from realtime.tests.model_factories import FloodFactory
+
+
+def square(x, y, size=0.001):
+    """Coordinates of a square polygon with its south west corner at x, y.
+    """
+    return [[
+        [x, y], [x, y + size], [x + size, y + size], [x + size, y], [x, y]]]
+
+
+def hazard_feature(area_id, name, parent_name, state, coordinates):
+    """Properties and coordinates of a flooded RW in a hazard layer."""
+    return {
+        'area_id': area_id,
+        'area_name': name,
+        'parent_name': parent_name,
+        'state': state
+    }, coordinates
+
+
+class TestFloodLayers(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        # Don't send analysis tasks of created floods
+        patcher = patch('realtime.signals.flood.dispatch_event_task')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.kelurahan = BoundaryAlias.objects.create(
+            alias=OSM_LEVEL_7_NAME, osm_level=7)
+        self.rw = BoundaryAlias.objects.create(
+            alias=OSM_LEVEL_8_NAME, osm_level=8, parent=self.kelurahan)
+
+    def write_layer(self, filename, features):
+        """Write a GeoJSON layer of polygons.
+
+        :param features: List of properties and polygon coordinates
+        :type features: list
+
+        :return: Path of the layer
+        :rtype: str
+        """
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w') as f:
+            json.dump({
+                'type': 'FeatureCollection',
+                'features': [
+                    {
+                        'type': 'Feature',
+                        'properties': properties,
+                        'geometry': {
+                            'type': 'Polygon',
+                            'coordinates': coordinates
+                        }
+                    } for properties, coordinates in features]
+            }, f)
+        return path
+
+    def ingest_hazard(self, flood, filename, features):
+        """Process a hazard layer of a flood."""
+        flood.hazard_path = self.write_layer(filename, features)
+        self.assertTrue(process_hazard_layer(flood))
+
+    def ingest_impact(self, event_id, features):
+        """Process the impact layer of a new flood.
+
+        :return: The flood, with its total affected population
+        :rtype: Flood
+        """
+        flood = FloodFactory.create(event_id=event_id)
+        directory = os.path.join(self.directory, event_id)
+        os.makedirs(directory)
+        self.write_layer(
+            os.path.join(event_id, 'impact_analysis.geojson'), features)
+        flood.impact_file_path = os.path.join(directory, 'impact.zip')
+        self.assertTrue(process_impact_layer(flood))
+        return Flood.objects.get(id=flood.id)
+
+    def impacts(self, flood):
+        """Impacts of a flood with their hazard class and population."""
+        return ImpactEventBoundary.objects.filter(flood=flood).order_by(
+            'population_affected')
+
+    def rw_boundaries(self):
+        """RW boundaries keyed by upstream id."""
+        return dict(
+            (b.upstream_id, b)
+            for b in Boundary.objects.filter(boundary_alias=self.rw))
+
+    def flooded_rw(self, flood):
+        """Hazard level of flooded RW keyed by upstream id."""
+        return dict(FloodEventBoundary.objects.filter(flood=flood).values_list(
+            'boundary__upstream_id', 'hazard_data'))
+
+    def test_hazard_layer_reingestion(self):
+        """Test boundaries are upserted when a hazard layer changes."""
+        flood = FloodFactory.create(
+            event_id='2017022101-6-rw', source='hazard_file')
+
+        self.ingest_hazard(flood, 'hazard_1.geojson', [
+            hazard_feature('1', 'RW 01', 'Kel A', 2, square(106.0, -6.0)),
+            hazard_feature('2', 'RW 02', 'Kel A', 0, square(106.1, -6.0)),
+            hazard_feature('3', 'RW 03', 'Kel B', 1, square(106.2, -6.0)),
+        ])
+
+        rw_boundaries = self.rw_boundaries()
+        self.assertEqual(['1', '2', '3'], sorted(rw_boundaries))
+        kelurahan_names = sorted(Boundary.objects.filter(
+            boundary_alias=self.kelurahan).values_list('name', flat=True))
+        self.assertEqual(['Kel A', 'Kel B'], kelurahan_names)
+        self.assertEqual('Kel A', rw_boundaries['1'].parent.name)
+        self.assertEqual('Kel A', rw_boundaries['2'].parent.name)
+        self.assertEqual('Kel B', rw_boundaries['3'].parent.name)
+        self.assertEqual({'1': 2, '3': 1}, self.flooded_rw(flood))
+        ids = dict((key, b.id) for key, b in rw_boundaries.items())
+
+        # RW 01 is unchanged, RW 02 is reshaped, RW 03 is renamed and moved
+        # to another kelurahan, RW 04 is new. Parent names are case
+        # insensitive.
+        self.ingest_hazard(flood, 'hazard_2.geojson', [
+            hazard_feature('1', 'RW 01', 'KEL A', 3, square(106.0, -6.0)),
+            hazard_feature(
+                '2', 'RW 02', 'Kel A', 1, square(106.1, -6.0, size=0.002)),
+            hazard_feature('3', 'RW 03A', 'Kel A', 0, square(106.2, -6.0)),
+            hazard_feature('4', 'RW 04', 'Kel C', 2, square(106.3, -6.0)),
+        ])
+
+        rw_boundaries = self.rw_boundaries()
+        self.assertEqual(['1', '2', '3', '4'], sorted(rw_boundaries))
+        for key in ('1', '2', '3'):
+            self.assertEqual(ids[key], rw_boundaries[key].id)
+        self.assertEqual(
+            3, Boundary.objects.filter(boundary_alias=self.kelurahan).count())
+
+        self.assertAlmostEqual(
+            0.002 ** 2, rw_boundaries['2'].geometry.area, places=9)
+        self.assertEqual('RW 03A', rw_boundaries['3'].name)
+        self.assertEqual('Kel A', rw_boundaries['3'].parent.name)
+        self.assertEqual('Kel C', rw_boundaries['4'].parent.name)
+        self.assertEqual({'1': 3, '2': 1, '4': 2}, self.flooded_rw(flood))
+
+    def assertFloodFrequencyCounted(self):
+        """Compare the flood frequency table with a count from scratch."""
+        expected = FloodEventBoundary.objects.filter(
+            hazard_data__isnull=False).values_list(
+            'boundary_id', 'hazard_data').annotate(count=Count('id'))
+        counted = BoundaryFloodFrequency.objects.filter(
+            flood_count__gt=0).values_list(
+            'boundary_id', 'hazard_data', 'flood_count')
+        self.assertEqual(sorted(expected), sorted(counted))
+
+    def test_flood_frequency_reingestion(self):
+        """Test flood frequency is maintained when floods change."""
+        first_flood = FloodFactory.create(
+            event_id='2017022101-6-rw', source='hazard_file')
+        second_flood = FloodFactory.create(
+            event_id='2017022102-6-rw', source='hazard_file')
+
+        self.ingest_hazard(first_flood, 'first_1.geojson', [
+            hazard_feature('1', 'RW 01', 'Kel A', 2, square(106.0, -6.0)),
+            hazard_feature('2', 'RW 02', 'Kel A', 1, square(106.1, -6.0)),
+        ])
+        self.ingest_hazard(second_flood, 'second.geojson', [
+            hazard_feature('1', 'RW 01', 'Kel A', 2, square(106.0, -6.0)),
+            hazard_feature('3', 'RW 03', 'Kel A', 3, square(106.2, -6.0)),
+        ])
+        self.assertFloodFrequencyCounted()
+        rw_boundaries = self.rw_boundaries()
+        self.assertEqual(2, BoundaryFloodFrequency.objects.get(
+            boundary=rw_boundaries['1'], hazard_data=2).flood_count)
+
+        # RW 01 is not flooded anymore, RW 02 changes level, RW 03 is added
+        self.ingest_hazard(first_flood, 'first_2.geojson', [
+            hazard_feature('1', 'RW 01', 'Kel A', 0, square(106.0, -6.0)),
+            hazard_feature('2', 'RW 02', 'Kel A', 3, square(106.1, -6.0)),
+            hazard_feature('3', 'RW 03', 'Kel A', 1, square(106.2, -6.0)),
+        ])
+        self.assertFloodFrequencyCounted()
+        self.assertEqual(1, BoundaryFloodFrequency.objects.get(
+            boundary=rw_boundaries['1'], hazard_data=2).flood_count)
+        self.assertEqual(0, BoundaryFloodFrequency.objects.get(
+            boundary=rw_boundaries['2'], hazard_data=1).flood_count)
+
+        second_flood.delete()
+        self.assertFloodFrequencyCounted()
+
+    def test_flood_histogram(self):
+        """Test daily flood history of a boundary and its cache."""
+        floods = [
+            FloodFactory.create(
+                event_id=event_id, source='hazard_file',
+                time=datetime(2017, 2, day, hour, tzinfo=pytz.utc))
+            for event_id, day, hour in (
+                ('2017022101-6-rw', 21, 1),
+                ('2017022107-6-rw', 21, 7),
+                ('2017022201-6-rw', 22, 1))]
+        for flood, state in zip(floods, (2, 3, 1)):
+            self.ingest_hazard(flood, flood.event_id + '.geojson', [
+                hazard_feature(
+                    '1', 'RW 01', 'Kel A', state, square(106.0, -6.0))])
+        rw_id = self.rw_boundaries()['1'].id
+
+        start = datetime(2017, 2, 1, tzinfo=pytz.utc)
+        end = datetime(2017, 3, 1, tzinfo=pytz.utc)
+        # The highest hazard level of each day
+        self.assertEqual([
+            {'event_id': '2017022107-6-rw', 'time': '2017-02-21',
+             'hazard_class': 3},
+            {'event_id': '2017022201-6-rw', 'time': '2017-02-22',
+             'hazard_class': 1},
+        ], flood_histogram(rw_id, start, end, [1, 2, 3, 4]))
+        self.assertEqual(
+            ['2017022101-6-rw', '2017022201-6-rw'],
+            [h['event_id'] for h in flood_histogram(
+                rw_id, start, end, [1, 2])])
+        self.assertEqual(
+            [], flood_histogram(rw_id, start, floods[0].time.replace(
+                hour=0), [1, 2, 3, 4]))
+
+        url = reverse('realtime:rw_histogram', kwargs={
+            'boundary_id': rw_id,
+            'hazard_levels_string': '1,2,3,4',
+            'start_date_timestamp': '2017-02-01',
+            'end_date_timestamp': '2017-03-01'})
+        cache_settings = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }
+        }
+        with override_settings(CACHES=cache_settings):
+            response = self.client.get(url)
+            self.assertEqual(
+                ['2017022107-6-rw', '2017022201-6-rw'],
+                [h['event_id'] for h in json.loads(
+                    response.content.decode('utf-8'))])
+
+            # Cached history of the boundary is invalidated when one of
+            # its floods changes
+            self.ingest_hazard(floods[1], 'dry.geojson', [
+                hazard_feature('1', 'RW 01', 'Kel A', 0, square(106.0, -6.0))])
+            response = self.client.get(url)
+            self.assertEqual(
+                ['2017022101-6-rw', '2017022201-6-rw'],
+                [h['event_id'] for h in json.loads(
+                    response.content.decode('utf-8'))])
+
+    def test_impact_layer_hazard_class_fields(self):
+        """Test impact layer with hazard_class, exposure_name, population.
+        """
+        kelurahan = Boundary.objects.create(
+            upstream_id='1', name='Kel A', boundary_alias=self.kelurahan,
+            geometry=MultiPolygon(
+                Polygon(square(106.0, -6.0)[0]), srid=4326))
+
+        flood = self.ingest_impact('2017022101-6-rw', [
+            ({'hazard_class': 'high', 'exposure_name': ' kel a ',
+              'population': 10}, square(106.0, -6.0)),
+            ({'hazard_class': 'medium', 'exposure_name': 'Kel New',
+              'population': 5}, square(106.1, -6.0)),
+        ])
+
+        impacts = list(self.impacts(flood))
+        self.assertEqual(
+            [('medium', 5), ('high', 10)],
+            [(i.hazard_class, i.population_affected) for i in impacts])
+        # Existing kelurahan is found by its name, a missing one is created
+        self.assertEqual(kelurahan.id, impacts[1].parent_boundary_id)
+        self.assertEqual('Kel New', impacts[0].parent_boundary.name)
+        self.assertEqual(
+            self.kelurahan.id, impacts[0].parent_boundary.boundary_alias_id)
+        self.assertEqual(15, flood.total_affected)
+
+    def test_impact_layer_affected_fields(self):
+        """Test impact layer with affected, NAMA_KELUR and Pop_Total."""
+        flood = self.ingest_impact('2017022102-6-rw', [
+            ({'affected': True, 'NAMA_KELUR': 'Kel A', 'Pop_Total': 7},
+             square(106.0, -6.0)),
+            ({'affected': False, 'NAMA_KELUR': 'Kel A', 'Pop_Total': 100},
+             square(106.1, -6.0)),
+        ])
+
+        # Features not affected are skipped
+        impacts = list(self.impacts(flood))
+        self.assertEqual([7], [i.population_affected for i in impacts])
+        self.assertEqual('Kel A', impacts[0].parent_boundary.name)
+        self.assertEqual(7, flood.total_affected)
+
+    def test_impact_layer_safe_ag_fields(self):
+        """Test impact layer with safe_ag, NAMA_KELUR and Pop_Total."""
+        flood = self.ingest_impact('2017022103-6-rw', [
+            ({'safe_ag': 'wet', 'NAMA_KELUR': 'Kel A', 'Pop_Total': 3},
+             square(106.0, -6.0)),
+            ({'safe_ag': 'dry', 'NAMA_KELUR': 'Kel A', 'Pop_Total': 4},
+             square(106.1, -6.0)),
+        ])
+
+        impacts = list(self.impacts(flood))
+        self.assertEqual(
+            [('wet', 3), ('dry', 4)],
+            [(i.hazard_class, i.population_affected) for i in impacts])
+        # Both features share the kelurahan created by the first one
+        self.assertEqual(
+            1, Boundary.objects.filter(boundary_alias=self.kelurahan).count())
+        self.assertEqual(
+            impacts[0].parent_boundary_id, impacts[1].parent_boundary_id)
+        self.assertEqual(7, flood.total_affected)
@@ -0,0 +1,41 @@
+# coding=utf-8
+"""Tests of the realtime indicator helpers."""
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from mock import patch
+
+from realtime.helpers.base_indicator import average_shake_interval
+from realtime.tests.model_factories import EarthquakeFactory
+
+
+class TestAverageShakeInterval(TestCase):
+
+    def setUp(self):
+        patcher = patch('realtime.signals.earthquake.dispatch_event_task')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def create_earthquake(self, time):
+        EarthquakeFactory.create(
+            shake_id=time.strftime('%Y%m%d%H%M%S'), time=time)
+
+    def test_average_shake_interval(self):
+        """Test mean and deviation of intervals between earthquakes."""
+        # Outside of the 30 days span
+        self.create_earthquake(self.now - timedelta(days=40))
+        self.assertEqual(
+            (timedelta(0), timedelta(0)), average_shake_interval())
+
+        self.create_earthquake(self.now - timedelta(hours=10))
+        self.assertEqual(
+            (timedelta(0), timedelta(0)), average_shake_interval())
+
+        # Intervals of 3 and 6 hours
+        self.create_earthquake(self.now - timedelta(hours=1))
+        self.create_earthquake(self.now - timedelta(hours=7))
+        mean, deviation = average_shake_interval()
+        self.assertEqual(timedelta(hours=4, minutes=30), mean)
+        self.assertEqual(timedelta(hours=1, minutes=30), deviation)
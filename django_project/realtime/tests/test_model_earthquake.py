@@ -1,8 +1,22 @@
 # coding=utf-8
 """Module related to test for all the models in realtime apps."""
-from django.test import TestCase
+import datetime
+import io
+import math
+import os
+import shutil
+import tempfile
 
+from django.contrib.gis.geos import LineString, Point
+from django.test import TestCase, override_settings
+
+from realtime.app_settings import ANALYSIS_LANGUAGES, SIMPLIFIED_ZOOM_LEVELS
+from realtime.helpers.simplification import (
+    simplified_zoom_level,
+    store_simplified_contours)
+from realtime.models.earthquake import Earthquake, EarthquakeMMIContour
 from realtime.tests.model_factories import EarthquakeFactory
+from realtime.utils import gzip_decompress
 
 
 class TestEarthquake(TestCase):
@@ -44,3 +58,139 @@ class TestEarthquake(TestCase):
         earthquake.delete()
         message = 'The earthquake instance is not deleted.'
         self.assertIsNone(earthquake.id, message)
+
+    def test_event_status(self):
+        """Method to test loading and updating impact and report status."""
+        earthquake = EarthquakeFactory.create()
+        earthquake = Earthquake.objects.get(id=earthquake.id)
+        for lang in ANALYSIS_LANGUAGES:
+            earthquake.inspected_language = lang
+            self.assertTrue(earthquake.need_run_analysis)
+            self.assertFalse(earthquake.has_reports)
+
+        # Reading status doesn't create impacts and reports
+        self.assertFalse(earthquake.impacts.exists())
+        self.assertFalse(earthquake.reports.exists())
+
+        earthquake.inspected_language = ANALYSIS_LANGUAGES[0]
+        earthquake.update_impact(
+            analysis_task_id='analysis-task',
+            analysis_task_status='PENDING')
+        earthquake.update_impact(analysis_task_status='SUCCESS')
+        earthquake.update_report(
+            report_task_id='report-task',
+            report_task_status='SUCCESS')
+        self.assertEqual(1, earthquake.impacts.count())
+        self.assertEqual(1, earthquake.reports.count())
+
+        queryset = Earthquake.objects.filter(
+            id=earthquake.id).prefetch_related('impacts', 'reports')
+        # Events, impacts and reports
+        with self.assertNumQueries(3):
+            for event in queryset:
+                for lang in ANALYSIS_LANGUAGES:
+                    event.inspected_language = lang
+                    first_language = lang == ANALYSIS_LANGUAGES[0]
+                    self.assertEqual(
+                        not first_language, event.need_run_analysis)
+                    self.assertEqual(
+                        not first_language, event.need_generate_reports)
+
+    def test_link_shakemaps(self):
+        """Method to test matching corrected and initial shakemaps."""
+        initial = EarthquakeFactory.create(
+            shake_id='20180220162928', magnitude=5.0)
+        corrected = EarthquakeFactory.create(
+            shake_id='20180220162928_50_01400_124450_20180220162928',
+            source_type=Earthquake.CORRECTED_SOURCE_TYPE,
+            time=initial.time + datetime.timedelta(minutes=5),
+            location=Point(106.79, -6.6),
+            magnitude=5.2)
+        # Too far from the initial shakemap
+        EarthquakeFactory.create(
+            shake_id='20180220162928_50_01400_124450_20180220163428',
+            source_type=Earthquake.CORRECTED_SOURCE_TYPE,
+            time=initial.time + datetime.timedelta(minutes=5),
+            location=Point(110, -7),
+            magnitude=5.0)
+
+        corrected.link_shakemaps()
+        initial.refresh_from_db()
+        corrected.refresh_from_db()
+        self.assertEqual(initial, corrected.initial_shakemaps)
+        self.assertEqual(corrected, initial.corrected_shakemaps)
+
+        initial.mark_shakemaps_has_corrected()
+        initial.refresh_from_db()
+        self.assertTrue(initial.has_corrected)
+
+    def test_shake_grid_xml_blob(self):
+        """Method to test compressed storage of shake grid."""
+        earthquake = EarthquakeFactory.create(shake_grid_xml=u'<legacy/>')
+        self.assertEqual(u'<legacy/>', earthquake.read_shake_grid_xml())
+        self.assertEqual(
+            b'<legacy/>', gzip_decompress(earthquake.shake_grid_xml_blob()))
+
+        earthquake.store_blob(Earthquake.SHAKE_GRID_XML_BLOB, u'<grid/>')
+        self.assertTrue(earthquake.has_blob(Earthquake.SHAKE_GRID_XML_BLOB))
+        self.assertEqual(u'<grid/>', earthquake.read_shake_grid_xml())
+
+        earthquake.delete_blob(Earthquake.SHAKE_GRID_XML_BLOB)
+        self.assertFalse(earthquake.has_blob(Earthquake.SHAKE_GRID_XML_BLOB))
+
+    def test_shake_grid_raster(self):
+        """Method to test memory mapped raster of shake grid."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with io.open(
+                u'realtime/tests/data/earthquake/grid.xml', 'rb') as f:
+            shake_grid_xml = f.read()
+
+        with override_settings(MEDIA_ROOT=media_root):
+            earthquake = EarthquakeFactory.create()
+            self.assertIsNone(earthquake.shake_grid_raster())
+
+            earthquake.store_blob(
+                Earthquake.SHAKE_GRID_XML_BLOB, shake_grid_xml)
+            # Built on first use
+            grid = earthquake.shake_grid_raster()
+            self.assertTrue(os.path.exists(earthquake.shake_grid_raster_path))
+            self.assertEqual((161, 161), (grid.nlat, grid.nlon))
+
+            mmi = grid.values_at([93.71, 93.72, 0], [-1.754, -1.76, 0])
+            self.assertAlmostEqual(1.39, mmi[0], places=5)
+            self.assertAlmostEqual(1.39, mmi[1], places=5)
+            self.assertTrue(math.isnan(mmi[2]))
+            self.assertAlmostEqual(
+                0.01, grid.values_at([93.71], [-1.754], 'PGA')[0], places=5)
+
+            summary = grid.summary()
+            self.assertEqual(['mmi', 'pga', 'pgv'], sorted(summary))
+            self.assertLessEqual(summary['mmi']['min'], 1.39)
+
+            path = earthquake.shake_grid_raster_path
+            earthquake.delete()
+            self.assertFalse(os.path.exists(path))
+
+    def test_simplified_contours(self):
+        """Method to test precomputed simplified contours."""
+        earthquake = EarthquakeFactory.create()
+        contour = EarthquakeMMIContour.objects.create(
+            earthquake=earthquake,
+            geometry=LineString(
+                (106.0, -6.0, 0), (106.5, -6.0001, 0), (107.0, -6.0, 0),
+                srid=4326),
+            mmi=5,
+            properties='{}')
+        store_simplified_contours(earthquake)
+
+        zoom_levels = sorted(SIMPLIFIED_ZOOM_LEVELS)
+        self.assertEqual(
+            sorted(contour.simplified_geometries.values_list(
+                'zoom', flat=True)),
+            zoom_levels)
+        self.assertEqual(simplified_zoom_level(0), zoom_levels[0])
+        self.assertEqual(
+            simplified_zoom_level(str(zoom_levels[-1])), zoom_levels[-1])
+        self.assertIsNone(simplified_zoom_level(zoom_levels[-1] + 1))
+        self.assertIsNone(simplified_zoom_level(None))
@@ -1,14 +1,42 @@
 # coding=utf-8
+import json
 import os
 
+from django.contrib.gis.geos import MultiPolygon, Polygon
+from django.core.urlresolvers import reverse
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
+from realtime.app_settings import SIMPLIFIED_ZOOM_LEVELS
+from realtime.helpers.compression import GZIP_ENCODING
+from realtime.helpers.flood_features import (
+    build_hazard_feature_collection,
+    build_impact_feature_collection,
+    update_flood_event_features)
+from realtime.helpers.task_arguments import (
+    fetch_task_instance,
+    task_reference)
+from realtime.models.flood import (
+    Boundary,
+    BoundaryAlias,
+    Flood,
+    FloodEventBoundary,
+    FloodEventFeatures,
+    ImpactEventBoundary)
+from realtime.tasks.flood import HAZARD_LAYER_STAMP_FIELDS
 from realtime.tests.model_factories import FloodFactory
+from realtime.utils import gzip_decompress
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '11/25/15'
 
 
+def square(x, y):
+    """Unit square multipolygon with its south west corner at x, y."""
+    return MultiPolygon(Polygon((
+        (x, y), (x, y + 1), (x + 1, y + 1), (x + 1, y), (x, y))), srid=4326)
+
+
 class TestModelFlood(TestCase):
 
     def test_create_flood(self):
@@ -16,3 +44,106 @@ class TestModelFlood(TestCase):
         message = 'The flood object is instantiated successfully.'
         self.assertIsNotNone(flood.id, message)
         self.assertTrue(os.path.exists(flood.hazard_path))
+
+    def test_flood_task_reference(self):
+        flood = FloodFactory.create()
+        reference = task_reference(flood, HAZARD_LAYER_STAMP_FIELDS)
+        # Reference can be sent as JSON
+        reference = json.loads(json.dumps(reference))
+
+        fetched = fetch_task_instance(
+            Flood, reference, HAZARD_LAYER_STAMP_FIELDS)
+        self.assertEqual(fetched.id, flood.id)
+
+        # The message is stale once the hazard changed
+        Flood.objects.filter(id=flood.id).update(
+            hazard_path='/tmp/other_hazard.geojson')
+        self.assertIsNone(fetch_task_instance(
+            Flood, reference, HAZARD_LAYER_STAMP_FIELDS))
+
+        Flood.objects.filter(id=flood.id).delete()
+        self.assertIsNone(fetch_task_instance(Flood, flood.id))
+
+    def test_flood_event_features(self):
+        """Test feature collections of flooded and impacted boundaries."""
+        flood = FloodFactory.create()
+        village_alias = BoundaryAlias.objects.create(
+            alias='Village', osm_level=7)
+        rw_alias = BoundaryAlias.objects.create(
+            alias='RW', osm_level=8, parent=village_alias)
+        village = Boundary.objects.create(
+            upstream_id='village-1', name='Kelurahan', geometry=square(0, 0),
+            boundary_alias=village_alias)
+        flooded_rw = Boundary.objects.create(
+            upstream_id='rw-1', name='RW 01', parent=village,
+            geometry=square(0, 0), boundary_alias=rw_alias)
+        dry_rw = Boundary.objects.create(
+            upstream_id='rw-2', name='RW 02', parent=village,
+            geometry=square(1, 0), boundary_alias=rw_alias)
+        FloodEventBoundary.objects.create(
+            flood=flood, boundary=flooded_rw, hazard_data=2)
+        FloodEventBoundary.objects.create(
+            flood=flood, boundary=dry_rw, hazard_data=0)
+        impact = ImpactEventBoundary.objects.create(
+            flood=flood, parent_boundary=village, geometry=square(0, 0),
+            hazard_class='3', population_affected=10)
+        ImpactEventBoundary.objects.create(
+            flood=flood, parent_boundary=village, geometry=square(1, 0))
+
+        # Only flooded RW boundaries, identified by their upstream id
+        hazard = json.loads(build_hazard_feature_collection(flood))
+        self.assertEqual(
+            ['rw-1'], [feature['id'] for feature in hazard['features']])
+        feature = hazard['features'][0]
+        self.assertEqual('MultiPolygon', feature['geometry']['type'])
+        self.assertEqual(flood.event_id, feature['properties']['event_id'])
+        self.assertEqual('RW 01', feature['properties']['name'])
+        self.assertEqual('Kelurahan', feature['properties']['parent_name'])
+        self.assertEqual(2, feature['properties']['hazard_data'])
+
+        # Only impacts with a hazard class
+        impacts = json.loads(build_impact_feature_collection(flood))
+        self.assertEqual(
+            [impact.id], [feature['id'] for feature in impacts['features']])
+        self.assertEqual({
+            'event_id': flood.event_id,
+            'parent_boundary_name': 'Kelurahan',
+            'hazard_class': '3',
+            'people_affected': 10
+        }, impacts['features'][0]['properties'])
+
+        # Every zoom level is stored compressed
+        variants = update_flood_event_features(
+            flood, FloodEventFeatures.HAZARD_FEATURES)
+        self.assertEqual(
+            hazard,
+            json.loads(gzip_decompress(variants[GZIP_ENCODING]).decode(
+                'utf-8')))
+        self.assertEqual(
+            len(SIMPLIFIED_ZOOM_LEVELS) + 1,
+            FloodEventFeatures.objects.filter(
+                flood=flood,
+                feature_type=FloodEventFeatures.HAZARD_FEATURES).count())
+
+        # Full resolution collections are unique, although their zoom is NULL
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FloodEventFeatures.objects.create(
+                flood=flood,
+                feature_type=FloodEventFeatures.HAZARD_FEATURES,
+                zoom=None,
+                content=b'')
+
+        # Impact features are built on the first request
+        response = self.client.get(
+            reverse(
+                'realtime:flood_impact_event_features',
+                kwargs={'event_id': flood.event_id}),
+            HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('gzip', response['Content-Encoding'])
+        self.assertEqual(
+            impacts,
+            json.loads(gzip_decompress(response.content).decode('utf-8')))
+        self.assertTrue(FloodEventFeatures.objects.filter(
+            flood=flood,
+            feature_type=FloodEventFeatures.IMPACT_FEATURES).exists())
@@ -0,0 +1,187 @@
+# coding=utf-8
+"""Tests of the hazard event processing pipeline."""
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from mock import MagicMock, patch
+
+from realtime.app_settings import ANALYSIS_LANGUAGES, PIPELINE_STEP_TIMEOUT
+from realtime.helpers.pipeline import (
+    EventPipeline,
+    PipelineStep,
+    claim_pipeline_step,
+    dispatch_event_task,
+    dispatch_event_task_group,
+    release_event_task)
+from realtime.models.flood import Flood
+from realtime.models.impact import Impact
+from realtime.tests.model_factories import FloodFactory
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    }
+}
+
+
+class TestEventPipeline(TestCase):
+
+    def setUp(self):
+        # Don't send analysis tasks of created floods
+        patcher = patch('realtime.signals.flood.dispatch_event_task')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.flood = FloodFactory.create()
+        self.first_locale, self.other_locale = ANALYSIS_LANGUAGES[:2]
+
+        # Steps still needed, and steps run as (name, locale)
+        self.needed = set()
+        self.runs = []
+
+    def step(self, name, **kwargs):
+        """Stub step, needed while its name is in self.needed."""
+        return PipelineStep(
+            name,
+            is_needed=lambda event: name in self.needed,
+            run=lambda event, locale: self.runs.append((name, locale)),
+            **kwargs)
+
+    def expire_claims(self):
+        """Make every claimed step stale."""
+        stale = timezone.now() - PIPELINE_STEP_TIMEOUT - timedelta(minutes=1)
+        Impact.objects.update(pipeline_updated=stale)
+
+    def fetch_flood(self):
+        """Fetch the flood again, like a new task would."""
+        return Flood.objects.get(id=self.flood.id)
+
+    def test_advance(self):
+        """Test steps run, skipped and waited for."""
+        pipeline = EventPipeline([
+            self.step('hazard', shared=True),
+            self.step('analysis'),
+            self.step('extract', blocking=False),
+            self.step('report'),
+        ])
+        self.needed.update(['hazard', 'analysis', 'extract', 'report'])
+
+        # Only the first language runs the shared step
+        self.assertIsNone(
+            pipeline.advance(self.fetch_flood(), self.other_locale))
+        self.assertEqual(
+            'hazard', pipeline.advance(self.fetch_flood(), self.first_locale))
+        self.assertEqual([('hazard', self.first_locale)], self.runs)
+
+        # Each language runs the steps that depend on it
+        self.needed.discard('hazard')
+        self.assertEqual(
+            'analysis',
+            pipeline.advance(self.fetch_flood(), self.first_locale))
+        self.assertEqual(
+            'analysis',
+            pipeline.advance(self.fetch_flood(), self.other_locale))
+
+        # A step being run is not run again until its claim is stale
+        self.assertIsNone(
+            pipeline.advance(self.fetch_flood(), self.first_locale))
+        self.expire_claims()
+        self.assertEqual(
+            'analysis',
+            pipeline.advance(self.fetch_flood(), self.first_locale))
+
+        # Non blocking step continues to the next step
+        self.needed.discard('analysis')
+        del self.runs[:]
+        self.assertEqual(
+            'report', pipeline.advance(self.fetch_flood(), self.first_locale))
+        self.assertEqual(
+            [('extract', self.first_locale), ('report', self.first_locale)],
+            self.runs)
+
+        # Nothing left to do
+        self.needed.clear()
+        del self.runs[:]
+        self.assertIsNone(
+            pipeline.advance(self.fetch_flood(), self.first_locale))
+        self.assertEqual([], self.runs)
+
+    def test_claim_pipeline_step(self):
+        """Test fresh claims block the step, stale claims don't."""
+        self.flood.inspected_language = self.first_locale
+        impact = self.flood.impact_object
+        self.assertTrue(claim_pipeline_step(impact, 'analysis'))
+        self.assertIsNotNone(impact.pk)
+        self.assertEqual('analysis', impact.pipeline_state)
+
+        # Another instance of the same impact, e.g. from another task
+        other = Impact.objects.get(pk=impact.pk)
+        self.assertFalse(claim_pipeline_step(other, 'analysis'))
+        self.assertTrue(claim_pipeline_step(other, 'report'))
+        self.assertFalse(claim_pipeline_step(impact, 'report'))
+
+        self.expire_claims()
+        self.assertTrue(claim_pipeline_step(impact, 'report'))
+        self.assertEqual(
+            'report', Impact.objects.get(pk=impact.pk).pipeline_state)
+
+    def test_claim_new_impact(self):
+        """Test tasks creating the same impact get one claim."""
+        impacts = []
+        for _ in range(2):
+            flood = self.fetch_flood()
+            flood.inspected_language = self.first_locale
+            impacts.append(flood.impact_object)
+
+        self.assertTrue(claim_pipeline_step(impacts[0], 'analysis'))
+        self.assertFalse(claim_pipeline_step(impacts[1], 'analysis'))
+        self.assertEqual(impacts[0].pk, impacts[1].pk)
+        self.assertEqual(
+            1, self.flood.impacts.filter(language=self.first_locale).count())
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_dispatch_event_task(self):
+        """Test a task is queued once per event and arguments."""
+        task = MagicMock()
+        task.name = 'realtime.tasks.test'
+
+        self.assertTrue(
+            dispatch_event_task(task, self.flood, locale=self.first_locale))
+        self.assertFalse(
+            dispatch_event_task(task, self.flood, locale=self.first_locale))
+        self.assertTrue(
+            dispatch_event_task(task, self.flood, locale=self.other_locale))
+        self.assertEqual(2, task.delay.call_count)
+
+        # Released when the task starts
+        release_event_task(task, self.flood, locale=self.first_locale)
+        self.assertTrue(
+            dispatch_event_task(task, self.flood, locale=self.first_locale))
+        self.assertEqual(3, task.delay.call_count)
+        reference = task.delay.call_args[0][0]
+        self.assertEqual(self.flood.pk, reference['pk'])
+        self.assertEqual(
+            {'locale': self.first_locale}, task.delay.call_args[1])
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_dispatch_event_task_group(self):
+        """Test tasks of many events are grouped with staggered starts."""
+        task = MagicMock()
+        task.name = 'realtime.tasks.test'
+        other_flood = FloodFactory.create(event_id='2015112519-6-rw')
+
+        # Already queued
+        dispatch_event_task(task, other_flood, locale=self.other_locale)
+
+        with patch('realtime.helpers.pipeline.group') as group:
+            count = dispatch_event_task_group(
+                task, [self.flood, other_flood], ANALYSIS_LANGUAGES[:2],
+                concurrency=2, interval=60)
+
+        self.assertEqual(3, count)
+        self.assertEqual(3, task.s.call_count)
+        countdowns = [
+            c[1]['countdown'] for c in task.s.return_value.set.call_args_list]
+        self.assertEqual([0, 0, 60], countdowns)
+        group.return_value.apply_async.assert_called_once_with()
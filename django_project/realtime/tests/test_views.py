@@ -1,15 +1,30 @@
 # coding=utf-8
+import json
+import os
+import tempfile
 
 from django import test
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 from django.contrib.gis.geos import Point
 from django.core.urlresolvers import reverse
+from django.http.response import Http404
 from requests import status_codes
 
 from realtime.app_settings import FLATPAGE_SYSTEM_SLUG_IDS, \
-    LANDING_PAGE_SYSTEM_CATEGORY
+    LANDING_PAGE_SYSTEM_CATEGORY, ABOUT_PAGE_SYSTEM_CATEGORY
+from realtime.context_processors import retrieve_flat_pages
+from realtime.helpers.indicator_snapshot import (
+    INDICATOR_CLASSES,
+    latest_indicators,
+    take_indicator_snapshots)
+from realtime.models.indicator import IndicatorSnapshot
 from realtime.models.coreflatpage import CoreFlatPage
+from realtime.helpers.compression import (
+    compress_variants,
+    negotiate_encoding)
+from realtime.serializers.utilities import URLTemplate
+from realtime.views.utilities import serve_file, precompressed_response
 
 
 class TestViews(test.TestCase):
@@ -68,3 +83,205 @@ class TestViews(test.TestCase):
         landing_pages = CoreFlatPage.objects.filter(
             system_category=LANDING_PAGE_SYSTEM_CATEGORY)
         self.assertEqual(landing_pages.count(), len(FLATPAGE_SYSTEM_SLUG_IDS))
+
+    def test_flat_page_navigation(self):
+        """Test navigation menus are updated when flat pages change."""
+        page = CoreFlatPage.objects.create(
+            url='/about/team/',
+            title='Team',
+            group='About',
+            system_category=ABOUT_PAGE_SYSTEM_CATEGORY,
+            language='en')
+
+        menu = retrieve_flat_pages(ABOUT_PAGE_SYSTEM_CATEGORY, 'en')
+        self.assertEqual(len(menu['groups']), 1)
+        self.assertEqual(menu['groups'][0]['title'], 'About')
+        self.assertEqual(
+            menu['groups'][0]['pages'],
+            [{'id': page.id, 'title': 'Team', 'url': '/about/team/'}])
+        self.assertEqual(
+            retrieve_flat_pages(ABOUT_PAGE_SYSTEM_CATEGORY, 'id'),
+            {'groups': []})
+
+        # Cached menu is invalidated
+        CoreFlatPage.objects.create(
+            url='/about/contact/',
+            title='Contact',
+            group='about',
+            system_category=ABOUT_PAGE_SYSTEM_CATEGORY,
+            language='en',
+            order=1)
+        menu = retrieve_flat_pages(ABOUT_PAGE_SYSTEM_CATEGORY, 'en')
+        self.assertEqual(len(menu['groups']), 1)
+        self.assertEqual(
+            [p['title'] for p in menu['groups'][0]['pages']],
+            ['Team', 'Contact'])
+
+        page.delete()
+        menu = retrieve_flat_pages(ABOUT_PAGE_SYSTEM_CATEGORY, 'en')
+        self.assertEqual(
+            [p['title'] for p in menu['groups'][0]['pages']], ['Contact'])
+
+    def test_indicator_history(self):
+        """Test indicators are read from snapshots."""
+        indicators = take_indicator_snapshots()
+        self.assertEqual(
+            IndicatorSnapshot.objects.count(), len(indicators))
+
+        latest = latest_indicators()
+        self.assertEqual(
+            [type(ind) for ind in latest], list(INDICATOR_CLASSES))
+        for ind in latest:
+            computed = [i for i in indicators if i.name == ind.name][0]
+            self.assertEqual(ind.value, computed.value)
+            self.assertEqual(ind.status, computed.status)
+
+        response = self.client.get(reverse('realtime:indicator'))
+        self.assertEqual(response.status_code, status_codes.codes.ok)
+
+        response = self.client.get(
+            reverse('realtime:indicator_history'),
+            {'indicator': 'shake_event'})
+        self.assertEqual(response.status_code, status_codes.codes.ok)
+        snapshots = json.loads(response.content.decode('utf-8'))['snapshots']
+        self.assertEqual(len(snapshots), 1)
+        self.assertEqual(snapshots[0]['indicator'], 'shake_event')
+
+        # Longer than the retention period
+        response = self.client.get(
+            reverse('realtime:indicator_history'),
+            {'indicator': 'shake_event', 'since_last_hours': '1e300'})
+        self.assertEqual(response.status_code, status_codes.codes.ok)
+        snapshots = json.loads(response.content.decode('utf-8'))['snapshots']
+        self.assertEqual(len(snapshots), 1)
+
+        for since_last_hours in ('nan', 'inf', '-1', '0', 'day'):
+            response = self.client.get(
+                reverse('realtime:indicator_history'),
+                {'since_last_hours': since_last_hours})
+            self.assertEqual(
+                response.status_code, status_codes.codes.bad_request)
+
+
+class TestServeFile(test.SimpleTestCase):
+
+    def setUp(self):
+        self.factory = test.RequestFactory()
+        handle, self.path = tempfile.mkstemp(suffix='.pdf')
+        os.write(handle, b'0123456789')
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_serve_whole_file(self):
+        """Test file is streamed with validators."""
+        request = self.factory.get('/')
+        response = serve_file(request, self.path, filename='report.pdf')
+        self.assertEqual(response.status_code, status_codes.codes.ok)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('report.pdf', response['Content-Disposition'])
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+
+    def test_conditional_get(self):
+        """Test unchanged file returns 304."""
+        response = serve_file(self.factory.get('/'), self.path)
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH=response['ETag'])
+        response = serve_file(request, self.path)
+        self.assertEqual(response.status_code, 304)
+
+        etag = response['ETag']
+        request = self.factory.get(
+            '/', HTTP_IF_NONE_MATCH='"other", {0}'.format(etag))
+        response = serve_file(request, self.path)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        request = self.factory.get('/', HTTP_IF_NONE_MATCH='"other"')
+        response = serve_file(request, self.path)
+        self.assertEqual(response.status_code, status_codes.codes.ok)
+
+    def test_range_request(self):
+        """Test partial content of a single byte range."""
+        request = self.factory.get('/', HTTP_RANGE='bytes=2-4')
+        response = serve_file(request, self.path)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        request = self.factory.get('/', HTTP_RANGE='bytes=-3')
+        response = serve_file(request, self.path)
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        request = self.factory.get('/', HTTP_RANGE='bytes=20-')
+        response = serve_file(request, self.path)
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_file(self):
+        """Test missing file raises 404."""
+        with self.assertRaises(Http404):
+            serve_file(self.factory.get('/'), self.path + '.missing')
+
+
+class TestPrecompressedResponse(test.SimpleTestCase):
+
+    def setUp(self):
+        self.factory = test.RequestFactory()
+        self.variants = compress_variants(b'{"type": "FeatureCollection"}')
+
+    def test_negotiate_encoding(self):
+        """Test the accepted variant with the highest quality is chosen."""
+        self.assertEqual(
+            negotiate_encoding('gzip, deflate, br', ['gzip', 'br']), 'br')
+        self.assertEqual(
+            negotiate_encoding('gzip;q=1.0, br;q=0.5', ['gzip', 'br']),
+            'gzip')
+        self.assertEqual(negotiate_encoding('br', ['gzip']), None)
+        self.assertEqual(negotiate_encoding('*;q=0', ['gzip']), None)
+        self.assertEqual(negotiate_encoding('*', ['gzip']), 'gzip')
+        self.assertEqual(negotiate_encoding('', ['gzip']), None)
+
+    def test_precompressed_response(self):
+        """Test precompressed variants are sent without recompressing."""
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        response = precompressed_response(
+            request, self.variants, 'application/json')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response.content, self.variants['gzip'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        request = self.factory.get('/')
+        response = precompressed_response(
+            request, self.variants, 'application/json')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(
+            b''.join(response.streaming_content),
+            b'{"type": "FeatureCollection"}')
+
+
+class TestURLTemplate(test.SimpleTestCase):
+
+    def test_url_template(self):
+        """Test urls from templates are the same as reversed urls."""
+        kwargs = {
+            'shake_id': '20150619200628',
+            'source_type': 'initial'
+        }
+        template = URLTemplate(
+            'realtime:earthquake_detail', ('shake_id', 'source_type'))
+        self.assertIsNotNone(template.template)
+        self.assertEqual(
+            template.format(**kwargs),
+            reverse('realtime:earthquake_detail', kwargs=kwargs))
+
+        request = test.RequestFactory().get('/')
+        template = URLTemplate(
+            'realtime:flood_detail', ('event_id', ), request=request)
+        self.assertEqual(
+            template.format(event_id='2015112518-3-rw'),
+            request.build_absolute_uri(reverse(
+                'realtime:flood_detail',
+                kwargs={'event_id': '2015112518-3-rw'})))
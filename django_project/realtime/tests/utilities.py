@@ -167,3 +167,17 @@ def assertEqualDictionaryWithFiles(testcase, dict_value, dict_control):
                             ))
                         LOGGER.warning(warning_message)
                     testcase.assertTrue(file_equals, message)
+
+
+def response_content(response):
+    """Return the whole body of a response, streamed or not.
+
+    :param response: Response returned by the test client
+    :type response: django.http.response.HttpResponseBase
+
+    :return: The body of the response
+    :rtype: bytes
+    """
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
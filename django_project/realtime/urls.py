@@ -10,10 +10,12 @@ from realtime.views.ash import (
 from realtime.views.earthquake import (
     index as shake_index,
     EarthquakeList,
+    EarthquakeBulkList,
     EarthquakeDetail,
     EarthquakeReportList,
     EarthquakeReportDetail,
     EarthquakeFeatureList, iframe_index, get_grid_xml, get_analysis_zip,
+    get_grid_values,
     EarthquakeMMIContourList, get_corrected_shakemaps_for_shake_id,
     get_corrected_shakemaps_report_for_shake_id)
 from realtime.views.flatpage import edit
@@ -39,6 +41,9 @@ urlpatterns = [
     url(r'^api/v1/earthquake/$',
         EarthquakeList.as_view(),
         name='earthquake_list'),
+    url(r'^api/v1/earthquake-bulk/$',
+        EarthquakeBulkList.as_view(),
+        name='earthquake_bulk_list'),
     url(r'^api/v1/earthquake-feature/$',
         EarthquakeFeatureList.as_view(),
         name='earthquake_feature_list'),
@@ -164,6 +169,10 @@ urlpatterns += [
         r'(?P<source_type>\w*)/$',
         get_grid_xml,
         name='shake_grid'),
+    url(r'^shake/grid/(?P<shake_id>[-_\d]+)/'
+        r'(?P<source_type>\w*)/values/$',
+        get_grid_values,
+        name='shake_grid_values'),
     url(r'^shake/analysis/(?P<shake_id>[-_\d]+)/'
         r'(?P<source_type>\w*)/$',
         get_analysis_zip,
@@ -215,6 +224,9 @@ urlpatterns += [
     url(r'^api/v1/indicator/notify_shakemap_push/$',
         user_push.notify_shakemap_push),
     url(r'^indicator$', user_push.indicator, name='indicator'),
+    url(r'^api/v1/indicator/history/$',
+        user_push.indicator_history,
+        name='indicator_history'),
     url(r'^indicator/rest_users$',
         user_push.realtime_rest_users,
         name='rest_users'),
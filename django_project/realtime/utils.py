@@ -1,6 +1,7 @@
 # coding=utf-8
 import logging
 import os
+import zlib
 from zipfile import ZipFile
 
 from realtime.app_settings import LOGGER_NAME, REPORT_TEMPLATES
@@ -98,9 +99,13 @@ def substitute_layer_order(layer_order_template, source_dict):
     return layer_order
 
 
-def celery_worker_connected(celery_app, worker_name):
-    """Check worker exists."""
-    pongs = celery_app.control.ping()
+def celery_worker_connected(celery_app, worker_name, timeout=1.0):
+    """Check worker exists.
+
+    :param timeout: Seconds to wait for workers replies
+    :type timeout: float
+    """
+    pongs = celery_app.control.ping(timeout=timeout)
     for pong in pongs:
         for key in pong:
             if worker_name in key:
@@ -120,3 +125,58 @@ def template_names(hazard_type, locale='en'):
     basename = os.path.basename(template_filename)
     output_name, _ = os.path.splitext(basename)
     return output_name
+
+
+def gzip_compress(data, level=6):
+    """Compress data into gzip format.
+
+    :param data: The data to compress
+    :type data: bytes
+
+    :param level: Compression level, 1 (fastest) to 9 (smallest)
+    :type level: int
+
+    :return: Gzip compressed data, can be sent as is with
+        Content-Encoding: gzip
+    :rtype: bytes
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def gzip_decompress(data):
+    """Decompress gzip formatted data.
+
+    :param data: Gzip compressed data
+    :type data: bytes
+
+    :return: The decompressed data
+    :rtype: bytes
+    """
+    return zlib.decompress(bytes(data), 16 + zlib.MAX_WBITS)
+
+
+def gzip_decompress_chunks(data, chunk_size=64 * 1024):
+    """Decompress gzip formatted data, a chunk at a time.
+
+    :param data: Gzip compressed data
+    :type data: bytes
+
+    :param chunk_size: Maximum size of each decompressed chunk
+    :type chunk_size: int
+
+    :return: Generator of decompressed chunks
+    :rtype: generator
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pending = bytes(data)
+    while pending:
+        chunk = decompressor.decompress(pending, chunk_size)
+        pending = decompressor.unconsumed_tail
+        if chunk:
+            yield chunk
+        if decompressor.unused_data or not chunk and not pending:
+            break
+    tail = decompressor.flush()
+    if tail:
+        yield tail
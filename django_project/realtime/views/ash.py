@@ -9,7 +9,7 @@ from django.contrib.auth.decorators import permission_required
 from django.core.exceptions import MultipleObjectsReturned, ValidationError
 from django.core.urlresolvers import reverse, reverse_lazy
 from django.db.utils import IntegrityError
-from django.http import HttpResponseRedirect, Http404, HttpResponse
+from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import render_to_response, redirect
 from django.template import RequestContext
 from rest_framework import mixins, status
@@ -32,6 +32,7 @@ from realtime.serializers.ash_serializer import (
     AshSerializer,
     AshReportSerializer,
     AshGeoJsonSerializer)
+from realtime.views.utilities import serve_field_file
 
 __author__ = 'lucernae'
 __project_name__ = 'inasafe-django'
@@ -348,12 +349,11 @@ def ash_report_map(request, volcano_name, event_time, language='en'):
             ash__volcano__volcano_name__iexact=volcano_name,
             ash__event_time=parse(event_time),
             language=language)
-        response = HttpResponse(
-            instance.report_map.read(),
+        return serve_field_file(
+            request,
+            instance.report_map,
+            filename=instance.report_map_filename,
             content_type='application/pdf')
-        response['Content-Disposition'] = 'inline; filename="{0}";'.format(
-            instance.report_map_filename)
-        return response
     except AshReport.DoesNotExist:
         raise Http404()
 
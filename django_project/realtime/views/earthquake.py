@@ -2,43 +2,70 @@
 import logging
 from copy import deepcopy
 
+from celery import group
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError, MultipleObjectsReturned
 from django.db.utils import IntegrityError
 from django.http import HttpResponseNotFound
 from django.http.response import (
     HttpResponseBadRequest,
-    JsonResponse,
-    HttpResponse)
+    JsonResponse)
 from django.shortcuts import render_to_response, get_object_or_404
 from django.template import RequestContext
 from django.utils.translation import ugettext as _
 from realtime.app_settings import SLUG_EQ_LANDING_PAGE, \
-    LANDING_PAGE_SYSTEM_CATEGORY
+    LANDING_PAGE_SYSTEM_CATEGORY, EARTHQUAKE_FEATURE_CACHE_NAMESPACE, \
+    EARTHQUAKE_FEATURE_CACHE_TIMEOUT, EARTHQUAKE_CONTOUR_CACHE_TIMEOUT, \
+    ANALYSIS_LANGUAGES, EARTHQUAKE_BULK_MAX_EVENTS, \
+    EARTHQUAKE_BULK_CONCURRENCY, EARTHQUAKE_BULK_INTERVAL, \
+    SHAKE_GRID_MAX_POINTS
 from rest_framework import status, mixins
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import ParseError
 from rest_framework.filters import (
     DjangoFilterBackend,
     SearchFilter,
     OrderingFilter)
 from rest_framework.generics import GenericAPIView
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
-from rest_framework.permissions import DjangoModelPermissionsOrAnonReadOnly
+from rest_framework.permissions import (
+    DjangoModelPermissions,
+    DjangoModelPermissionsOrAnonReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework_gis.filters import InBBoxFilter
 
 from realtime.filters.earthquake_filter import EarthquakeFilter
 from realtime.forms.earthquake import FilterForm
+from realtime.helpers.cache import versioned_cache_key
+from realtime.helpers.compression import compress_variants
+from realtime.helpers.earthquake_ingest import (
+    bulk_create_earthquakes,
+    stored_shakemaps)
+from realtime.helpers.pipeline import dispatch_event_task_group
 from realtime.helpers.rest_push_indicator import track_rest_push
+from realtime.helpers.shake_grid import RASTER_FIELDS
+from realtime.helpers.simplification import simplified_zoom_level
 from realtime.models.coreflatpage import CoreFlatPage
 from realtime.models.earthquake import Earthquake, EarthquakeReport, \
-    EarthquakeMMIContour
+    EarthquakeMMIContour, EarthquakeMMIContourGeometry
 from realtime.serializers.earthquake_serializer import (
+    EarthquakeBulkSerializer,
     EarthquakeSerializer,
     EarthquakeReportSerializer,
     EarthquakeGeoJsonSerializer, EarthquakeMMIContourGeoJSONSerializer)
-from realtime.tasks.earthquake import push_shake_to_inaware
+from realtime.tasks.earthquake import (
+    generate_event_report,
+    push_shake_to_inaware)
 from realtime.tasks.realtime.earthquake import process_shake
+from realtime.views.pagination import EarthquakeKeysetPagination
+from realtime.views.parsers import NDJSONParser, parse_ndjson
+from realtime.views.utilities import (
+    serve_file,
+    serve_field_file,
+    gzip_content_response,
+    precompressed_response)
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
 __date__ = '19/06/15'
@@ -122,10 +149,22 @@ class EarthquakeList(mixins.ListModelMixin, mixins.CreateModelMixin,
     * location_description
     * in_bbox filled with BBox String in the format SWLon,SWLat,NELon,NELat
     this is used as geographic box filter
+
+    ### Fields
+
+    * fields filled with comma separated field names, to only return these
+    fields, e.g. shake_id,time,magnitude
+
+    ### Pagination
+
+    * cursor, to page from the latest earthquake with constant time per
+    page. Use an empty cursor for the first page, then follow the next
+    links. Without cursor, pages are numbered with page.
     """
 
     queryset = Earthquake.objects.all()
     serializer_class = EarthquakeSerializer
+    pagination_class = EarthquakeKeysetPagination
     # parser_classes = [JSONParser, FormParser]
     filter_backends = (DjangoFilterBackend, SearchFilter, OrderingFilter,
                        InBBoxFilter)
@@ -137,6 +176,17 @@ class EarthquakeList(mixins.ListModelMixin, mixins.CreateModelMixin,
     ordering = ('shake_id', 'source_type')
     permission_classes = (DjangoModelPermissionsOrAnonReadOnly, )
 
+    def get_queryset(self):
+        queryset = super(EarthquakeList, self).get_queryset()
+        serializer_class = self.get_serializer_class()
+        if 'reports' not in serializer_class.Meta.fields:
+            return queryset
+        requested_fields = serializer_class.requested_fields(self.request)
+        if requested_fields is None or 'reports' in requested_fields:
+            # Reports of the whole page in one query
+            queryset = queryset.prefetch_related('reports')
+        return queryset
+
     def get(self, request, shake_id=None, source_type=None, *args, **kwargs):
         try:
             queryset = self.get_queryset()
@@ -169,6 +219,125 @@ class EarthquakeList(mixins.ListModelMixin, mixins.CreateModelMixin,
         return retval
 
 
+class EarthquakeBulkList(GenericAPIView):
+    """
+    Provides POST requests to ingest many Earthquake models at once, e.g.
+    to backfill missed shakemaps.
+
+    ### Newline delimited JSON
+
+    Send application/x-ndjson content, one shake event per line with the
+    same fields as earthquake POST. The contents of the shake grid can be
+    given in shake_grid_xml.
+
+    ### Multipart
+
+    Send the newline delimited shake events in the events part. The
+    shake_grid field of an event names the file part of its shake grid.
+
+    Events are validated all at once, nothing is stored if one of them is
+    invalid. Shakemaps already stored, or stored by a concurrent request,
+    are skipped. Processing of the new shakemaps is scheduled as one group,
+    a few of them at a time.
+    """
+    queryset = Earthquake.objects.all()
+    serializer_class = EarthquakeBulkSerializer
+    parser_classes = (NDJSONParser, MultiPartParser)
+    permission_classes = (DjangoModelPermissions, )
+
+    @staticmethod
+    def read_events(request):
+        """Read shake events of the request.
+
+        :return: The shake events, shake grid files are read in
+            shake_grid_xml
+        :rtype: list
+        """
+        if isinstance(request.data, list):
+            return request.data
+
+        if 'events' in request.FILES:
+            events = parse_ndjson(request.FILES['events'])
+        elif request.data.get('events'):
+            events = parse_ndjson(request.data['events'].splitlines())
+        else:
+            raise ParseError(_('No shake events in events part.'))
+
+        for event in events:
+            if not isinstance(event, dict) or not event.get('shake_grid'):
+                continue
+            grid_name = event.pop('shake_grid')
+            if grid_name not in request.FILES:
+                raise ParseError(
+                    _('No shake grid file named %s.') % grid_name)
+            event['shake_grid_xml'] = request.FILES[grid_name].read().decode(
+                'utf-8')
+        return events
+
+    def post(self, request, *args, **kwargs):
+        events = self.read_events(request)
+        if len(events) > EARTHQUAKE_BULK_MAX_EVENTS:
+            return Response(
+                {
+                    'detail': _('At most %d shake events per request.') % (
+                        EARTHQUAKE_BULK_MAX_EVENTS, )
+                },
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        serializer = self.get_serializer(data=events, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        keys = []
+        for event in serializer.validated_data:
+            event.setdefault('source_type', Earthquake.INITIAL_SOURCE_TYPE)
+            keys.append((event['shake_id'], event['source_type']))
+        if len(set(keys)) < len(keys):
+            return Response(
+                {'detail': _('Shake events are sent more than once.')},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        stored = stored_shakemaps(set(keys))
+        while True:
+            try:
+                earthquakes = bulk_create_earthquakes([
+                    event
+                    for event, key in zip(serializer.validated_data, keys)
+                    if key not in stored])
+                break
+            except IntegrityError:
+                # Shakemaps stored meanwhile by a concurrent request are
+                # skipped as well
+                stored_now = stored_shakemaps(set(keys))
+                if stored_now == stored:
+                    raise
+                stored = stored_now
+
+        dispatch_event_task_group(
+            generate_event_report,
+            earthquakes,
+            ANALYSIS_LANGUAGES,
+            EARTHQUAKE_BULK_CONCURRENCY,
+            EARTHQUAKE_BULK_INTERVAL)
+        track_rest_push(request)
+        if not settings.DEV_MODE and earthquakes:
+            # carefuly DO NOT push it to InaWARE when in dev_mode
+            group(
+                push_shake_to_inaware.s(e.shake_id, e.source_type)
+                for e in earthquakes).apply_async()
+
+        return Response(
+            {
+                'created': [
+                    {'shake_id': e.shake_id, 'source_type': e.source_type}
+                    for e in earthquakes],
+                'skipped': [
+                    {'shake_id': shake_id, 'source_type': source_type}
+                    for shake_id, source_type in keys
+                    if (shake_id, source_type) in stored],
+            },
+            status=status.HTTP_201_CREATED)
+
+
 class EarthquakeDetail(mixins.RetrieveModelMixin, mixins.UpdateModelMixin,
                        mixins.DestroyModelMixin, GenericAPIView):
     """
@@ -426,8 +595,34 @@ class EarthquakeFeatureList(EarthquakeList):
     pagination_class = None
 
     def get(self, request, source_type='initial', *args, **kwargs):
-        return super(EarthquakeFeatureList, self).get(
-            request, source_type=source_type, *args, **kwargs)
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return super(EarthquakeFeatureList, self).get(
+                request, source_type=source_type, *args, **kwargs)
+
+        # Compressed variants of the rendered feature collection are cached
+        # until an earthquake changes. Features have absolute urls, so the
+        # body depends on the host and scheme.
+        cache_key = versioned_cache_key(
+            EARTHQUAKE_FEATURE_CACHE_NAMESPACE,
+            request.scheme,
+            request.get_host(),
+            source_type,
+            request.accepted_media_type,
+            sorted(request.query_params.lists()))
+        variants = cache.get(cache_key)
+        if variants is None:
+            response = super(EarthquakeFeatureList, self).get(
+                request, source_type=source_type, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            variants = compress_variants(request.accepted_renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context()))
+            cache.set(cache_key, variants, EARTHQUAKE_FEATURE_CACHE_TIMEOUT)
+
+        return precompressed_response(
+            request, variants, content_type=request.accepted_media_type)
 
 
 class EarthquakeMMIContourList(
@@ -445,6 +640,8 @@ class EarthquakeMMIContourList(
     * mmi
     * in_bbox filled with BBox String in the format SWLon,SWLat,NELon,NELat
     this is used as geographic box filter
+    * zoom filled with the map zoom level, to get geometries simplified for
+    this zoom level
     """
     queryset = EarthquakeMMIContour.objects.all()
     permission_classes = (DjangoModelPermissionsOrAnonReadOnly,)
@@ -458,8 +655,35 @@ class EarthquakeMMIContourList(
     ordering = ('earthquake__shake_id', 'earthquake__source_type', 'mmi')
 
     def get(self, request, *args, **kwargs):
-        return super(EarthquakeMMIContourList, self).list(
-            request, *args, **kwargs)
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return super(EarthquakeMMIContourList, self).list(
+                request, *args, **kwargs)
+
+        # Contours are stored once per earthquake, compressed variants of
+        # the rendered feature collection are cached until an earthquake
+        # changes
+        cache_key = versioned_cache_key(
+            EARTHQUAKE_FEATURE_CACHE_NAMESPACE,
+            'contours',
+            request.scheme,
+            request.get_host(),
+            sorted(self.kwargs.items()),
+            request.accepted_media_type,
+            sorted(request.query_params.lists()))
+        variants = cache.get(cache_key)
+        if variants is None:
+            response = super(EarthquakeMMIContourList, self).list(
+                request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            variants = compress_variants(request.accepted_renderer.render(
+                response.data,
+                request.accepted_media_type,
+                self.get_renderer_context()))
+            cache.set(cache_key, variants, EARTHQUAKE_CONTOUR_CACHE_TIMEOUT)
+
+        return precompressed_response(
+            request, variants, content_type=request.accepted_media_type)
 
     def filter_queryset(self, queryset):
         shake_filter = {}
@@ -469,6 +693,23 @@ class EarthquakeMMIContourList(
         queryset = queryset.filter(**shake_filter)
         return super(EarthquakeMMIContourList, self).filter_queryset(queryset)
 
+    def list(self, request, *args, **kwargs):
+        zoom = simplified_zoom_level(request.query_params.get('zoom'))
+        if zoom is None:
+            return super(EarthquakeMMIContourList, self).list(
+                request, *args, **kwargs)
+
+        contours = list(self.filter_queryset(self.get_queryset()))
+        geometries = dict(EarthquakeMMIContourGeometry.objects.filter(
+            contour__in=[contour.id for contour in contours],
+            zoom=zoom).values_list('contour_id', 'geometry'))
+        for contour in contours:
+            # Contours stored before simplification keep full resolution
+            contour.geometry = geometries.get(contour.id, contour.geometry)
+
+        serializer = self.get_serializer(contours, many=True)
+        return Response(serializer.data)
+
 
 @api_view(['GET'])
 def get_corrected_shakemaps_for_shake_id(request, shake_id):
@@ -537,14 +778,17 @@ def get_grid_xml(request, shake_id, source_type):
             shake_id=shake_id,
             source_type=source_type)
         if shake.shake_grid:
-            response = HttpResponse(
-                shake.shake_grid.read(),
+            return serve_field_file(
+                request,
+                shake.shake_grid,
+                filename=shake.grid_xml_filename,
                 content_type='application/octet-stream')
-            response['Content-Disposition'] = \
-                'inline; filename="{0}"'.format(shake.grid_xml_filename)
-        elif shake.shake_grid_xml:
-            response = HttpResponse(
-                shake.shake_grid_xml,
+
+        shake_grid_xml = shake.shake_grid_xml_blob()
+        if shake_grid_xml:
+            response = gzip_content_response(
+                request,
+                shake_grid_xml,
                 content_type='application/octet-stream')
             response['Content-Disposition'] = \
                 'inline; filename="{0}"'.format(shake.grid_xml_filename)
@@ -558,6 +802,85 @@ def get_grid_xml(request, shake_id, source_type):
         return HttpResponseBadRequest()
 
 
+def parse_points(points):
+    """Parse semicolon separated lon,lat pairs.
+
+    :param points: The points, e.g. 106.8,-6.2;107.6,-6.9
+    :type points: str
+
+    :return: Lists of longitudes and latitudes
+    :rtype: (list[float], list[float])
+
+    :raises: ValueError if a point is invalid
+    """
+    lons = []
+    lats = []
+    for point in points.split(';'):
+        if not point.strip():
+            continue
+        lon, lat = [float(value) for value in point.split(',')]
+        if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+            raise ValueError('Invalid point {0}'.format(point))
+        lons.append(lon)
+        lats.append(lat)
+    return lons, lats
+
+
+def get_grid_values(request, shake_id, source_type):
+    """Return ground shaking values of a shakemap.
+
+    Values are read from the memory mapped raster of the shake grid, the
+    grid.xml is not parsed per request.
+
+    GET parameters:
+    * points (optional) semicolon separated lon,lat pairs,
+      e.g. ?points=106.8,-6.2;107.6,-6.9
+
+    The response contains the minimum and maximum of MMI, PGA and PGV, and
+    their values at the nearest grid point of each point. Values of points
+    outside of the grid are null.
+    """
+    if request.method != 'GET':
+        return HttpResponseBadRequest()
+
+    try:
+        lons, lats = parse_points(request.GET.get('points', ''))
+    except ValueError:
+        return HttpResponseBadRequest(_('Invalid points'))
+    if len(lons) > SHAKE_GRID_MAX_POINTS:
+        return HttpResponseBadRequest(
+            _('Too many points, at most %d are allowed') %
+            SHAKE_GRID_MAX_POINTS)
+
+    shake = get_object_or_404(
+        Earthquake, shake_id=shake_id, source_type=source_type)
+    try:
+        grid = shake.shake_grid_raster()
+    except ValueError as e:
+        LOGGER.exception(e)
+        grid = None
+    if grid is None:
+        return HttpResponseNotFound(_('Shake grid not found'))
+
+    columns = dict(
+        (name.lower(), grid.values_at(lons, lats, name))
+        for name in RASTER_FIELDS)
+    values = []
+    for index, (lon, lat) in enumerate(zip(lons, lats)):
+        value = {'lon': lon, 'lat': lat}
+        for name, column in list(columns.items()):
+            # NaN is not valid JSON
+            value[name] = (
+                None if column[index] != column[index]
+                else float(column[index]))
+        values.append(value)
+
+    return JsonResponse({
+        'summary': grid.summary(),
+        'values': values
+    })
+
+
 def get_analysis_zip(request, shake_id, source_type):
     if request.method != 'GET':
         return HttpResponseBadRequest()
@@ -568,15 +891,13 @@ def get_analysis_zip(request, shake_id, source_type):
             source_type=source_type)
 
         if shake.analysis_zip_path:
-            with open(shake.analysis_zip_path) as f:
-                response = HttpResponse(
-                    f.read(),
-                    content_type='application/octet-stream')
-                response['Content-Disposition'] = \
-                    'inline; filename=' \
-                    '"{shake_id}-{source_type}-analysis.zip"'.format(
-                        shake_id=shake_id,
-                        source_type=source_type)
+            response = serve_file(
+                request,
+                shake.analysis_zip_path,
+                filename='{shake_id}-{source_type}-analysis.zip'.format(
+                    shake_id=shake_id,
+                    source_type=source_type),
+                content_type='application/octet-stream')
         else:
             # Legacy shake grid not exists
             # TODO: Update using current workflow
@@ -1,11 +1,10 @@
 # coding=utf-8
-import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 
+from django.core.cache import cache
 from django.core.exceptions import ValidationError, MultipleObjectsReturned
 from django.db.models import Q
-from django.db.models.aggregates import Count
 from django.db.utils import IntegrityError
 from django.http.response import (
     JsonResponse,
@@ -16,6 +15,7 @@ from django.http.response import (
 )
 from django.shortcuts import render_to_response
 from django.template.context import RequestContext
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 from rest_framework import mixins, status
 from rest_framework.filters import (
@@ -28,17 +28,32 @@ from rest_framework.permissions import DjangoModelPermissionsOrAnonReadOnly
 from rest_framework.response import Response
 
 from realtime.app_settings import SLUG_FLOOD_LANDING_PAGE, \
-    LANDING_PAGE_SYSTEM_CATEGORY
+    LANDING_PAGE_SYSTEM_CATEGORY, RW_HISTOGRAM_CACHE_NAMESPACE, \
+    RW_HISTOGRAM_CACHE_TIMEOUT, FLOOD_FREQUENCY_CACHE_NAMESPACE, \
+    FLOOD_FREQUENCY_CACHE_TIMEOUT
 from realtime.forms.flood import FilterForm
+from realtime.helpers.cache import versioned_cache_key
+from realtime.helpers.compression import (
+    BROTLI_ENCODING,
+    GZIP_ENCODING,
+    compress_variants)
+from realtime.helpers.flood_features import (
+    update_flood_event_features,
+    build_flood_frequency_feature_collection)
+from realtime.helpers.flood_frequency import flood_histogram
+from realtime.helpers.simplification import simplified_zoom_level
 from realtime.models.coreflatpage import CoreFlatPage
 from realtime.models.flood import (
     Flood,
     FloodReport,
-    Boundary,
-    FloodEventBoundary)
+    FloodEventFeatures)
 from realtime.serializers.flood_serializer import (
     FloodSerializer,
     FloodReportSerializer)
+from realtime.views.utilities import (
+    serve_field_file,
+    gzip_content_response,
+    precompressed_response)
 
 __author__ = 'Rizky Maulana Nugraha <lana.pcfre@gmail.com>'
 __date__ = '11/26/15'
@@ -304,10 +319,10 @@ def flood_impact_report(request, event_id, language='en'):
         instance = FloodReport.objects.get(
             flood__event_id=event_id,
             language=language)
-        response = HttpResponse(
-            instance.impact_report.read(),
+        return serve_field_file(
+            request,
+            instance.impact_report,
             content_type='application/pdf')
-        return response
     except FloodReport.DoesNotExist:
         raise Http404()
 
@@ -318,73 +333,52 @@ def flood_impact_map(request, event_id, language='en'):
         instance = FloodReport.objects.get(
             flood__event_id=event_id,
             language=language)
-        response = HttpResponse(
-            instance.impact_map.read(),
+        return serve_field_file(
+            request,
+            instance.impact_map,
+            filename=instance.impact_map_filename,
             content_type='application/pdf')
-        response['Content-Disposition'] = 'inline; filename="{0}";'.format(
-            instance.impact_map_filename)
-        return response
     except FloodReport.DoesNotExist:
         raise Http404()
 
 
-def flood_event_features(request, event_id):
-    try:
-        flood = Flood.objects.get(event_id=event_id)
-        # build feature layer
-        features = []
-        for b in flood.flooded_boundaries.filter(boundary_alias__osm_level=8):
-            event_data = b.flood_event.filter(flood=flood).first()
-            if event_data.hazard_data > 0:
-                feat = {
-                    'id': b.upstream_id,
-                    'type': 'Feature',
-                    'geometry': json.loads(b.geometry.geojson),
-                    'properties': {
-                        'event_id': flood.event_id,
-                        'time': flood.time,
-                        'name': b.name,
-                        'parent_name': b.parent.name,
-                        'hazard_data': event_data.hazard_data
-                    }
-                }
-                features.append(feat)
-
-        feature_collection = {
-            'type': 'FeatureCollection',
-            'features': features
+def _flood_event_features_response(request, event_id, feature_type):
+    """Send precomputed feature collection of a flood event.
+
+    Geometries are simplified for the zoom level given in zoom query
+    parameter, if any.
+    """
+    zoom = simplified_zoom_level(request.GET.get('zoom'))
+    contents = FloodEventFeatures.objects.filter(
+        flood_id=event_id,
+        feature_type=feature_type,
+        zoom=zoom).values_list(
+        'content', 'brotli_content').first()
+    if contents is None:
+        # Event processed before feature collections were precomputed
+        try:
+            flood = Flood.objects.get(event_id=event_id)
+        except Flood.DoesNotExist:
+            raise Http404()
+        variants = update_flood_event_features(flood, feature_type, zoom)
+    else:
+        variants = {
+            GZIP_ENCODING: contents[0],
+            BROTLI_ENCODING: contents[1]
         }
 
-        return JsonResponse(feature_collection)
-    except BaseException:
-        return HttpResponseServerError()
+    return precompressed_response(
+        request, variants, content_type='application/json')
+
+
+def flood_event_features(request, event_id):
+    return _flood_event_features_response(
+        request, event_id, FloodEventFeatures.HAZARD_FEATURES)
 
 
 def impact_event_features(request, event_id):
-    flood = Flood.objects.get(event_id=event_id)
-    # build feature layer
-    features = []
-    for b in flood.impact_event.all():
-        if b.hazard_class > 2:
-            feat = {
-                'id': b.id,
-                'type': 'Feature',
-                'geometry': json.loads(b.geometry.geojson),
-                'properties': {
-                    'event_id': flood.event_id,
-                    'parent_boundary_name': b.parent_boundary.name,
-                    'hazard_class': b.hazard_class,
-                    'people_affected': b.population_affected
-                }
-            }
-            features.append(feat)
-
-    feature_collection = {
-        'type': 'FeatureCollection',
-        'features': features
-    }
-
-    return JsonResponse(feature_collection)
+    return _flood_event_features_response(
+        request, event_id, FloodEventFeatures.IMPACT_FEATURES)
 
 
 def rw_flood_frequency(request, hazard_levels_string=None):
@@ -392,38 +386,19 @@ def rw_flood_frequency(request, hazard_levels_string=None):
     if hazard_levels_string:
         hazard_level = [int(v) for v in hazard_levels_string.split(',') if v]
     try:
-        features = []
-        boundaries = Boundary.objects.filter(
-            flood_event__hazard_data__in=hazard_level).annotate(
-            flood_count=Count('id')
-        )
-        for boundary in boundaries:
-            flood_count = boundary.flood_count
-            if flood_count == 0:
-                continue
-            parent_name = None
-            if boundary.parent:
-                parent_name = boundary.parent.name
-            prop = {
-                'name': boundary.name,
-                'parent_name': parent_name,
-                'flood_count': flood_count
-            }
-            feat = {
-                'id': boundary.id,
-                'type': 'Feature',
-                'geometry': json.loads(boundary.geometry.geojson),
-                'properties': prop
-            }
-            features.append(feat)
-        #     rows += row
-        # f.write(json.dumps(rows))
-
-        feature_collection = {
-            'type': 'FeatureCollection',
-            'features': features
-        }
-        return JsonResponse(feature_collection)
+        # Compressed variants are cached until a flood changes its flooded
+        # boundaries
+        zoom = simplified_zoom_level(request.GET.get('zoom'))
+        cache_key = versioned_cache_key(
+            FLOOD_FREQUENCY_CACHE_NAMESPACE, sorted(set(hazard_level)), zoom)
+        variants = cache.get(cache_key)
+        if variants is None:
+            variants = compress_variants(
+                build_flood_frequency_feature_collection(
+                    hazard_level, zoom=zoom))
+            cache.set(cache_key, variants, FLOOD_FREQUENCY_CACHE_TIMEOUT)
+        return precompressed_response(
+            request, variants, content_type='application/json')
     except Exception as e:
         LOGGER.info(e)
         return HttpResponseServerError()
@@ -438,6 +413,18 @@ def rw_histogram(
         if hazard_levels_string:
             hazard_levels = [
                 int(v) for v in hazard_levels_string.split(',') if v]
+
+        cache_key = None
+        if RW_HISTOGRAM_CACHE_TIMEOUT:
+            cache_key = versioned_cache_key(
+                RW_HISTOGRAM_CACHE_NAMESPACE.format(boundary_id=boundary_id),
+                start_date_timestamp,
+                end_date_timestamp,
+                hazard_levels)
+            features = cache.get(cache_key)
+            if features is not None:
+                return JsonResponse(features, safe=False)
+
         date_pattern = '%Y-%m-%d'
         start_date = datetime(2016, 1, 1)
         if start_date_timestamp:
@@ -445,30 +432,14 @@ def rw_histogram(
         end_date = datetime.utcnow()
         if end_date_timestamp:
             end_date = datetime.strptime(end_date_timestamp, date_pattern)
-        events = FloodEventBoundary.objects.filter(
-            boundary__id=boundary_id,
-            flood__time__gte=start_date,
-            flood__time__lte=end_date,
-            hazard_data__in=hazard_levels
-        ).order_by('flood__time')
-        features = []
-        last_event = None
-        for e in events:
-            if last_event:
-                event_time_delta = (
-                    e.flood.time.replace(tzinfo=None) - last_event)
-                if event_time_delta < timedelta(1):
-                    continue
-            last_event = datetime(
-                e.flood.time.year,
-                e.flood.time.month,
-                e.flood.time.day)
-            f = {
-                'event_id': e.flood.event_id,
-                'time': e.flood.time.strftime(date_pattern),
-                'hazard_class': e.hazard_data
-            }
-            features.append(f)
+        features = flood_histogram(
+            int(boundary_id),
+            timezone.make_aware(start_date, timezone.utc),
+            timezone.make_aware(end_date, timezone.utc),
+            hazard_levels)
+
+        if cache_key:
+            cache.set(cache_key, features, RW_HISTOGRAM_CACHE_TIMEOUT)
         return JsonResponse(features, safe=False)
     except Exception as e:
         LOGGER.info(e)
@@ -483,10 +454,14 @@ def get_flood_data_json(request, event_id):
         flood = Flood.objects.get(
             event_id=event_id
         )
-        response = HttpResponse(
-            flood.flood_data,
-            content_type='application/octet-stream'
-        )
+        flood_data = flood.flood_data_blob()
+        if flood_data:
+            response = gzip_content_response(
+                request,
+                flood_data,
+                content_type='application/octet-stream')
+        else:
+            response = HttpResponse(content_type='application/octet-stream')
         response['Content-Disposition'] = \
             'inline; filename="%s.json"' % event_id
         return response
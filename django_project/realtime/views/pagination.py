@@ -0,0 +1,132 @@
+# coding=utf-8
+"""Keyset pagination of REST API lists."""
+import base64
+import json
+
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class EarthquakeKeysetPagination(PageNumberPagination):
+    """Page earthquakes with a cursor over (time, shake_id, source_type).
+
+    Each page is fetched with an index range scan after the last row of the
+    previous page, so deep pages are as fast as the first one.
+
+    Keyset pagination is used when the cursor query parameter is given,
+    e.g. ?cursor= for the first page. Pages are ordered from the latest
+    earthquake and have no count. Without the cursor parameter, page number
+    pagination is used.
+    """
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    # Keyset columns, all descending. The last ones make the order unique.
+    keyset = ('time', 'shake_id', 'source_type')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            self.keyset_pagination = False
+            return super(EarthquakeKeysetPagination, self).paginate_queryset(
+                queryset, request, view=view)
+
+        self.keyset_pagination = True
+        # Page controls of the browsable API expect page numbers
+        self.display_page_controls = False
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(request)
+
+        table = queryset.model._meta.db_table
+        columns = ', '.join(
+            '"{0}"."{1}"'.format(table, column) for column in self.keyset)
+        if reverse:
+            ordering = self.keyset
+            comparison = '>'
+        else:
+            ordering = ['-' + column for column in self.keyset]
+            comparison = '<'
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.extra(
+                where=['({0}) {1} ({2})'.format(
+                    columns, comparison,
+                    ', '.join(['%s'] * len(self.keyset)))],
+                params=position)
+
+        # One more row tells if there is a following page
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        page = results[:self.page_size]
+        if reverse:
+            page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+        self.page = page
+        return page
+
+    def decode_cursor(self, request):
+        """Return the keyset position and direction of the cursor.
+
+        :return: Tuple of keyset values, None for the first page, and True
+            if the page is before the position
+        :rtype: (list, bool)
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(
+                base64.urlsafe_b64decode(encoded.encode('ascii')).decode(
+                    'utf-8'))
+            time, shake_id, source_type = cursor['position']
+            time = parse_datetime(time)
+            if time is None:
+                raise ValueError('Invalid time')
+            return [time, shake_id, source_type], bool(cursor['reverse'])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        """Return the url of the page after or before an instance."""
+        cursor = json.dumps({
+            'position': [
+                instance.time.isoformat(),
+                instance.shake_id,
+                instance.source_type],
+            'reverse': reverse
+        })
+        encoded = base64.urlsafe_b64encode(cursor.encode('utf-8'))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode('ascii'))
+
+    def get_next_link(self):
+        if not self.keyset_pagination:
+            return super(EarthquakeKeysetPagination, self).get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], False)
+
+    def get_previous_link(self):
+        if not self.keyset_pagination:
+            return super(EarthquakeKeysetPagination, self).get_previous_link()
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset_pagination:
+            return super(
+                EarthquakeKeysetPagination, self).get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
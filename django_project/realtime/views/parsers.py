@@ -0,0 +1,44 @@
+# coding=utf-8
+"""Parsers of REST API requests."""
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def parse_ndjson(lines, encoding='utf-8'):
+    """Parse newline delimited JSON.
+
+    :param lines: Lines of the document, e.g. a file
+    :type lines: iterable
+
+    :param encoding: Encoding of bytes lines
+    :type encoding: str
+
+    :return: The parsed values, one for each non empty line
+    :rtype: list
+    """
+    values = []
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode(encoding)
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            values.append(json.loads(line))
+        except ValueError as e:
+            raise ParseError(
+                'NDJSON parse error at line {0} - {1}'.format(number, e))
+    return values
+
+
+class NDJSONParser(BaseParser):
+    """Parses newline delimited JSON, one value per line."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        return parse_ndjson(stream, encoding)
@@ -6,7 +6,7 @@ from datetime import datetime
 from django.conf import settings
 from django.contrib.auth.decorators import permission_required
 from django.core.urlresolvers import reverse_lazy, reverse
-from django.http.response import HttpResponse, Http404, HttpResponseRedirect
+from django.http.response import Http404, HttpResponseRedirect
 from django.shortcuts import render_to_response
 from django.template.context import RequestContext
 
@@ -14,6 +14,7 @@ from realtime.app_settings import REPORT_TEMPLATES
 from realtime.forms.report_template import ReportTemplateUploadForm
 from realtime.models.earthquake import EarthquakeReport
 from realtime.models.report_template import ReportTemplate
+from realtime.views.utilities import serve_file, serve_field_file
 
 
 __author__ = 'Rizky Maulana Nugraha "lucernae" <lana.pcfre@gmail.com>'
@@ -38,29 +39,20 @@ def report_pdf(request, shake_id, source_type='initial',
             language=language)
         if not language == language2:
             raise Http404()
-        response = HttpResponse(
-            report.report_pdf.read(), content_type='application/octet-stream')
-        response['Content-Disposition'] = 'inline; filename="%s-%s.pdf";' % (
-            shake_id, language)
-        return response
-    except IOError:
-        raise Http404()
+        return serve_field_file(
+            request,
+            report.report_pdf,
+            filename='%s-%s.pdf' % (shake_id, language),
+            content_type='application/octet-stream')
     except EarthquakeReport.DoesNotExist:
         # if it doesn't exists in the database. Try to get it directly from
         # media folder
         filename = '%s-%s.pdf' % (shake_id, language)
-        filename = os.path.join(
-            settings.MEDIA_ROOT, 'reports/pdf/%s' % filename)
-        try:
-            with open(filename) as f:
-                response = HttpResponse(
-                    f.read(),
-                    content_type='application/octet-stream')
-                response['Content-Disposition'] = 'inline; filename="%s";' % (
-                    filename, )
-                return response
-        except IOError:
-            raise Http404()
+        return serve_file(
+            request,
+            os.path.join(settings.MEDIA_ROOT, 'reports/pdf/%s' % filename),
+            filename=filename,
+            content_type='application/octet-stream')
 
 
 def report_image(request, shake_id, source_type='initial',
@@ -81,30 +73,20 @@ def report_image(request, shake_id, source_type='initial',
             language=language)
         if not language == language2:
             raise Http404()
-        response = HttpResponse(
-            report.report_image.read(),
+        return serve_field_file(
+            request,
+            report.report_image,
+            filename='%s-%s.png' % (shake_id, language),
             content_type='application/octet-stream')
-        response['Content-Disposition'] = 'inline; filename="%s-%s.png";' % (
-            shake_id, language)
-        return response
-    except IOError:
-        raise Http404()
     except EarthquakeReport.DoesNotExist:
         # if it doesn't exists in the database. Try to get it directly from
         # media folder
         filename = '%s-%s.png' % (shake_id, language)
-        filename = os.path.join(
-            settings.MEDIA_ROOT, 'reports/png/%s' % filename)
-        try:
-            with open(filename) as f:
-                response = HttpResponse(
-                    f.read(),
-                    content_type='application/octet-stream')
-                response['Content-Disposition'] = 'inline; filename="%s";' % (
-                    filename, )
-                return response
-        except IOError:
-            raise Http404()
+        return serve_file(
+            request,
+            os.path.join(settings.MEDIA_ROOT, 'reports/png/%s' % filename),
+            filename=filename,
+            content_type='application/octet-stream')
 
 
 def report_thumbnail(request, shake_id, source_type='initial',
@@ -127,29 +109,20 @@ def report_thumbnail(request, shake_id, source_type='initial',
             language=language)
         if not language == language2:
             raise Http404()
-        response = HttpResponse(
-            report.report_thumbnail.read(),
+        return serve_field_file(
+            request,
+            report.report_thumbnail,
+            filename='%s-%s.png' % (shake_id, language),
             content_type='application/octet-stream')
-        response['Content-Disposition'] = 'inline; filename="%s-%s.png";' % (
-            shake_id, language)
-        return response
-    except IOError:
-        raise Http404()
     except EarthquakeReport.DoesNotExist:
         # if it doesn't exists in the database. Try to get it directly from
         # media folder
         filename = '%s-thumb-%s.png' % (shake_id, language)
-        filename = os.path.join(
-            settings.MEDIA_ROOT, 'reports/png/%s' % filename)
-        try:
-            with open(filename) as f:
-                response = HttpResponse(
-                    f, content_type='application/octet-stream')
-                response['Content-Disposition'] = 'inline; filename="%s";' % (
-                    filename, )
-                return response
-        except IOError:
-            raise Http404()
+        return serve_file(
+            request,
+            os.path.join(settings.MEDIA_ROOT, 'reports/png/%s' % filename),
+            filename=filename,
+            content_type='application/octet-stream')
 
 
 def latest_report(request, report_type=u'pdf', language=u'id'):
@@ -1,15 +1,15 @@
 # coding=utf-8
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.shortcuts import render_to_response
 from django.template.context import RequestContext
 from django.utils import translation
-from django.http.response import JsonResponse
-from realtime.app_settings import LANGUAGE_LIST
-from realtime.helpers.realtime_broker_indicator import RealtimeBrokerIndicator
-from realtime.helpers.shake_event_indicator import ShakeEventIndicator
-from realtime.helpers.shakemap_push_indicator import ShakemapPushIndicator
+from django.http.response import JsonResponse, HttpResponseBadRequest
+from realtime.app_settings import (
+    INDICATOR_SNAPSHOT_RETENTION, LANGUAGE_LIST)
+from realtime.helpers.indicator_snapshot import latest_indicators
+from realtime.models.indicator import IndicatorSnapshot
 from realtime.models.user_push import UserPush
 from user_map.models.user import User
 
@@ -77,11 +77,6 @@ def indicator(request):
         if 'lang' in request.GET:
             language_code = request.GET.get('lang')
 
-    shakemap_push_indicator = ShakemapPushIndicator()
-    shake_event_indicator = ShakeEventIndicator()
-    # rest_push_indicator = RESTPushIndicator()
-    realtime_broker_indicator = RealtimeBrokerIndicator()
-
     context = RequestContext(request)
     selected_language = {
         'id': 'en',
@@ -101,18 +96,64 @@ def indicator(request):
     request.session[translation.LANGUAGE_SESSION_KEY] = \
         selected_language['id']
 
+    # Indicators are read from their latest snapshots
     return render_to_response(
         'realtime/indicator.html',
         {
-            'indicators': [
-                shakemap_push_indicator,
-                shake_event_indicator,
-                realtime_broker_indicator
-            ]
+            'indicators': latest_indicators()
         },
         context_instance=context)
 
 
+def indicator_history(request):
+    """Return the history of indicator statuses for dashboards.
+
+    Optional GET parameters:
+
+    * indicator (name of the indicator, e.g. shake_event)
+    * since_last_hours (history of the last h hours, default 24, at most
+      the snapshot retention period)
+
+    :param request: A django request object.
+    :type request: request
+
+    :returns: Response will be a json with structure
+        { 'snapshots': [{ 'indicator', 'time', 'status', 'value',
+        'latency' }] } ordered by time. Latency is in seconds.
+    :rtype: HttpResponse
+    """
+    try:
+        since_last_hours = float(request.GET.get('since_last_hours', 24))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid since_last_hours')
+    # Comparisons with nan are false
+    if not 0 < since_last_hours < float('inf'):
+        return HttpResponseBadRequest('Invalid since_last_hours')
+
+    # Older snapshots are deleted
+    retention_hours = INDICATOR_SNAPSHOT_RETENTION.total_seconds() / 3600
+    since = datetime.utcnow().replace(tzinfo=pytz.utc) - timedelta(
+        hours=min(since_last_hours, retention_hours))
+    snapshots = IndicatorSnapshot.objects.filter(time__gte=since)
+    if request.GET.get('indicator'):
+        snapshots = snapshots.filter(indicator=request.GET['indicator'])
+    snapshots = snapshots.order_by('time', 'indicator').values_list(
+        'indicator', 'time', 'status', 'value', 'latency')
+
+    return JsonResponse({
+        'snapshots': [
+            {
+                'indicator': indicator,
+                'time': time,
+                'status': status,
+                'value': value,
+                'latency': latency.total_seconds() if latency else None
+            }
+            for indicator, time, status, value, latency in snapshots
+        ]
+    })
+
+
 def realtime_rest_users(request):
     users = UserPush.objects.all()
     date_format = '%Y-%m-%d %H:%M:%S %Z'
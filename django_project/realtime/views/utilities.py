@@ -0,0 +1,259 @@
+# coding=utf-8
+"""Helpers to serve files and precomputed content in constant memory."""
+import mimetypes
+import os
+import re
+
+from django.http.response import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse)
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
+from django.views.static import was_modified_since
+
+from realtime.app_settings import (
+    FILE_STREAM_CHUNK_SIZE,
+    FILE_X_ACCEL_REDIRECT_LOCATIONS)
+from realtime.helpers.compression import (
+    GZIP_ENCODING,
+    negotiate_encoding)
+from realtime.utils import gzip_decompress_chunks
+
+RANGE_HEADER_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(stat):
+    """Build a strong validator of a file from its mtime and size.
+
+    :param stat: Result of os.stat of the file
+    :type stat: os.stat_result
+
+    :return: Unquoted ETag value, as returned by parse_etags
+    :rtype: str
+    """
+    return '{0:x}-{1:x}'.format(int(stat.st_mtime), stat.st_size)
+
+
+def parse_range_header(header, size):
+    """Parse a single byte range of a Range header.
+
+    :param header: Value of the Range header, e.g. 'bytes=0-499'
+    :type header: str
+
+    :param size: Size of the file
+    :type size: int
+
+    :return: Tuple of (start, end) inclusive. None if the header should be
+        ignored and the whole file served.
+    :rtype: (int, int)
+
+    :raises: ValueError if the range is not satisfiable
+    """
+    match = RANGE_HEADER_RE.match(header.strip())
+    if not match:
+        # Multiple ranges or unknown unit, serve the whole file
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range, the last n bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, min(end, size - 1)
+
+
+def _x_accel_redirect_uri(path):
+    """Return nginx internal uri of the file, if it is exposed to nginx."""
+    path = os.path.abspath(path)
+    for directory, location in FILE_X_ACCEL_REDIRECT_LOCATIONS.items():
+        directory = os.path.join(os.path.abspath(directory), '')
+        if path.startswith(directory):
+            return '{0}/{1}'.format(
+                location.rstrip('/'), path[len(directory):])
+    return None
+
+
+def _file_range_iterator(file_handle, start, length):
+    """Yield chunks of an opened file within the given range."""
+    try:
+        file_handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file_handle.read(min(FILE_STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file_handle.close()
+
+
+def serve_file(
+        request, path, filename=None, content_type=None,
+        disposition='inline'):
+    """Serve a file from disk in constant memory.
+
+    The file is either delegated to nginx using X-Accel-Redirect, or
+    streamed by django. Conditional GET (ETag and Last-Modified) and single
+    byte Range requests are supported.
+
+    :param request: Django request object
+    :param path: Absolute path of the file to serve
+    :param filename: Filename sent in Content-Disposition header. Default to
+        the basename of the file
+    :param content_type: Content type of the response. Default to guessed
+        mime type of the filename
+    :param disposition: Disposition type, 'inline' or 'attachment'
+
+    :return: Response object
+    :raises: Http404 if the file doesn't exists
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        raise Http404()
+
+    if not filename:
+        filename = os.path.basename(path)
+    if not content_type:
+        content_type = (
+            mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+
+    raw_etag = file_etag(stat)
+    etag = quote_etag(raw_etag)
+    last_modified = http_date(stat.st_mtime)
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        not_modified = (
+            '*' in if_none_match or raw_etag in parse_etags(if_none_match))
+    else:
+        not_modified = not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size)
+    if not_modified:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        return response
+
+    accel_uri = _x_accel_redirect_uri(path)
+    if accel_uri:
+        # Nginx will handle range and sending the file body
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_uri
+    else:
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if range_header and (not if_range or if_range in (
+                etag, last_modified)):
+            try:
+                byte_range = parse_range_header(range_header, stat.st_size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */{0}'.format(
+                    stat.st_size)
+                return response
+
+        file_handle = open(path, 'rb')
+        if byte_range:
+            start, end = byte_range
+            length = end - start + 1
+            response = StreamingHttpResponse(
+                _file_range_iterator(file_handle, start, length),
+                status=206,
+                content_type=content_type)
+            response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(
+                start, end, stat.st_size)
+            response['Content-Length'] = str(length)
+        else:
+            response = FileResponse(file_handle, content_type=content_type)
+            response['Content-Length'] = str(stat.st_size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Content-Disposition'] = '{0}; filename="{1}";'.format(
+        disposition, filename)
+    return response
+
+
+def serve_field_file(request, field_file, filename=None, content_type=None,
+                     disposition='inline'):
+    """Serve the file of a model FileField.
+
+    :param request: Django request object
+    :param field_file: File attribute of a model instance
+    :type field_file: django.db.models.fields.files.FieldFile
+
+    :return: Response object
+    :raises: Http404 if the field is empty or the file doesn't exists
+    """
+    if not field_file:
+        raise Http404()
+    return serve_file(
+        request, field_file.path,
+        filename=filename,
+        content_type=content_type,
+        disposition=disposition)
+
+
+def precompressed_response(request, variants, content_type):
+    """Send the precompressed variant accepted by the client.
+
+    The gzip variant is decompressed for clients that don't accept any of
+    the variants, and it is streamed a chunk at a time.
+
+    :param request: Django request object
+    :param variants: Dictionary of content coding and compressed content,
+        see realtime.helpers.compression.compress_variants. Must contain the
+        gzip variant.
+    :type variants: dict
+
+    :param content_type: Content type of the uncompressed content
+    :type content_type: str
+
+    :return: Response object
+    """
+    encoding = negotiate_encoding(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''),
+        [key for key, value in variants.items() if value])
+    if encoding:
+        content = bytes(variants[encoding])
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Encoding'] = encoding
+        response['Content-Length'] = str(len(content))
+    else:
+        response = StreamingHttpResponse(
+            gzip_decompress_chunks(
+                variants[GZIP_ENCODING], FILE_STREAM_CHUNK_SIZE),
+            content_type=content_type)
+    patch_vary_headers(response, ('Accept-Encoding', ))
+    return response
+
+
+def gzip_content_response(request, content, content_type):
+    """Send gzip compressed content without recompressing it.
+
+    :param request: Django request object
+    :param content: Gzip compressed content
+    :type content: bytes
+
+    :param content_type: Content type of the uncompressed content
+    :type content_type: str
+
+    :return: Response object
+    """
+    return precompressed_response(
+        request, {GZIP_ENCODING: content}, content_type)